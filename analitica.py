@@ -0,0 +1,74 @@
+# analitica.py
+"""
+Agregados para la pantalla de analítica. Trabaja sobre columnas compactas
+(array('d')) armadas desde los agregados diarios de logic.Historial, nunca
+sobre sesiones crudas. Cada columna semanal se cachea por (materia, semana)
+y solo se invalida cuando entra una sesión de esa materia en esa semana.
+"""
+import datetime
+from array import array
+
+import logic
+
+VENTANAS = (4, 12, 26, 52)  # semanas hacia atrás que ofrece la pantalla
+
+def ventana(semanas, hoy=None):
+    """[(clave "AAAA-Www", lunes)] de las últimas `semanas` semanas ISO, la actual al final."""
+    hoy = hoy or datetime.date.today()
+    lunes = hoy - datetime.timedelta(days=hoy.weekday())
+    resultado = []
+    for i in range(semanas - 1, -1, -1):
+        dia = lunes - datetime.timedelta(weeks=i)
+        anio, semana, _ = dia.isocalendar()
+        resultado.append((f"{anio}-W{semana:02d}", dia))
+    return resultado
+
+def niveles(columna, maximo, pasos):
+    """Cuantiza una columna a 0..pasos (para los glifos de la barra)."""
+    if maximo <= 0: return array('B', bytes(len(columna)))
+    return array('B', (min(pasos, int(round(v / maximo * pasos))) if v > 0 else 0 for v in columna))
+
+class Analitica:
+    """Caché de columnas por (materia, semana) enganchada a los avisos del almacén."""
+
+    def __init__(self, almacen):
+        self.almacen = almacen
+        self._semanas = {}   # (materia_id, "AAAA-Www") -> array('d', 7 días)
+        almacen.suscribir(self._al_cambiar)
+
+    def _al_cambiar(self, op):
+        tipo = op["op"]
+        if tipo == "lote":
+            for o in op["ops"]: self._al_cambiar(o)
+        elif tipo in ("horas", "ciclo") and "ts" in op:
+            self._semanas.pop((op["id"], logic._dia_y_semana(op["ts"])[1]), None)
+        elif tipo == "recarga":
+            self._semanas.clear()
+
+    def dias_semana(self, mid, semana, lunes):
+        """Horas por día (lunes..domingo) de la materia en esa semana."""
+        clave = (mid, semana)
+        columna = self._semanas.get(clave)
+        if columna is None:
+            dias = self.almacen.historial.dias.get(mid, {})
+            columna = array('d', (dias.get((lunes + datetime.timedelta(days=d)).isoformat(), (0.0,))[0]
+                                  for d in range(7)))
+            self._semanas[clave] = columna
+        return columna
+
+    def columna_diaria(self, mid, semanas):
+        """Horas por día de toda la ventana, concatenando las columnas semanales."""
+        columna = array('d')
+        for semana, lunes in semanas:
+            columna.extend(self.dias_semana(mid, semana, lunes))
+        return columna
+
+    def totales_semanales(self, mid, semanas):
+        """Horas por semana de la ventana (del agregado semanal, O(1) por semana)."""
+        historial = self.almacen.historial
+        return array('d', (historial.semana(mid, semana)[0] for semana, _ in semanas))
+
+    def tasa_meta(self, totales, meta):
+        """Fracción de semanas de la ventana en las que se alcanzó la meta."""
+        if not totales or meta <= 0: return 0.0
+        return sum(1 for h in totales if h >= meta) / len(totales)
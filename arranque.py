@@ -0,0 +1,98 @@
+# arranque.py
+"""
+Caché en disco del CSS ya parseado. Parsear estilo.css, el tema de pywal y
+el DEFAULT_CSS de cada widget cuesta decenas de ms en cada arranque;
+deserializar las reglas, unos pocos. La caché vive en
+$XDG_CACHE_HOME/tracker-tui/estilos.pickle y se descarta entera si cambia
+el mtime o el tamaño de alguna hoja, o la versión de Textual.
+
+Se engancha a Stylesheet._parse_rules, que es privado: solo se usa si
+disponible() lo encuentra con la firma esperada; si no (u otra versión de
+Textual lo cambia, o TRACKER_CACHE_CSS=0), la app usa el Stylesheet normal.
+"""
+import hashlib
+import inspect
+import os
+import pickle
+
+import textual
+from textual.css.stylesheet import Stylesheet
+
+RUTA_ESTILOS = os.path.join(os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache"),
+                            "tracker-tui", "estilos.pickle")
+
+# Parámetros de Stylesheet._parse_rules con los que se escribió HojaCacheada
+PARAMETROS_PARSE = ("self", "css", "read_from", "is_default_rules", "tie_breaker", "scope")
+
+def disponible():
+    """True si Stylesheet._parse_rules existe con la firma que HojaCacheada sobrescribe."""
+    if os.environ.get("TRACKER_CACHE_CSS") == "0": return False
+    metodo = getattr(Stylesheet, "_parse_rules", None)
+    if metodo is None: return False
+    try:
+        return tuple(inspect.signature(metodo).parameters) == PARAMETROS_PARSE
+    except (TypeError, ValueError):
+        return False
+
+def firma_hojas(rutas):
+    """Versión de Textual y (ruta, mtime, tamaño) de cada hoja."""
+    firma = [textual.__version__]
+    for ruta in rutas:
+        try:
+            st = os.stat(ruta)
+            firma.append((str(ruta), st.st_mtime_ns, st.st_size))
+        except OSError:
+            firma.append((str(ruta), None, None))
+    return firma
+
+class HojaCacheada(Stylesheet):
+    """Stylesheet que reutiliza las reglas parseadas en arranques anteriores.
+    Cada entrada se indexa como la caché interna de Textual (texto CSS,
+    origen, ámbito...) más una huella de las variables del tema."""
+
+    def __init__(self, *, variables=None, firma=None, ruta=RUTA_ESTILOS):
+        super().__init__(variables=variables)
+        self.ruta = ruta
+        self.firma = firma
+        self.reglas = {}       # clave -> [RuleSet]
+        self.aciertos = 0
+        self._nuevas = False   # se parseó algo que el disco no tenía
+        self._huella = None    # de las variables vigentes
+        try:
+            with open(ruta, "rb") as f:
+                firma_guardada, reglas = pickle.load(f)
+            if firma_guardada == firma:
+                self.reglas = reglas
+        except (OSError, EOFError, ValueError, TypeError, AttributeError, ImportError, pickle.UnpicklingError):
+            pass  # sin caché (o de otra versión): se parsea como siempre
+
+    def set_variables(self, variables):
+        super().set_variables(variables)
+        self._huella = None
+
+    def _parse_rules(self, css, read_from, is_default_rules=False, tie_breaker=0, scope=""):
+        if self._huella is None:
+            variables = repr(sorted(self._variables.items())).encode()
+            self._huella = hashlib.sha1(variables).hexdigest()
+        clave = (css, read_from, is_default_rules, tie_breaker, scope, self._huella)
+        reglas = self.reglas.get(clave)
+        if reglas is None:
+            reglas = super()._parse_rules(css, read_from, is_default_rules, tie_breaker, scope)
+            self.reglas[clave] = reglas
+            self._nuevas = True
+        else:
+            self.aciertos += 1
+        return reglas
+
+    def guardar(self):
+        """Vuelca la caché si este arranque parseó algo nuevo; un fallo no es grave."""
+        if not self._nuevas: return
+        try:
+            os.makedirs(os.path.dirname(self.ruta), exist_ok=True)
+            tmp = f"{self.ruta}.{os.getpid()}.tmp"
+            with open(tmp, "wb") as f:
+                pickle.dump((self.firma, self.reglas), f, pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, self.ruta)
+            self._nuevas = False
+        except (OSError, pickle.PicklingError):
+            pass
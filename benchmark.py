@@ -0,0 +1,291 @@
+"""
+Benchmarks de la app. Uso:
+
+    python benchmark.py barras                     # coste por frame de BtopBar.render
+    python benchmark.py pilot [salida.json] [N...] # app headless con Pilot (10, 1k, 10k)
+    python benchmark.py filtro [N]                 # consulta del filtro difuso por tecla
+    python benchmark.py plan [N]                   # plan semanal: completo vs. incremental
+    python benchmark.py lote [N]                   # frames y ms de las ops masivas (5k)
+
+La suite `pilot` lanza un proceso por tamaño (arranque en frío y RSS pico
+limpios), cada uno contra un progress.json generado con N materias y N
+tareas, y escribe los resultados como JSON para comparar entre commits.
+`lote` usa el mismo montaje para contar los frames que pinta la app al
+reiniciar la semana o importar materias en bloque.
+"""
+import asyncio
+import json
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import timeit
+
+_T0 = time.perf_counter()  # arranque en frío: cuenta también importar la app
+import tui_app
+import busqueda
+import espacios
+import logic
+import planificador
+
+TAMANOS = (10, 1000, 10000)
+REPETICIONES = 5
+
+
+def _barra_sin_cache(total, p):
+    """Render original de BtopBar (concatenación + ljust), como referencia."""
+    bars = tui_app.BtopBar.BARS
+    filled = int(total * p)
+    remainder = (total * p) - filled
+    bar = "⣿" * filled
+    if filled < total:
+        idx = int(remainder * (len(bars) - 1))
+        bar += bars[idx]
+    return bar.ljust(total, " ")
+
+
+def bench_barras(n_barras=60, ancho=40, frames=2000):
+    """Un frame = repintar `n_barras` barras de `ancho` celdas con progresos
+    que apenas cambian entre frames (el caso real: un tick por segundo)."""
+    progresos = [(i * 7 % 100) / 100.0 for i in range(n_barras)]
+    octavos = len(tui_app.BtopBar.BARS) - 1
+
+    def frame_original():
+        for p in progresos:
+            _barra_sin_cache(ancho, p)
+
+    def frame_memoizado():
+        for p in progresos:
+            tui_app._barra(ancho, int(ancho * p * octavos))
+
+    resultados = {}
+    for nombre, frame in (("original", frame_original), ("memoizado", frame_memoizado)):
+        segundos = min(timeit.repeat(frame, number=frames, repeat=5))
+        resultados[nombre] = segundos / frames * 1e6
+    return resultados
+
+
+def bench_filtro(n=10000, consulta="matematicas discretas"):
+    """Coste de cada tecla al escribir `consulta` (con una errata) sobre n entradas."""
+    temas = ("Cálculo", "Álgebra lineal", "Matemáticas discretas", "Física", "Química orgánica",
+             "Programación", "Estadística", "Ecuaciones diferenciales")
+    t = time.perf_counter()
+    indice = busqueda.IndiceDifuso((i, f"{temas[i % len(temas)]} {i:05d}") for i in range(n))
+    construir = (time.perf_counter() - t) * 1000
+    consulta = consulta.replace("ti", "it", 1)  # errata: el filtro debe tolerarla
+    teclas = {}
+    for k in range(1, len(consulta) + 1):
+        prefijo = consulta[:k]
+        teclas[prefijo] = min(timeit.repeat(lambda: indice.buscar(prefijo), number=5, repeat=3)) / 5 * 1000
+    t = time.perf_counter()
+    indice.agregar(n, "Materia nueva")
+    indice.quitar(n)
+    parche = (time.perf_counter() - t) * 1e6
+    return {"n": n, "construir_ms": construir, "parche_us": parche, "teclas_ms": teclas,
+            "resultados": len(indice.buscar(consulta))}
+
+
+def bench_plan(n=500, sesiones=200):
+    """Plan semanal de n materias: resolverlo entero frente a parchearlo tras cada sesión."""
+    import datetime
+    lunes = datetime.datetime(2026, 1, 5, 8, 0)
+    materias = [logic.Materia(f"Materia {i:04d}", 0.5 + i % 4, id=f"m{i}") for i in range(n)]
+    almacen = logic.Almacen(materias, [])
+    horario = planificador.cargar_horario(os.devnull + ".json")  # el de por defecto
+    t = time.perf_counter()
+    plan = planificador.Plan(almacen, horario=horario, reloj=lambda: lunes)
+    completo = (time.perf_counter() - t) * 1000
+    tiempos = []
+    for k in range(sesiones):
+        m = materias[(k * 7) % n]
+        t = time.perf_counter()
+        almacen.aplicar(logic.op_horas(m, 0.25))
+        tiempos.append((time.perf_counter() - t) * 1000)
+    ciclos = sum(len(c) for _, c in plan.dias())
+    return {"n": n, "ciclos": ciclos, "sin_hueco": len(plan.sin_hueco()), "completo_ms": completo,
+            "incremental_ms": statistics.median(tiempos), "incremental_max_ms": max(tiempos)}
+
+
+def generar_fixture(directorio, n, tareas=None):
+    """progress.json con n materias y n tareas (o `tareas`), formato actual con
+    ids, como espacio principal de un $XDG_DATA_HOME que es `directorio`."""
+    materias = [logic.Materia(f"Materia {i:05d}", 1 + i % 6, float(i % 4)) for i in range(n)]
+    todos = [{"id": logic.nuevo_id(), "text": f"Tarea {i:05d}", "done": i % 3 == 0}
+             for i in range(n if tareas is None else tareas)]
+    shard = os.path.join(directorio, "tracker-tui", "espacios", espacios.POR_DEFECTO)
+    os.makedirs(shard)
+    with open(os.path.join(shard, logic.FILE_NAME), 'w') as f:
+        json.dump({"seq": 0, "materias": [m.to_dict() for m in materias], "todos": todos}, f)
+
+
+async def _medir(pilot, accion, repeticiones=REPETICIONES):
+    """Mediana (ms) de `accion` hasta que la app termina de procesarla."""
+    tiempos = []
+    for _ in range(repeticiones):
+        t = time.perf_counter()
+        await accion()
+        await pilot.pause()
+        tiempos.append((time.perf_counter() - t) * 1000)
+    return round(statistics.median(tiempos), 3)
+
+
+async def _caso_pilot(n):
+    app = tui_app.StudyApp()
+    async with app.run_test(size=(200, 60)) as pilot:
+        arranque = time.perf_counter() - _T0
+        await pilot.pause()
+        primer_pintado = time.perf_counter() - _T0
+
+        lista = app.query_one("#dash_tracker").lista
+        lista.focus()
+        mas = dict((nombre, x) for nombre, x, _ in lista._columnas(lista.size.width))["mas"]
+        primera = app.almacen.materias[lista._ids[0]]
+        antes = primera.horas_acumuladas
+        click_mas = await _medir(pilot, lambda: pilot.click(lista, offset=(mas + 1 + lista.gutter.left, lista.gutter.top)))
+        assert primera.horas_acumuladas == antes + REPETICIONES, "el click en + no llegó a guardar_todo"
+
+        todo = app.query_one("#dash_todo")
+        entrada = todo.query_one("#inp_task")
+        async def anadir():
+            entrada.value = "bench"
+            entrada.focus()
+            await pilot.press("enter")
+        n_todos = len(app.almacen.todos)
+        tarea_anadir = await _medir(pilot, anadir)
+        assert len(app.almacen.todos) == n_todos + REPETICIONES
+
+        async def marcar():
+            await pilot.click(todo.lista, offset=(todo.lista.gutter.left + 1, todo.lista.gutter.top))
+        hecha = app.almacen.todos.get(todo.lista._ids[0]).hecho
+        tarea_marcar = await _medir(pilot, marcar)
+        assert app.almacen.todos.get(todo.lista._ids[0]).hecho != hecha, "el click en la casilla no marcó la tarea"
+
+        async def alternar():
+            await pilot.click("#btn_view_toggle")
+        cambio_vista = await _medir(pilot, alternar, repeticiones=REPETICIONES * 2)
+
+    return {
+        "n": n,
+        "arranque_s": round(arranque, 3),
+        "primer_pintado_s": round(primer_pintado, 3),
+        "click_mas_ms": click_mas,
+        "tarea_anadir_ms": tarea_anadir,
+        "tarea_marcar_ms": tarea_marcar,
+        "cambio_vista_ms": cambio_vista,
+        "rss_pico_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }
+
+
+async def _caso_lote(n, altas=500):
+    """Frames pintados por cada op masiva, ms de aplicarla (almacén y vistas)
+    y ms hasta que la app se asienta (incluye la espera de Pilot)."""
+    app = tui_app.StudyApp()
+    async with app.run_test(size=(200, 60)) as pilot:
+        await pilot.pause()
+        app.plan  # suscrito, como cuando se ha abierto la vista del plan
+        frames = [0]
+        pintar = app._display
+        def contar(*args):
+            frames[0] += 1
+            return pintar(*args)
+        app._display = contar
+
+        async def medir(accion):
+            await pilot.pause()
+            frames[0] = 0
+            t = time.perf_counter()
+            accion()
+            aplicar = time.perf_counter() - t
+            await pilot.pause()
+            return {"frames": frames[0], "aplicar_ms": round(aplicar * 1000, 3),
+                    "ms": round((time.perf_counter() - t) * 1000, 3)}
+
+        materias = app.almacen.lista_materias()
+        reinicio = await medir(lambda: app.guardar_todo(logic.op_reiniciar_semana(materias)))
+        assert all(m.horas_acumuladas == 0 for m in materias), "el reinicio no llegó al almacén"
+        deshacer = await medir(app.action_deshacer)
+
+        def nuevas(etiqueta):
+            return [logic.op_crear_materia(logic.Materia(f"{etiqueta} {i:05d}", 2)) for i in range(altas)]
+        def op_a_op():
+            for op in nuevas("Suelta"):
+                app.guardar_todo(op)
+        suelta = await medir(op_a_op)
+        en_lote = await medir(lambda: app.guardar_todo(logic.op_lote(nuevas("Lote"))))
+        assert len(app.almacen.materias) == n + 2 * altas
+
+    return {"n": n, "reinicio": reinicio, "deshacer_reinicio": deshacer,
+            f"altas_{altas}_op_a_op": suelta, f"altas_{altas}_en_lote": en_lote}
+
+
+def _commit_actual():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def _subproceso(caso, n, tareas=None):
+    """Corre `benchmark.py <caso> n` en su directorio temporal con el fixture."""
+    with tempfile.TemporaryDirectory() as directorio:
+        generar_fixture(directorio, n, tareas)
+        proc = subprocess.run([sys.executable, os.path.abspath(__file__), caso, str(n)],
+                              cwd=directorio, capture_output=True, text=True,
+                              env=dict(os.environ, XDG_DATA_HOME=directorio, TRACKER_ESPACIO=""))
+    if proc.returncode != 0:
+        raise RuntimeError(f"caso {n} falló:\n{proc.stderr}")
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def bench_pilot(tamanos=TAMANOS):
+    """Un subproceso por tamaño, cada uno en su directorio temporal."""
+    resultados = [_subproceso("_caso", n) for n in tamanos]
+    return {"commit": _commit_actual(), "python": sys.version.split()[0], "casos": resultados}
+
+
+def main(argv):
+    que = argv[1] if len(argv) > 1 else "barras"
+    if que == "barras":
+        for nombre, us in bench_barras().items():
+            print(f"{nombre:<10} {us:8.2f} µs/frame")
+        print(tui_app._barra.cache_info())
+    elif que == "filtro":
+        res = bench_filtro(int(argv[2]) if len(argv) > 2 else 10000)
+        print(f"{res['n']} entradas: índice en {res['construir_ms']:.1f} ms, "
+              f"alta+baja {res['parche_us']:.0f} µs, {res['resultados']} resultados")
+        for prefijo, ms in res["teclas_ms"].items():
+            print(f"  {prefijo!r:<26} {ms:7.3f} ms")
+        print(f"peor tecla: {max(res['teclas_ms'].values()):.3f} ms")
+    elif que == "plan":
+        res = bench_plan(int(argv[2]) if len(argv) > 2 else 500)
+        print(f"{res['n']} materias, {res['ciclos']} ciclos, {res['sin_hueco']} sin hueco")
+        print(f"  replanificar entero  {res['completo_ms']:8.2f} ms")
+        print(f"  tras una sesión      {res['incremental_ms']:8.3f} ms (mediana), "
+              f"{res['incremental_max_ms']:.3f} ms (peor)")
+    elif que == "lote":
+        # Pocas tareas: aquí se mide el panel de materias, no la lista de tareas
+        res = _subproceso("_caso_lote", int(argv[2]) if len(argv) > 2 else 5000, tareas=50)
+        print(f"{res.pop('n')} materias")
+        for nombre, r in res.items():
+            print(f"  {nombre:<22} {r['frames']:3d} frames {r['aplicar_ms']:9.2f} ms aplicar {r['ms']:9.2f} ms total")
+    elif que == "pilot":
+        salida = argv[2] if len(argv) > 2 else "benchmark.json"
+        tamanos = [int(n) for n in argv[3:]] or TAMANOS
+        resultados = bench_pilot(tamanos)
+        with open(salida, 'w') as f:
+            json.dump(resultados, f, indent=4)
+        for caso in resultados["casos"]:
+            print(json.dumps(caso))
+    elif que == "_caso":
+        # Proceso hijo de `pilot`: su $XDG_DATA_HOME es el directorio del fixture
+        print(json.dumps(asyncio.run(_caso_pilot(int(argv[2])))))
+    elif que == "_caso_lote":
+        print(json.dumps(asyncio.run(_caso_lote(int(argv[2])))))
+
+
+if __name__ == "__main__":
+    main(sys.argv)
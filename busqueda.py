@@ -0,0 +1,130 @@
+# busqueda.py
+"""
+Filtro difuso de materias y tareas. Cada lista tiene un índice invertido de
+trigramas casefold (trigrama -> ids) que se parchea con las ops del almacén,
+así que buscar no recorre las entradas: cuenta trigramas compartidos con la
+consulta (tolera erratas) y ordena primero subcadenas y prefijos. Las
+tildes no cuentan: "matematicas" encuentra "Matemáticas".
+
+    buscador = busqueda.Buscador(almacen)
+    buscador.materias.buscar("calclo")   # -> [id de "Cálculo", ...]
+"""
+import collections
+import math
+import unicodedata
+
+import logic
+
+UMBRAL = 0.5  # fracción mínima de trigramas de la consulta que debe compartir una entrada
+
+def normalizar(texto):
+    """Clave de búsqueda: la del índice de nombres (casefold) y sin tildes."""
+    texto = unicodedata.normalize("NFKD", logic.clave_nombre(texto))
+    return "".join(c for c in texto if not unicodedata.combining(c))
+
+def trigramas(clave, final=True):
+    """Trigramas de una clave ya normalizada; el relleno marca el inicio (y el final)."""
+    texto = "  " + clave + (" " if final else "")
+    return {texto[i:i + 3] for i in range(len(texto) - 2)}
+
+class IndiceDifuso:
+    """Índice de trigramas sobre (id, texto); agregar y quitar son O(largo del texto)."""
+
+    def __init__(self, entradas=()):
+        self._claves = {}   # id -> texto normalizado (en orden de alta)
+        self._listas = collections.defaultdict(set)  # trigrama -> ids
+        for eid, texto in entradas:
+            self.agregar(eid, texto)
+
+    def __len__(self):
+        return len(self._claves)
+
+    def agregar(self, eid, texto):
+        if eid in self._claves: self.quitar(eid)
+        clave = self._claves[eid] = normalizar(texto)
+        for g in trigramas(clave):
+            self._listas[g].add(eid)
+
+    def quitar(self, eid):
+        clave = self._claves.pop(eid, None)
+        if clave is None: return
+        for g in trigramas(clave):
+            ids = self._listas[g]
+            ids.discard(eid)
+            if not ids: del self._listas[g]
+
+    @staticmethod
+    def _puntuar(clave, consulta, compartidos, total):
+        puntaje = compartidos / total
+        posicion = clave.find(consulta)
+        if posicion == 0: puntaje += 2
+        elif posicion > 0: puntaje += 1
+        return puntaje
+
+    def buscar(self, consulta, limite=None):
+        """Ids que coinciden con `consulta`, el mejor primero. Consulta vacía: todos, en orden."""
+        consulta = normalizar(consulta)
+        if not consulta:
+            return list(self._claves)[:limite]
+        if len(consulta) < 3:
+            # Muy corta para trigramas con sentido: subcadena directa
+            candidatos = ((eid, clave) for eid, clave in self._claves.items() if consulta in clave)
+            puntajes = {eid: self._puntuar(clave, consulta, 1, 1) for eid, clave in candidatos}
+        else:
+            grams = trigramas(consulta, final=False)
+            cuenta = collections.Counter()
+            for g in grams:
+                cuenta.update(self._listas.get(g, ()))
+            minimo = max(1, math.ceil(len(grams) * UMBRAL))
+            puntajes = {eid: self._puntuar(self._claves[eid], consulta, n, len(grams))
+                        for eid, n in cuenta.items() if n >= minimo}
+        claves = self._claves
+        orden = sorted(puntajes, key=lambda eid: (-puntajes[eid], len(claves[eid])))
+        return orden[:limite]
+
+    def coincide(self, eid, consulta):
+        """Si `eid` saldría en buscar(consulta), sin recorrer el índice."""
+        consulta, actual = normalizar(consulta), self._claves.get(eid)
+        if actual is None: return False
+        if len(consulta) < 3: return consulta in actual
+        grams = trigramas(consulta, final=False)
+        return len(grams & trigramas(actual)) >= max(1, math.ceil(len(grams) * UMBRAL))
+
+class Buscador:
+    """Índices de materias y tareas enganchados a los avisos del almacén.
+    Cada uno se construye con su primera búsqueda, no en el arranque."""
+
+    def __init__(self, almacen):
+        self.almacen = almacen
+        self._materias = self._tareas = None
+        almacen.suscribir(self._al_cambiar)
+
+    @property
+    def materias(self):
+        if self._materias is None:
+            self._materias = IndiceDifuso((m.id, m.nombre) for m in self.almacen.materias.values())
+        return self._materias
+
+    @property
+    def tareas(self):
+        if self._tareas is None:
+            self._tareas = IndiceDifuso((t.id, t.texto) for t in self.almacen.todos)
+        return self._tareas
+
+    def _al_cambiar(self, op):
+        # Un índice aún sin construir ya verá el cambio cuando se construya
+        tipo, materias, tareas = op["op"], self._materias, self._tareas
+        if tipo == "lote":
+            for o in op["ops"]: self._al_cambiar(o)
+        elif tipo == "recarga":
+            self._materias = self._tareas = None
+        elif materias is not None and tipo == "materia_crear":
+            materias.agregar(op["materia"]["id"], op["materia"]["nombre"])
+        elif materias is not None and tipo == "materia_renombrar":
+            materias.agregar(op["id"], op["nombre"])
+        elif materias is not None and tipo == "materia_borrar":
+            materias.quitar(op["id"])
+        elif tareas is not None and tipo == "tarea_crear":
+            tareas.agregar(op["tarea"]["id"], op["tarea"]["text"])
+        elif tareas is not None and tipo == "tarea_borrar":
+            tareas.quitar(op["id"])
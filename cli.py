@@ -0,0 +1,217 @@
+# cli.py
+"""
+Entrada de línea de comandos (sin interfaz) para mover datos en bloque:
+
+    python cli.py importar materias materias.csv
+    cat tareas.jsonl | python cli.py importar todos -
+    python cli.py exportar dias -f csv > historial.csv
+    python cli.py exportar materias -o materias.jsonl
+
+y para hablar con el demonio (demonio.py) sin abrir la TUI:
+
+    python cli.py log Física 1.5
+    python cli.py iniciar Física      # ciclo WORK de 90 min
+    python cli.py pausar | descanso | detener
+    python cli.py estado              # "WORK 84:12", para polybar / tmux
+
+Trabaja sobre el espacio activo (el último abierto en la app, o --espacio)
+igual que tui_app.py; puede usarse con la app abierta.
+
+    python cli.py espacios                 # totales de cada espacio (solo cabeceras)
+    python cli.py --espacio Verano exportar materias
+"""
+import argparse
+import json
+import math
+import sys
+
+import datetime
+
+import demonio
+import espacios
+import intercambio
+import logic
+
+def _importar(args):
+    formato = args.formato or intercambio.formato_de(args.archivo)
+    flujo = sys.stdin if args.archivo == "-" else open(args.archivo, newline="", encoding="utf-8")
+    try:
+        with flujo:
+            ok, resultado = intercambio.importar(args.tipo, intercambio.leer(flujo, formato))
+    except ValueError as e:  # JSON mal formado: se corta antes de aplicar nada
+        ok, resultado = False, [f"entrada ilegible: {e}"]
+    if not ok:
+        for error in resultado:
+            print(error, file=sys.stderr)
+        print("Importación cancelada: no se aplicó nada.", file=sys.stderr)
+        return 1
+    print(f"Importación completa: {resultado} registros de {args.tipo}.", file=sys.stderr)
+    return 0
+
+def _exportar(args):
+    formato = args.formato or intercambio.formato_de(args.salida)
+    flujo = sys.stdout if args.salida == "-" else open(args.salida, "w", newline="", encoding="utf-8")
+    try:
+        with flujo:
+            intercambio.escribir(intercambio.exportar(args.tipo), flujo, formato, intercambio.CAMPOS[args.tipo])
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 1
+    except BrokenPipeError:  # `| head` cierra la tubería antes de tiempo
+        pass
+    return 0
+
+def _finito(texto):
+    """Tipo de argparse: float, pero sin nan ni inf."""
+    valor = float(texto)
+    if not math.isfinite(valor):
+        raise argparse.ArgumentTypeError(f"número no válido: {texto!r}")
+    return valor
+
+def _minutos(texto):
+    valor = _finito(texto)
+    if valor <= 0:
+        raise argparse.ArgumentTypeError(f"los minutos deben ser mayores que 0: {texto!r}")
+    return valor
+
+def _log(args):
+    try:
+        if args.espacio:  # el demonio podría tener otro espacio abierto: directo al diario
+            raise ConnectionRefusedError
+        respuesta = demonio.pedir({"cmd": "log", "materia": args.materia, "horas": args.horas})
+    except OSError:
+        # Sin demonio: se anota directo en el diario (seguro con otras instancias abiertas)
+        datos = logic.cargar_datos_globales()
+        almacen = logic.Almacen(datos["materias"], datos["todos"])
+        materia = almacen.materias.get(args.materia) or almacen.buscar(args.materia)
+        if materia is None:
+            respuesta = {"ok": False, "error": f"no existe la materia '{args.materia}'"}
+        else:
+            op = logic.op_horas(materia, logic.comprobar_horas(materia, args.horas))
+            almacen.aplicar(op)
+            logic.diario_global.anotar(op)
+            respuesta = {"ok": True, "materia": materia.to_dict()}
+    if not respuesta["ok"]:
+        print(respuesta["error"], file=sys.stderr)
+        return 1
+    m = respuesta["materia"]
+    print(f"{m['nombre']}: {m['horas_acumuladas']:.1f}/{m['meta']:.1f} h", file=sys.stderr)
+    return 0
+
+def _motor(args):
+    pedido = {"cmd": args.comando}
+    if args.comando == "iniciar":
+        pedido.update(minutos=args.minutos, materia=args.materia)
+    try:
+        respuesta = demonio.pedir(pedido)
+    except PermissionError as e:
+        print(e, file=sys.stderr)
+        return 1
+    except OSError:
+        print(f"No hay demonio escuchando en {demonio.RUTA_SOCKET} (arráncalo con: python demonio.py)", file=sys.stderr)
+        return 1
+    if not respuesta["ok"]:
+        print(respuesta["error"], file=sys.stderr)
+        return 1
+    if args.comando == "estado" and args.json:
+        print(json.dumps(respuesta, ensure_ascii=False))
+    else:
+        motor = respuesta["motor"]
+        print(f"{motor['estado']} {motor['texto']}" + ("" if motor["activo"] or motor["estado"] == "IDLE" else " (pausa)"))
+    return 0
+
+def _espacios(args):
+    if args.adoptar:
+        try:
+            espacios.adoptar(args.adoptar)
+        except (OSError, ValueError) as e:
+            print(e, file=sys.stderr)
+            return 1
+        print(f"Datos de {espacios.SNAPSHOT} copiados al espacio '{args.adoptar}'.", file=sys.stderr)
+    elif args.activar:
+        try:
+            espacios.preparar(args.activar)
+            espacios.fijar_activo(args.activar)
+        except (OSError, ValueError) as e:
+            print(e, file=sys.stderr)
+            return 1
+    activo = espacios.activo()
+    for nombre, c in espacios.resumen():
+        marca = "*" if nombre == activo else " "
+        if c is None:
+            print(f"{marca} {nombre:<24} (sin cabecera)")
+            continue
+        guardado = datetime.datetime.fromtimestamp(c.get("guardado", 0)).strftime("%Y-%m-%d %H:%M")
+        print(f"{marca} {nombre:<24} {c.get('horas', 0):6.1f}/{c.get('meta', 0):.1f} h  "
+              f"{c.get('materias', 0)} materias  {c.get('hechas', 0)}/{c.get('tareas', 0)} tareas  {guardado}")
+    return 0
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="cli.py", description="Importa / exporta datos del tracker (CSV o JSONL).")
+    parser.add_argument("--espacio", help="espacio sobre el que trabajar (por defecto, el activo)")
+    sub = parser.add_subparsers(dest="comando", required=True)
+
+    imp = sub.add_parser("importar", help="valida y aplica un lote en una sola transacción")
+    imp.add_argument("tipo", choices=intercambio.IMPORTABLES)
+    imp.add_argument("archivo", help="ruta o '-' para stdin")
+    imp.add_argument("-f", "--formato", choices=intercambio.FORMATOS, help="por defecto, según la extensión (jsonl para stdin)")
+    imp.set_defaults(funcion=_importar)
+
+    exp = sub.add_parser("exportar", help="vuelca en streaming")
+    exp.add_argument("tipo", choices=tuple(intercambio.CAMPOS))
+    exp.add_argument("-o", "--salida", default="-", help="ruta o '-' para stdout (por defecto)")
+    exp.add_argument("-f", "--formato", choices=intercambio.FORMATOS, help="por defecto, según la extensión (jsonl para stdout)")
+    exp.set_defaults(funcion=_exportar)
+
+    log = sub.add_parser("log", help="suma (o resta) horas a una materia")
+    log.add_argument("materia", help="nombre o id")
+    log.add_argument("horas", type=_finito)
+    log.set_defaults(funcion=_log)
+
+    ini = sub.add_parser("iniciar", help="arranca un ciclo WORK en el demonio")
+    ini.add_argument("materia", nargs="?", help="nombre o id de la materia del ciclo")
+    ini.add_argument("-m", "--minutos", type=_minutos, default=90)
+    ini.set_defaults(funcion=_motor)
+    for orden, ayuda in (("pausar", "pausa o reanuda"), ("descanso", "arranca el descanso dinámico"),
+                         ("detener", "vuelve a IDLE")):
+        sub.add_parser(orden, help=ayuda).set_defaults(funcion=_motor)
+    est = sub.add_parser("estado", help="estado del motor (una línea, o --json)")
+    est.add_argument("--json", action="store_true")
+    est.set_defaults(funcion=_motor)
+
+    esp = sub.add_parser("espacios", help="lista los espacios con sus totales")
+    esp.add_argument("--activar", metavar="NOMBRE", help="lo deja como activo (creándolo si falta)")
+    esp.add_argument("--adoptar", metavar="NOMBRE",
+                     help=f"copia el {espacios.SNAPSHOT} del directorio actual a un espacio nuevo")
+    esp.set_defaults(funcion=_espacios)
+
+    args = parser.parse_args(argv)
+    if args.comando in ("importar", "exportar", "log", "espacios"):
+        # Solo lo que toca datos locales abre (y crea, si falta) un espacio
+        try:
+            if args.comando == "espacios":
+                aviso = espacios.aviso_legado()
+            elif args.espacio:
+                logic.abrir_espacio(args.espacio)
+                aviso = espacios.aviso_legado()
+            else:
+                aviso = logic.iniciar()
+        except (OSError, ValueError) as e:
+            print(e, file=sys.stderr)
+            return 1
+        if aviso: print(aviso, file=sys.stderr)
+    try:
+        codigo = args.funcion(args)
+    except ValueError as e:  # p. ej. datos del espacio ilegibles: mejor parar que seguir con otros
+        print(e, file=sys.stderr)
+        return 1
+    if args.comando in ("importar", "log"):
+        # Lo anotado pasa al snapshot: la cabecera que lee `espacios` queda al día
+        try:
+            logic.diario_global.cerrar()
+        except OSError:
+            pass
+    return codigo
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,326 @@
+# demonio.py
+"""
+Demonio residente: un solo proceso es dueño del almacén y del motor
+ultradiano, y los expone por un socket Unix (asyncio, JSON por líneas).
+
+    python demonio.py            # en primer plano; cli.py y la TUI se enganchan solos
+
+Protocolo: cada línea es un pedido {"cmd": ...} y recibe una línea de
+respuesta {"ok": true, ...} o {"ok": false, "error": ...}. Tras "suscribir"
+la conexión recibe además eventos empujados: {"evento": "op"|"motor"|"datos"}.
+Para barras de estado basta un socat:
+
+    echo '{"cmd": "estado"}' | socat - UNIX-CONNECT:$XDG_RUNTIME_DIR/tracker-tui-$(id -u).sock
+"""
+import asyncio
+import json
+import os
+import signal
+import socket
+import stat
+import sys
+import tempfile
+
+import logic
+
+# Sin XDG_RUNTIME_DIR (que ya es privado) el socket no va suelto en /tmp, donde
+# cualquiera puede adelantarse con ese nombre, sino dentro de un directorio 0700
+DIRECTORIO_TMP = os.path.join(tempfile.gettempdir(), f"tracker-tui-{os.getuid()}")
+RUTA_SOCKET = os.environ.get("TRACKER_SOCKET") or (
+    os.path.join(os.environ["XDG_RUNTIME_DIR"], f"tracker-tui-{os.getuid()}.sock")
+    if os.environ.get("XDG_RUNTIME_DIR") else os.path.join(DIRECTORIO_TMP, "demonio.sock"))
+
+# Ops que un cliente puede pedir tal cual (las mismas que produce la TUI)
+OPS_CLIENTE = {"horas", "materia_crear", "materia_borrar", "materia_renombrar", "reiniciar_semana",
+               "semana_restaurar", "tarea_crear", "tarea_marcar", "tarea_borrar", "tarea_mover"}
+ORDENES_MOTOR = ("iniciar", "pausar", "descanso", "detener")
+TIMEOUT_CONEXION = 2.0     # s que espera la TUI la respuesta a "suscribir"
+LIMITE_LINEA = 64 * 2**20  # el estado completo y los lotes van en una sola línea
+
+def _numero(valor):
+    """Número de un pedido ("1.5" vale como 1.5); si es válido lo deciden logic.comprobar_*."""
+    if isinstance(valor, bool):
+        raise ValueError(f"no es un número: {valor!r}")
+    return float(valor)
+
+def _comprobar_dueno(ruta):
+    """PermissionError si el socket no es del usuario: podría ser un impostor
+    que se quede con las ops (y las responda) de cli.py o de la TUI."""
+    if os.stat(ruta).st_uid != os.getuid():
+        raise PermissionError(f"{ruta} pertenece a otro usuario; no se usa")
+
+def _directorio_privado(directorio):
+    """Crea (0700) el directorio del socket en /tmp y comprueba que es nuestro
+    y nadie más puede entrar; SystemExit si no."""
+    try:
+        os.mkdir(directorio, 0o700)
+    except FileExistsError:
+        pass
+    except OSError as e:
+        raise SystemExit(f"No se pudo crear {directorio}: {e}")
+    info = os.lstat(directorio)
+    if not stat.S_ISDIR(info.st_mode) or info.st_uid != os.getuid() or info.st_mode & 0o077:
+        raise SystemExit(f"{directorio} no es un directorio privado de este usuario (0700); bórralo o usa TRACKER_SOCKET")
+
+def _linea(mensaje):
+    return (json.dumps(mensaje, ensure_ascii=False) + "\n").encode()
+
+# --- Cliente síncrono (cli.py, scripts) ---
+def pedir(pedido, ruta=RUTA_SOCKET, timeout=2.0):
+    """Un pedido y su respuesta. Lanza OSError si no hay demonio escuchando
+    (PermissionError si el socket es de otro usuario)."""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+        s.settimeout(timeout)
+        _comprobar_dueno(ruta)
+        s.connect(ruta)
+        s.sendall(_linea(pedido))
+        with s.makefile("rb") as f:
+            respuesta = f.readline()
+    if not respuesta:
+        raise ConnectionError("el demonio cerró la conexión")
+    return json.loads(respuesta)
+
+# --- Cliente asíncrono (la TUI) ---
+class Cliente:
+    """Conexión suscrita: manda ops y órdenes sin esperar y recibe los eventos."""
+
+    def __init__(self, lector, escritor):
+        self._lector = lector
+        self._escritor = escritor
+
+    @classmethod
+    async def conectar(cls, ruta=RUTA_SOCKET):
+        """Cliente suscrito y el estado completo, o (None, None) si no hay demonio."""
+        try:
+            _comprobar_dueno(ruta)
+            lector, escritor = await asyncio.open_unix_connection(ruta, limit=LIMITE_LINEA)
+        except OSError:
+            return None, None
+        cliente = cls(lector, escritor)
+        escritor.write(_linea({"cmd": "suscribir"}))
+        try:
+            # Un demonio colgado no puede dejar la TUI sin arrancar: se sigue en local
+            respuesta = json.loads(await asyncio.wait_for(lector.readline(), TIMEOUT_CONEXION) or b"{}")
+        except (asyncio.TimeoutError, OSError, ValueError):
+            respuesta = {}
+        if not isinstance(respuesta, dict) or not respuesta.get("ok"):
+            escritor.close()
+            return None, None
+        return cliente, respuesta["datos"]
+
+    def enviar(self, pedido):
+        self._escritor.write(_linea(pedido))
+
+    # Mismo contrato que logic.Persistidor: la app le encola sus ops
+    def encolar(self, op):
+        self.enviar({"cmd": "op", "op": op})
+
+    def detener(self):
+        self._escritor.close()
+
+    async def eventos(self):
+        """Genera eventos empujados y respuestas con error; termina si se cae el demonio."""
+        while True:
+            linea = await self._lector.readline()
+            if not linea:
+                return
+            mensaje = json.loads(linea)
+            if "evento" in mensaje or not mensaje.get("ok", True):
+                yield mensaje
+
+# --- Servidor ---
+class Demonio:
+    def __init__(self, ruta=RUTA_SOCKET):
+        self.ruta = ruta
+        datos = logic.cargar_datos_globales()
+        self.almacen = logic.Almacen(datos["materias"], datos["todos"], motor=logic.GestorUltradiano(),
+                                     historial=datos["historial"])
+        self.persistidor = logic.Persistidor(logic.diario_global)
+        self.vigilante = None
+        self.almacen.suscribir(self._al_cambiar)
+        self._suscritos = set()
+        self._emisor = None   # conexión que originó la op en curso (no se le devuelve)
+        self._alarma = None   # fin del ciclo en marcha
+        self._bucle = None
+
+    def datos(self):
+        return {
+            "materias": [m.to_dict() for m in self.almacen.materias.values()],
+            "todos": self.almacen.todos.a_dicts(),
+            "historial": self.almacen.historial.to_dict(),
+            "motor": self.almacen.motor.exportar(),
+            "espacio": logic.espacio_actual,
+        }
+
+    def _difundir(self, mensaje, excepto=None):
+        linea = _linea(mensaje)
+        for escritor in tuple(self._suscritos):
+            if escritor is not excepto:
+                escritor.write(linea)
+
+    def _al_cambiar(self, op):
+        if op["op"] == "recarga":
+            self._difundir({"evento": "datos", "datos": self.datos()})
+            return
+        if "origen" not in op:  # lo que viene del diario ya está escrito
+            self.persistidor.encolar(op)
+        # Un lote se difunde entero: cada cliente lo aplica con un solo repintado
+        self._difundir({"evento": "op", "op": op}, excepto=self._emisor)
+
+    def _aplicar(self, op, emisor=None):
+        self._emisor = emisor
+        try:
+            self.almacen.aplicar(op)
+        finally:
+            self._emisor = None
+
+    # --- Motor: el demonio es el único que lo hace avanzar ---
+    def _motor_cambio(self):
+        if self._alarma is not None:
+            self._alarma.cancel()
+            self._alarma = None
+        motor = self.almacen.motor
+        if motor.activo:
+            # No hace falta un tick por segundo: los clientes cuentan solos
+            self._alarma = self._bucle.call_later(motor.restante() + 0.01, self._fin_de_ciclo)
+        self._difundir({"evento": "motor", "motor": motor.exportar()})
+
+    def _fin_de_ciclo(self):
+        self._alarma = None
+        motor = self.almacen.motor
+        if motor.tick() and motor.state == "WORK":
+            self._aplicar(logic.op_ciclo_completo(self.almacen.materias.get(motor.materia_id),
+                                                  motor.elapsed_work / 60, motor.materia_id))
+        self._motor_cambio()
+
+    # --- Pedidos ---
+    def _responder(self, pedido, escritor):
+        if not isinstance(pedido, dict):
+            raise ValueError("cada pedido debe ser un objeto JSON")
+        cmd = pedido.get("cmd")
+        motor = self.almacen.motor
+        if cmd == "estado":
+            return {"ok": True, "motor": dict(motor.instantanea(), materia_id=motor.materia_id),
+                    "stats": self.almacen.estadisticas(), "espacio": logic.espacio_actual}
+        if cmd == "datos":
+            return {"ok": True, "datos": self.datos()}
+        if cmd == "suscribir":
+            self._suscritos.add(escritor)
+            return {"ok": True, "datos": self.datos()}
+        if cmd == "op":
+            # Todo el pedido se valida antes de aplicar: un lote no queda a medias
+            op = pedido["op"]
+            logic.validar_op(op)
+            for o in op["ops"] if op["op"] == "lote" else (op,):
+                if o["op"] not in OPS_CLIENTE:
+                    raise ValueError(f"op no admitida: {o['op']}")
+                materia = self.almacen.materias.get(o.get("id"))
+                if o["op"] == "horas" and materia and ("ts" not in o or self.almacen.cuenta_en_semana(o["ts"])):
+                    logic.comprobar_horas(materia, o["delta"])
+            self._aplicar(op, escritor)
+            return {"ok": True}
+        if cmd == "log":
+            materia = self.almacen.materias.get(pedido["materia"]) or self.almacen.buscar(pedido["materia"])
+            if materia is None:
+                raise ValueError(f"no existe la materia '{pedido['materia']}'")
+            horas = logic.comprobar_horas(materia, _numero(pedido["horas"]))
+            self._aplicar(logic.op_horas(materia, horas))
+            return {"ok": True, "materia": materia.to_dict()}
+        if cmd in ORDENES_MOTOR:
+            materia = pedido.get("materia")
+            if materia and materia not in self.almacen.materias:
+                encontrada = self.almacen.buscar(materia)
+                materia = encontrada.id if encontrada else None
+            minutos = logic.comprobar_minutos(_numero(pedido.get("minutos", 90)))
+            motor.ejecutar(cmd, minutos=minutos, materia_id=materia)
+            self._motor_cambio()
+            return {"ok": True, "motor": motor.instantanea()}
+        raise ValueError(f"comando desconocido: {cmd}")
+
+    async def _atender(self, lector, escritor):
+        try:
+            async for linea in lector:
+                try:
+                    respuesta = self._responder(json.loads(linea), escritor)
+                except (ValueError, KeyError, TypeError) as e:
+                    respuesta = {"ok": False, "error": str(e)}
+                escritor.write(_linea(respuesta))
+                await escritor.drain()
+        except (ConnectionError, ValueError):  # ValueError: línea más larga que LIMITE_LINEA
+            pass
+        finally:
+            self._suscritos.discard(escritor)
+            escritor.close()
+
+    def _cambio_externo(self):
+        # Hilo del vigilante: otra instancia (o cli.py importar) tocó el diario
+        ops = logic.diario_global.sincronizar()
+        if ops is None:
+            self._bucle.call_soon_threadsafe(self._recargar)
+        elif ops:
+            self._bucle.call_soon_threadsafe(self._aplicar, logic.op_lote(ops, origen="diario"))
+
+    async def _vigilar_semana(self):
+        # Al cambiar la semana ISO los contadores pasan a la nueva (y se difunde como recarga)
+        while True:
+            await asyncio.sleep(60)
+            self.almacen.al_dia()
+
+    def _recargar(self):
+        try:
+            datos = logic.cargar_datos_globales()
+        except ValueError as e:
+            # Se sigue sirviendo lo que hay en memoria, que sí es legible
+            print(e, file=sys.stderr)
+            return
+        self.almacen.reemplazar(datos["materias"], datos["todos"], datos["historial"])
+
+    async def servir(self):
+        self._bucle = asyncio.get_running_loop()
+        if os.path.dirname(self.ruta) == DIRECTORIO_TMP:
+            _directorio_privado(DIRECTORIO_TMP)
+        if os.path.exists(self.ruta):
+            try:
+                pedir({"cmd": "estado"}, self.ruta, timeout=0.5)
+                raise SystemExit(f"Ya hay un demonio escuchando en {self.ruta}")
+            except OSError:
+                try:
+                    os.unlink(self.ruta)  # socket huérfano de un demonio muerto
+                except OSError as e:
+                    raise SystemExit(f"No se pudo borrar el socket huérfano {self.ruta}: {e}")
+        # El socket nace ya con 0600: sin ventana entre bind y chmod
+        umask = os.umask(0o177)
+        try:
+            servidor = await asyncio.start_unix_server(self._atender, path=self.ruta, limit=LIMITE_LINEA)
+        finally:
+            os.umask(umask)
+        tarea = asyncio.current_task()
+        for senal in (signal.SIGINT, signal.SIGTERM):  # salir limpio: vaciar la cola y borrar el socket
+            self._bucle.add_signal_handler(senal, tarea.cancel)
+        rutas = logic.diario_global.rutas_vigiladas()
+        self.vigilante = logic.Vigilante(rutas, self._cambio_externo) if rutas else None
+        semana = asyncio.create_task(self._vigilar_semana())
+        try:
+            async with servidor:
+                await servidor.serve_forever()
+        except asyncio.CancelledError:
+            pass
+        finally:
+            semana.cancel()
+            if os.path.exists(self.ruta): os.unlink(self.ruta)
+            if self.vigilante: self.vigilante.detener()
+            self.persistidor.detener()
+            logic.diario_global.cerrar()  # cabecera al día y arranque rápido de la próxima carga
+
+def main():
+    aviso = logic.iniciar()
+    if aviso: print(aviso, file=sys.stderr)
+    try:
+        demonio = Demonio()
+    except ValueError as e:
+        raise SystemExit(str(e))
+    print(f"Demonio escuchando en {RUTA_SOCKET} (espacio: {logic.espacio_actual})")
+    asyncio.run(demonio.servir())
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+# deshacer.py
+"""
+Deshacer / rehacer sobre el registro de operaciones, no sobre copias del
+estado. Cada op propia que aplica el almacén se apila tal cual: las
+destructivas ya llevan lo necesario para invertirse (la materia borrada, las
+horas previas a un reinicio, el nombre anterior, el sitio de la tarea). La
+memoria crece con el número de ops (acotado a LIMITE) y deshacer aplica una
+op inversa que toca solo lo que tocó la original.
+
+    pila = deshacer.Deshacer(almacen)
+    pila.deshacer()   # -> la op deshecha, o None
+    pila.rehacer()
+"""
+import collections
+
+import logic
+
+LIMITE = 200  # ops por pila
+
+def inversa(op):
+    """Op que deshace `op`, o None si no se puede (ciclos, ops viejas sin datos)."""
+    tipo = op["op"]
+    if tipo == "lote":
+        # Se deshace de atrás hacia delante, en un solo lote
+        inversas = [i for i in map(inversa, reversed(op["ops"])) if i is not None]
+        return logic.op_lote(inversas) if inversas else None
+    if tipo == "horas":
+        inv = {"op": "horas", "id": op["id"], "delta": -op["delta"]}
+        if "ts" in op: inv["ts"] = op["ts"]  # se descuenta del mismo día del historial
+        return inv
+    if tipo == "materia_crear":
+        return {"op": "materia_borrar", "id": op["materia"]["id"], "materia": op["materia"]}
+    if tipo == "materia_borrar" and "materia" in op:
+        return {"op": "materia_crear", "materia": op["materia"]}
+    if tipo == "materia_renombrar" and "anterior" in op:
+        return {"op": "materia_renombrar", "id": op["id"], "nombre": op["anterior"], "anterior": op["nombre"]}
+    if tipo == "reiniciar_semana" and "horas" in op:
+        return logic.op_restaurar_semana(op["ts"], op["horas"])
+    if tipo == "semana_restaurar":
+        return {"op": "reiniciar_semana", "ts": op["ts"], "horas": op["horas"]}
+    if tipo == "tarea_crear":
+        return {"op": "tarea_borrar", "id": op["tarea"]["id"], "tarea": op["tarea"],
+                "despues_de": op.get("despues_de", "")}
+    if tipo == "tarea_borrar" and "tarea" in op:
+        return {"op": "tarea_crear", "tarea": op["tarea"], "despues_de": op["despues_de"]}
+    if tipo == "tarea_marcar":
+        return {"op": "tarea_marcar", "id": op["id"], "done": not op["done"]}
+    if tipo == "tarea_mover" and "antes" in op:
+        return {"op": "tarea_mover", "id": op["id"], "despues_de": op["antes"], "antes": op["despues_de"]}
+    return None
+
+def describir(op, almacen):
+    """Texto corto de una op para las notificaciones."""
+    tipo = op["op"]
+    if tipo == "lote":
+        return f"{len(op['ops'])} cambios" if len(op["ops"]) != 1 else describir(op["ops"][0], almacen)
+    if tipo == "horas":
+        m = almacen.materias.get(op["id"])
+        return f"{op['delta']:+.1f} h en {m.nombre if m else 'materia borrada'}"
+    if tipo in ("materia_crear", "materia_borrar"):
+        verbo = "crear" if tipo == "materia_crear" else "borrar"
+        return f"{verbo} la materia '{op['materia']['nombre']}'"
+    if tipo == "materia_renombrar":
+        return f"renombrar '{op['anterior']}' a '{op['nombre']}'"
+    if tipo == "reiniciar_semana":
+        return "reiniciar la semana"
+    if tipo == "semana_restaurar":
+        return "restaurar la semana"
+    if tipo in ("tarea_crear", "tarea_borrar"):
+        verbo = "crear" if tipo == "tarea_crear" else "borrar"
+        return f"{verbo} la tarea '{op['tarea']['text']}'"
+    t = almacen.todos.get(op["id"])
+    texto = t.texto if t else "?"
+    if tipo == "tarea_marcar":
+        return f"marcar '{texto}'" if op["done"] else f"desmarcar '{texto}'"
+    return f"mover '{texto}'"
+
+class Deshacer:
+    """Pilas de deshacer y rehacer enganchadas a los avisos del almacén.
+    Solo se apilan las ops de esta instancia (las ajenas traen "origen")."""
+
+    def __init__(self, almacen, limite=LIMITE):
+        self.almacen = almacen
+        self._hechas = collections.deque(maxlen=limite)
+        self._deshechas = collections.deque(maxlen=limite)
+        self._propia = None  # op que está aplicando la propia pila
+        almacen.suscribir(self._al_cambiar)
+
+    def __len__(self):
+        return len(self._hechas)
+
+    def _al_cambiar(self, op):
+        if op is self._propia: return
+        if op["op"] == "recarga":
+            # Estado nuevo entero (otro espacio, recarga): las inversas ya no valen
+            self._hechas.clear()
+            self._deshechas.clear()
+        elif "origen" not in op and inversa(op) is not None:
+            self._hechas.append(op)
+            self._deshechas.clear()
+
+    def _aplicar(self, op):
+        self._propia = op
+        try:
+            self.almacen.aplicar(op)
+        finally:
+            self._propia = None
+
+    def deshacer(self):
+        """Aplica la inversa de la última op propia; retorna la op deshecha o None."""
+        if not self._hechas: return None
+        op = self._hechas.pop()
+        self._aplicar(inversa(op))
+        self._deshechas.append(op)
+        return op
+
+    def rehacer(self):
+        """Vuelve a aplicar la última op deshecha; retorna la op o None."""
+        if not self._deshechas: return None
+        op = self._deshechas.pop()
+        self._aplicar(op)
+        self._hechas.append(op)
+        return op
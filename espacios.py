@@ -0,0 +1,173 @@
+# espacios.py
+"""
+Espacios de trabajo (perfiles): cada uno es un shard con sus propias
+materias, tareas e historial, en su propio directorio bajo
+$XDG_DATA_HOME/tracker-tui/espacios/<nombre>/. Solo se carga el activo.
+
+El snapshot de cada shard (progress.json) empieza con una cabecera de una
+sola línea con los totales, así que el resumen de todos los espacios lee
+unos cientos de bytes por shard en vez de parsearlos enteros. Sigue siendo
+JSON válido: la cabecera es su primera clave.
+
+    {
+        "cabecera": {"materias": 9, "horas": 12.5, "meta": 22.0, ...},
+        "seq": 41,
+        ...
+"""
+import json
+import os
+import shutil
+
+RAIZ = os.path.join(os.environ.get("XDG_DATA_HOME") or os.path.expanduser("~/.local/share"), "tracker-tui")
+DIR_ESPACIOS = os.path.join(RAIZ, "espacios")
+ARCHIVO_ACTIVO = os.path.join(RAIZ, "activo")
+# Directorios con datos sueltos ya copiados a un espacio: {ruta: {"espacio", "firma"}}
+ARCHIVO_LEGADOS = os.path.join(RAIZ, "legados.json")
+POR_DEFECTO = "principal"
+SNAPSHOT = "progress.json"
+# Lo que había en el directorio de trabajo antes de los espacios: se copia al principal
+LEGADOS = ("progress.journal", "progress.sqlite3", "horario.json", SNAPSHOT)  # el snapshot, el último
+# Con alguno de estos el shard ya tiene datos propios y no se migra encima
+DATOS = (SNAPSHOT, SNAPSHOT + ".bak", "progress.journal", "progress.sqlite3")
+
+_PREFIJO = b'    "cabecera": '
+_LARGO_CABECERA = 4096
+
+def validar(nombre):
+    """Nombre limpio de un espacio; ValueError si no sirve como directorio."""
+    nombre = (nombre or "").strip()
+    if not nombre or nombre.startswith(".") or "/" in nombre or "\\" in nombre or len(nombre) > 64:
+        raise ValueError(f"nombre de espacio no válido: {nombre!r}")
+    return nombre
+
+def directorio(nombre):
+    return os.path.join(DIR_ESPACIOS, validar(nombre))
+
+def activo():
+    """TRACKER_ESPACIO, o el último elegido en la app, o el principal."""
+    nombre = os.environ.get("TRACKER_ESPACIO")
+    if not nombre:
+        try:
+            with open(ARCHIVO_ACTIVO) as f:
+                nombre = f.read()
+        except OSError:
+            pass
+    try:
+        return validar(nombre)
+    except ValueError:
+        return POR_DEFECTO
+
+def fijar_activo(nombre):
+    """El espacio que abren los próximos arranques."""
+    os.makedirs(RAIZ, exist_ok=True)
+    tmp = f"{ARCHIVO_ACTIVO}.{os.getpid()}.tmp"
+    with open(tmp, "w") as f:
+        f.write(validar(nombre))
+    os.replace(tmp, ARCHIVO_ACTIVO)
+
+def listar():
+    try:
+        nombres = [e.name for e in os.scandir(DIR_ESPACIOS) if e.is_dir() and not e.name.startswith(".")]
+    except FileNotFoundError:
+        return []
+    return sorted(nombres, key=str.casefold)
+
+def tiene_datos(ruta):
+    return any(os.path.exists(os.path.join(ruta, a)) for a in DATOS)
+
+def preparar(nombre, origen_legado="."):
+    """Directorio del espacio, creándolo si falta. El principal, mientras no
+    tenga datos propios, se lleva una copia de los datos sueltos de `origen_legado`."""
+    ruta = directorio(nombre)
+    os.makedirs(ruta, exist_ok=True)
+    if nombre == POR_DEFECTO and not tiene_datos(ruta) and _firma(origen_legado):
+        _copiar_legado(nombre, ruta, origen_legado)
+    return ruta
+
+def adoptar(nombre, origen_legado="."):
+    """Copia los datos sueltos de `origen_legado` a un espacio (nuevo o vacío)."""
+    ruta = directorio(nombre)
+    if not _firma(origen_legado):
+        raise ValueError(f"no hay {SNAPSHOT} ni base SQLite en {os.path.abspath(origen_legado)}")
+    os.makedirs(ruta, exist_ok=True)
+    if tiene_datos(ruta):
+        raise ValueError(f"el espacio '{nombre}' ya tiene datos")
+    _copiar_legado(nombre, ruta, origen_legado)
+    return ruta
+
+def _copiar_legado(nombre, ruta, origen):
+    # Cada archivo se copia aparte y se renombra; el snapshot va el último, así
+    # otra instancia no ve un espacio con snapshot pero sin su diario
+    for archivo in LEGADOS:
+        fuente = os.path.join(origen, archivo)
+        if os.path.exists(fuente):
+            tmp = os.path.join(ruta, f".{archivo}.{os.getpid()}.tmp")
+            shutil.copy2(fuente, tmp)
+            os.replace(tmp, os.path.join(ruta, archivo))
+    legados = _leer_legados()
+    legados[os.path.realpath(origen)] = {"espacio": nombre, "firma": _firma(origen)}
+    tmp = f"{ARCHIVO_LEGADOS}.{os.getpid()}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(legados, f, indent=4)
+    os.replace(tmp, ARCHIVO_LEGADOS)
+
+def _firma(origen):
+    """{archivo: [tamaño, mtime_ns]} de los datos sueltos de `origen` ({} si no hay)."""
+    firma = {}
+    for archivo in DATOS:
+        try:
+            st = os.stat(os.path.join(origen, archivo))
+        except OSError:
+            continue
+        firma[archivo] = [st.st_size, st.st_mtime_ns]
+    return firma if SNAPSHOT in firma or "progress.sqlite3" in firma else {}
+
+def _leer_legados():
+    try:
+        with open(ARCHIVO_LEGADOS) as f:
+            legados = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return legados if isinstance(legados, dict) else {}
+
+def aviso_legado(origen="."):
+    """Texto para el usuario si `origen` tiene datos sueltos que no están en
+    ningún espacio (o que cambiaron desde que se copiaron), o None."""
+    firma = _firma(origen)
+    real = os.path.realpath(origen)
+    if not firma or os.path.dirname(real) == os.path.realpath(DIR_ESPACIOS):
+        return None
+    copia = _leer_legados().get(real)
+    if copia and copia.get("firma") == firma:
+        return None
+    donde = f"el espacio '{copia['espacio']}'" if copia else "ningún espacio"
+    return (f"{os.path.join(real, SNAPSHOT)} no coincide con {donde} y no se cargó. "
+            f"Para abrirlo: python cli.py espacios --adoptar NOMBRE")
+
+# --- Cabecera del shard ---
+def volcar(cabecera, datos):
+    """Texto del snapshot: `datos` como JSON indentado con la cabecera como
+    primera clave, en una sola línea."""
+    cuerpo = json.dumps(datos, indent=4)
+    return '{\n' + _PREFIJO.decode() + json.dumps(cabecera, ensure_ascii=False) + "," + cuerpo[1:]
+
+def leer_cabecera(ruta):
+    """Cabecera de un snapshot sin leer el resto, o None (sin cabecera o ilegible)."""
+    try:
+        with open(ruta, "rb") as f:
+            if f.readline().strip() != b"{":
+                return None
+            linea = f.readline(_LARGO_CABECERA)
+    except OSError:
+        return None
+    if not linea.startswith(_PREFIJO):
+        return None
+    try:
+        cabecera = json.loads(linea[len(_PREFIJO):].rstrip().rstrip(b","))
+    except ValueError:
+        return None
+    return cabecera if isinstance(cabecera, dict) else None
+
+def resumen():
+    """[(nombre, cabecera o None)] de todos los espacios, solo con las cabeceras."""
+    return [(n, leer_cabecera(os.path.join(DIR_ESPACIOS, n, SNAPSHOT))) for n in listar()]
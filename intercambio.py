@@ -0,0 +1,190 @@
+# intercambio.py
+"""
+Importación / exportación masiva de materias, tareas y sesiones en CSV o
+JSONL. Todo es en streaming: la lectura y la exportación son generadores
+(memoria constante en pipes); la importación valida el lote entero y lo
+aplica como una sola transacción (un único registro "lote" en el diario).
+
+Desde Python:
+
+    ok, res = intercambio.importar("materias", intercambio.leer(open("m.csv"), "csv"))
+    intercambio.escribir(intercambio.exportar("dias"), sys.stdout, "jsonl")
+"""
+import csv
+import datetime
+import json
+import math
+import time
+
+import logic
+
+FORMATOS = ("csv", "jsonl")
+
+# Columnas de cada tipo (orden de las cabeceras CSV al exportar)
+CAMPOS = {
+    "materias": ("id", "nombre", "meta", "horas_acumuladas"),
+    "todos": ("id", "text", "done"),
+    "sesiones": ("materia", "ts", "horas"),
+    "dias": ("materia_id", "dia", "horas", "ciclos"),
+}
+IMPORTABLES = ("materias", "todos", "sesiones")
+
+_VERDADEROS = {"1", "true", "si", "sí", "x", "yes", "y"}
+
+def formato_de(ruta, defecto="jsonl"):
+    """Formato según la extensión del archivo ("-" o desconocida: `defecto`)."""
+    for formato in FORMATOS:
+        if ruta.lower().endswith("." + formato):
+            return formato
+    return defecto
+
+# --- Lectura / escritura en streaming ---
+def leer(flujo, formato):
+    """Genera un dict por fila; JSONL ignora líneas vacías."""
+    if formato == "csv":
+        yield from csv.DictReader(flujo)
+    else:
+        for linea in flujo:
+            if linea.strip():
+                yield json.loads(linea)
+
+def escribir(filas, flujo, formato, campos=None):
+    """Vuelca las filas una a una; con CSV las cabeceras salen de `campos`
+    (o de la primera fila). Retorna cuántas escribió."""
+    n = 0
+    escritor = None
+    for fila in filas:
+        if formato == "csv":
+            if escritor is None:
+                escritor = csv.DictWriter(flujo, fieldnames=campos or list(fila), extrasaction="ignore")
+                escritor.writeheader()
+            escritor.writerow(fila)
+        else:
+            flujo.write(json.dumps(fila, ensure_ascii=False) + "\n")
+        n += 1
+    return n
+
+# --- Validación: fila -> operación ---
+def _numero(valor, campo, minimo=None):
+    try:
+        numero = float(valor)
+    except (TypeError, ValueError):
+        raise ValueError(f"'{campo}' no es un número: {valor!r}")
+    if not math.isfinite(numero):
+        raise ValueError(f"'{campo}' no es un número finito: {valor!r}")
+    if minimo is not None and numero < minimo:
+        raise ValueError(f"'{campo}' no puede ser menor que {minimo}")
+    return numero
+
+def _booleano(valor):
+    if isinstance(valor, bool): return valor
+    return str(valor or "").strip().lower() in _VERDADEROS
+
+def _timestamp(valor):
+    """Epoch en segundos o fecha ISO 8601; vacío = ahora."""
+    if valor in (None, ""): return time.time()
+    try:
+        return float(valor)
+    except (TypeError, ValueError):
+        pass
+    try:
+        return datetime.datetime.fromisoformat(str(valor)).timestamp()
+    except ValueError:
+        raise ValueError(f"'ts' no es un epoch ni una fecha ISO: {valor!r}")
+
+def _op_materia(fila, almacen):
+    nombre = (fila.get("nombre") or "").strip()
+    if not nombre:
+        raise ValueError("falta 'nombre'")
+    if almacen.buscar(nombre) is not None:
+        raise ValueError(f"la materia '{nombre}' ya existe")
+    if fila.get("id") and fila["id"] in almacen.materias:
+        raise ValueError(f"el id '{fila['id']}' ya existe")
+    materia = logic.Materia(nombre, _numero(fila.get("meta"), "meta", 0),
+                            _numero(fila.get("horas_acumuladas") or 0, "horas_acumuladas", 0),
+                            fila.get("id") or None)
+    return logic.op_crear_materia(materia)
+
+def _op_tarea(fila, almacen):
+    texto = (fila.get("text") or "").strip()
+    if not texto:
+        raise ValueError("falta 'text'")
+    op = logic.op_crear_tarea(texto, _booleano(fila.get("done")))
+    if fila.get("id"):
+        if fila["id"] in almacen.todos:
+            raise ValueError(f"el id '{fila['id']}' ya existe")
+        op["tarea"]["id"] = fila["id"]
+    return op
+
+def _op_sesion(fila, almacen):
+    clave = str(fila.get("materia") or "").strip()
+    materia = almacen.materias.get(clave) or almacen.buscar(clave)
+    if materia is None:
+        raise ValueError(f"no existe la materia '{clave}' (por id o nombre)")
+    horas, ts = _numero(fila.get("horas"), "horas"), _timestamp(fila.get("ts"))
+    if not almacen.cuenta_en_semana(ts):
+        # Anterior a la semana en curso (o a su última frontera): solo va al historial
+        return {"op": "horas", "id": materia.id, "delta": horas, "ts": ts}
+    return dict(logic.op_horas(materia, horas), ts=ts)
+
+_CONVERSORES = {"materias": _op_materia, "todos": _op_tarea, "sesiones": _op_sesion}
+
+# --- API masiva ---
+def importar(tipo, filas, almacen=None):
+    """
+    Valida todas las filas y las aplica como un solo lote. Retorna
+    (True, n_operaciones) o (False, ["fila N: error", ...]) sin aplicar nada.
+    Con `almacen` (p. ej. el de la app) solo se aplica en memoria y persiste
+    quien esté suscrito; sin él se carga de disco y se anota el lote.
+    """
+    if tipo not in _CONVERSORES:
+        return False, [f"tipo desconocido: {tipo} (válidos: {', '.join(IMPORTABLES)})"]
+    en_memoria = almacen is not None
+    # Se valida contra una copia de trabajo: cada fila ve las anteriores
+    # (duplicados dentro del lote) y un error no deja nada a medias.
+    datos = logic.cargar_datos_globales() if not en_memoria else {
+        "materias": [logic.Materia(m.nombre, m.meta_semanal, m.horas_acumuladas, m.id)
+                     for m in almacen.lista_materias()],
+        "todos": almacen.todos.a_dicts(),
+    }
+    # Con las fronteras reales: decide qué sesiones suman a la semana en curso
+    historial = almacen.historial if en_memoria else datos["historial"]
+    trabajo = logic.Almacen(datos["materias"], datos["todos"], historial=logic.Historial(fronteras=historial.fronteras))
+    ops, errores = [], []
+    for n, fila in enumerate(filas, start=1):
+        try:
+            op = _CONVERSORES[tipo](fila, trabajo)
+        except (ValueError, AttributeError) as e:
+            errores.append(f"fila {n}: {e}")
+            continue
+        trabajo.aplicar(op)
+        ops.append(op)
+    if errores:
+        return False, errores
+    if en_memoria:
+        almacen.aplicar(logic.op_lote(ops))  # un solo aviso: la UI se reconcilia una vez
+    elif ops:
+        # Un registro, no uno por fila: si el proceso muere a medias de escribirlo,
+        # la línea rasgada se descarta y no queda media importación en el diario
+        logic.diario_global.anotar(logic.op_lote(ops))
+    return True, len(ops)
+
+def exportar(tipo, almacen=None):
+    """Genera las filas de `tipo` (materias, todos, dias o sesiones)."""
+    if almacen is None:
+        datos = logic.cargar_datos_globales()
+        almacen = logic.Almacen(datos["materias"], datos["todos"], historial=datos["historial"])
+    if tipo == "materias":
+        return (m.to_dict() for m in almacen.materias.values())
+    if tipo == "todos":
+        return (t.to_dict() for t in almacen.todos)
+    if tipo == "dias":
+        return ({"materia_id": mid, "dia": dia, "horas": a[0], "ciclos": a[1]}
+                for mid, dias in almacen.historial.dias.items() for dia, a in dias.items())
+    if tipo == "sesiones":
+        # Las sesiones crudas solo se conservan en el backend SQLite
+        iterar = getattr(logic.diario_global, "iter_sesiones", None)
+        if iterar is None:
+            raise ValueError("las sesiones crudas requieren TRACKER_BACKEND=sqlite; usa 'dias'")
+        return ({"materia": mid, "ts": ts, "horas": horas} for mid, ts, horas in iterar())
+    raise ValueError(f"tipo desconocido: {tipo}")
@@ -1,11 +1,40 @@
 # logic.py
+import bisect
+import contextlib
+import ctypes
+import ctypes.util
+import datetime
+import functools
 import json
+import marshal
+import math
 import os
+import queue
+import select
+import struct
+import threading
+import time
+import uuid
+
+try:
+    import fcntl
+except ImportError:  # sin flock (p. ej. Windows): solo cerrojo entre hilos
+    fcntl = None
+
+import espacios
+import perfil
 
 FILE_NAME = "progress.json"
 
+def nuevo_id():
+    """Identificador estable para materias y tareas (sobrevive a recargas)."""
+    return uuid.uuid4().hex[:12]
+
 class Materia:
-    def __init__(self, nombre, meta_semanal, horas_acumuladas=0.0):
+    __slots__ = ("id", "nombre", "meta_semanal", "horas_acumuladas")  # sin __dict__ por materia
+
+    def __init__(self, nombre, meta_semanal, horas_acumuladas=0.0, id=None):
+        self.id = id or nuevo_id()
         self.nombre = nombre
         self.meta_semanal = float(meta_semanal)
         self.horas_acumuladas = float(horas_acumuladas)
@@ -19,6 +48,7 @@ class Materia:
 
     def to_dict(self):
         return {
+            "id": self.id,
             "nombre": self.nombre,
             "meta": self.meta_semanal,
             "horas_acumuladas": self.horas_acumuladas
@@ -28,52 +58,254 @@ class Materia:
         if self.horas_acumuladas < 0:
             self.horas_acumuladas = 0.0
 
+class Tarea:
+    """Una tarea de la lista. Los enlaces prev/sig los gestiona ListaTareas."""
+    __slots__ = ("id", "texto", "hecho", "prev", "sig")
+
+    def __init__(self, texto, hecho=False, id=None):
+        self.id = id or nuevo_id()
+        self.texto = texto
+        self.hecho = bool(hecho)
+        self.prev = self.sig = None
+
+    def to_dict(self):
+        return {"id": self.id, "text": self.texto, "done": self.hecho}
+
+class ListaTareas:
+    """
+    Tareas ordenadas: índice id -> Tarea sobre una lista doblemente enlazada.
+    Agregar, marcar, borrar y mover son O(1) y no dependen de ningún widget.
+    """
+
+    def __init__(self, tareas=()):
+        self._indice = {}
+        self._primera = self._ultima = None
+        for t in tareas:
+            self.agregar(t)
+
+    def __len__(self):
+        return len(self._indice)
+
+    def __contains__(self, tid):
+        return tid in self._indice
+
+    def __iter__(self):
+        t = self._primera
+        while t is not None:
+            yield t
+            t = t.sig
+
+    def get(self, tid):
+        return self._indice.get(tid)
+
+    def _enlazar(self, t, despues_de):
+        """Inserta t tras la tarea `despues_de` (None = al principio)."""
+        previa = self._indice.get(despues_de) if despues_de else None
+        siguiente = previa.sig if previa else self._primera
+        t.prev, t.sig = previa, siguiente
+        if previa: previa.sig = t
+        else: self._primera = t
+        if siguiente: siguiente.prev = t
+        else: self._ultima = t
+
+    def _desenlazar(self, t):
+        if t.prev: t.prev.sig = t.sig
+        else: self._primera = t.sig
+        if t.sig: t.sig.prev = t.prev
+        else: self._ultima = t.prev
+        t.prev = t.sig = None
+
+    def agregar(self, t, despues_de=""):
+        """Añade al final ("") o justo tras `despues_de` (None = al principio).
+        False si el id ya existe."""
+        if t.id in self._indice: return False
+        self._indice[t.id] = t
+        if despues_de == "":
+            despues_de = self._ultima.id if self._ultima else None
+        self._enlazar(t, despues_de)
+        return True
+
+    def marcar(self, tid, hecho):
+        t = self._indice.get(tid)
+        if t is None: return None
+        t.hecho = bool(hecho)
+        return t
+
+    def borrar(self, tid):
+        t = self._indice.pop(tid, None)
+        if t is not None: self._desenlazar(t)
+        return t
+
+    def mover(self, tid, despues_de=None):
+        """Recoloca la tarea tras `despues_de` (None = al principio)."""
+        t = self._indice.get(tid)
+        if t is None or tid == despues_de: return None
+        self._desenlazar(t)
+        self._enlazar(t, despues_de)
+        return t
+
+    def a_dicts(self):
+        return [t.to_dict() for t in self]
+
+def migrar_todos(raw):
+    """Convierte las tareas guardadas ({"text", "done"}, con o sin id) en Tarea."""
+    return [Tarea(t.get("text", ""), t.get("done", False), t.get("id"))
+            for t in raw if isinstance(t, dict)]
+
+# Reloj que no retrocede. En Linux CLOCK_BOOTTIME sigue avanzando con el
+# equipo suspendido (un portátil cerrado no congela el ciclo).
+if hasattr(time, "CLOCK_BOOTTIME"):
+    _reloj_monotonico = functools.partial(time.clock_gettime, time.CLOCK_BOOTTIME)
+else:
+    _reloj_monotonico = time.monotonic
+
 class GestorUltradiano:
     """
     Motor lógico para ciclos de trabajo basados en Ritmos Ultradianos.
     Ratio de descanso: ~16.6% del tiempo trabajado (90m -> 15m).
+
+    No cuenta ticks: guarda el instante de inicio y el deadline según un
+    reloj monotónico inyectable y calcula restante/trabajado al consultarse,
+    así que ni los parones del event loop ni varios widgets lo desfasan.
     """
     WORK_MIN = 90
     WORK_MAX = 112
+    registra_ciclos = True  # False en un espejo: el ciclo lo anota quien es dueño del motor
     
-    def __init__(self):
+    def __init__(self, reloj=None):
+        self.reloj = reloj or _reloj_monotonico
         self.state = "IDLE" # IDLE, WORK, BREAK
         self.target_seconds = 90 * 60 # Default 90 min
-        self.current_seconds = self.target_seconds
-        self.elapsed_work = 0 # Tiempo real trabajado (para calcular break dinámico)
+        self._inicio = None          # instante en que arrancó el tramo en marcha
+        self._deadline = None        # instante en que acaba; None = pausado/parado
+        self._restante = float(self.target_seconds)  # congelado mientras no corre
+        self._trabajo_previo = 0.0   # trabajo de tramos anteriores (antes de pausas)
+        self.materia_id = None       # materia a la que se apunta el ciclo WORK
+
+    @property
+    def activo(self):
+        """True si el reloj está corriendo (ni IDLE, ni en pausa, ni agotado)."""
+        return self._deadline is not None
+
+    def restante(self):
+        """Segundos (float) que faltan para terminar el ciclo actual."""
+        if self._deadline is None: return self._restante
+        return max(self._deadline - self.reloj(), 0.0)
+
+    @property
+    def current_seconds(self):
+        return int(math.ceil(self.restante()))
+
+    @property
+    def elapsed_work(self):
+        """Tiempo real trabajado (para calcular break dinámico)."""
+        trabajo = self._trabajo_previo
+        if self.state == "WORK" and self._deadline is not None:
+            trabajo += min(self.reloj(), self._deadline) - self._inicio
+        return trabajo
+
+    def _arrancar(self, segundos):
+        self.target_seconds = segundos
+        self._restante = float(segundos)
+        self._inicio = self.reloj()
+        self._deadline = self._inicio + segundos
     
-    def iniciar_trabajo(self, minutos=90):
+    def iniciar_trabajo(self, minutos=90, materia_id=None):
         self.state = "WORK"
-        self.target_seconds = minutos * 60
-        self.current_seconds = self.target_seconds
-        self.elapsed_work = 0
+        self.materia_id = materia_id
+        self._trabajo_previo = 0.0
+        self._arrancar(minutos * 60)
+
+    def pausar(self):
+        if self._deadline is None: return
+        ahora = min(self.reloj(), self._deadline)
+        if self.state == "WORK":
+            self._trabajo_previo += ahora - self._inicio
+        self._restante = self._deadline - ahora
+        self._inicio = self._deadline = None
+
+    def reanudar(self):
+        if self._deadline is not None or self.state == "IDLE" or self._restante <= 0: return
+        self._inicio = self.reloj()
+        self._deadline = self._inicio + self._restante
+
+    def alternar_pausa(self):
+        if self.activo: self.pausar()
+        else: self.reanudar()
+
+    def detener(self):
+        """Vuelve a IDLE con el contador de trabajo por defecto."""
+        self.state = "IDLE"
+        self._trabajo_previo = 0.0
+        self._inicio = self._deadline = None
+        self.target_seconds = 90 * 60
+        self._restante = float(self.target_seconds)
         
     def tick(self):
-        """Avanza el reloj un segundo. Retorna True si el ciclo terminó."""
-        if self.state == "IDLE": return False
-        
-        if self.current_seconds > 0:
-            self.current_seconds -= 1
-            if self.state == "WORK":
-                self.elapsed_work += 1
+        """Consulta el reloj. Retorna True (una sola vez) si el ciclo terminó."""
+        if self._deadline is None or self.reloj() < self._deadline:
             return False
-        else:
-            return True # Tiempo agotado
+        self.pausar() # Tiempo agotado: queda congelado en 0
+        return True
 
-    def calcular_descanso_dinamico(self):
+    @staticmethod
+    def descanso_para(segundos_trabajo):
         """
-        Calcula el descanso basado en el esfuerzo real.
         Regla: 1 minuto de descanso por cada 6 minutos de trabajo.
         Ej: 90m -> 15m | 45m -> 7.5m
         """
-        segundos_descanso = int(self.elapsed_work / 6)
         # Mínimo 2 minutos para que valga la pena
-        return max(segundos_descanso, 120)
+        return max(int(segundos_trabajo / 6), 120)
+
+    def calcular_descanso_dinamico(self):
+        """Calcula el descanso basado en el esfuerzo real."""
+        return self.descanso_para(self.elapsed_work)
 
     def iniciar_descanso(self):
+        if self.state == "WORK": self.pausar() # Cerrar el tramo para fijar elapsed_work
         self.state = "BREAK"
-        self.target_seconds = self.calcular_descanso_dinamico()
-        self.current_seconds = self.target_seconds
+        self._arrancar(self.calcular_descanso_dinamico())
+
+    def ejecutar(self, orden, minutos=90, materia_id=None):
+        """Orden por nombre (la usan la app y el demonio): iniciar, pausar, descanso, detener."""
+        if orden == "iniciar": self.iniciar_trabajo(minutos, materia_id)
+        elif orden == "pausar": self.alternar_pausa()
+        elif orden == "descanso": self.iniciar_descanso()
+        elif orden == "detener": self.detener()
+        else: raise ValueError(f"orden desconocida: {orden}")
+
+    def exportar(self):
+        """Estado serializable, independiente del reloj (para reflejarlo en otro proceso)."""
+        return {
+            "state": self.state,
+            "target": self.target_seconds,
+            "restante": self.restante(),
+            "activo": self.activo,
+            "trabajo": self.elapsed_work,
+            "materia_id": self.materia_id,
+        }
+
+    def adoptar(self, estado):
+        """Copia un estado exportado, reanclándolo al reloj local."""
+        self.state = estado["state"]
+        self.target_seconds = estado["target"]
+        self.materia_id = estado["materia_id"]
+        self._restante = estado["restante"]
+        self._trabajo_previo = estado["trabajo"]
+        if estado["activo"]:
+            self._inicio = self.reloj()
+            self._deadline = self._inicio + self._restante
+        else:
+            self._inicio = self._deadline = None
+
+    def instantanea(self):
+        """Estado listo para pintar, calculado una vez por tick."""
+        return {
+            "texto": self.formatear_tiempo(),
+            "estado": self.state,
+            "progreso": self.obtener_progreso(),
+            "activo": self.activo
+        }
 
     def formatear_tiempo(self):
         mins, secs = divmod(self.current_seconds, 60)
@@ -83,49 +315,944 @@ class GestorUltradiano:
         if self.target_seconds == 0: return 0
         # Invertimos para que la barra se llene o vacíe según prefieras
         total = self.target_seconds
-        restante = self.current_seconds
+        restante = self.restante()
         return ((total - restante) / total) * 100
 
 # --- FUNCIONES DE PERSISTENCIA ---
+#
+# progress.json es un snapshot compactado. Cada cambio se anexa como una
+# operación pequeña a progress.journal (write-ahead); al cargar se aplica la
+# cola del diario sobre el snapshot. Cada COMPACTAR_CADA operaciones un hilo
+# vuelca todo a un snapshot nuevo con rename atómico y recorta el diario.
 
-def cargar_datos_globales():
-    """Carga materias y tareas del archivo JSON de forma segura."""
-    if not os.path.exists(FILE_NAME):
-        return {"materias": _datos_por_defecto(), "todos": []}
+FILE_DIARIO = "progress.journal"
+COMPACTAR_CADA = 200
 
+# Copia binaria (marshal) del estado ya reconstruido, para arrancar sin
+# parsear el JSON ni reproducir el diario. Solo vale si el snapshot y el
+# diario siguen exactamente como cuando se escribió.
+VERSION_BINARIO = 1
+
+def _fsync(f):
+    f.flush()
+    # fdatasync basta: no nos importa el mtime, solo los datos
+    getattr(os, "fdatasync", os.fsync)(f.fileno())
+
+def _fsync_directorio(ruta):
+    """Persiste la entrada de directorio de `ruta` (un rename o un archivo
+    nuevo): sin esto, tras un corte el rename puede no haber ocurrido."""
     try:
-        with open(FILE_NAME, 'r') as f:
-            data = json.load(f)
-            
-            # Migración: Si el archivo viejo era una lista (solo materias)
-            if isinstance(data, list):
-                return {
-                    "materias": [Materia(d['nombre'], d['meta'], d.get('horas_acumuladas', 0)) for d in data],
-                    "todos": []
-                }
-            
-            # Formato nuevo (Diccionario completo)
-            raw_materias = data.get("materias", [])
-            materias = [Materia(d['nombre'], d['meta'], d.get('horas_acumuladas', 0)) for d in raw_materias]
-            todos = data.get("todos", [])
-            return {"materias": materias, "todos": todos}
-            
-    except Exception:
-        # Si falla, backup de emergencia con datos default
-        return {"materias": _datos_por_defecto(), "todos": []}
-
-def guardar_datos_globales(materias, todos):
-    """Guarda el estado completo del sistema."""
-    data = {
-        "materias": [m.to_dict() for m in materias],
-        "todos": todos 
-    }
-    with open(FILE_NAME, 'w') as f:
-        json.dump(data, f, indent=4)
+        fd = os.open(os.path.dirname(os.path.abspath(ruta)), os.O_RDONLY)
+    except OSError:
+        return  # p. ej. Windows, donde un directorio no se puede abrir
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+def _escribir_atomico(ruta, texto, respaldo=False):
+    """Escribe a un temporal y lo renombra: el archivo nunca queda a medias."""
+    tmp = ruta + ".tmp"
+    with open(tmp, 'w') as f:
+        f.write(texto)
+        _fsync(f)
+    if respaldo and os.path.exists(ruta):
+        os.replace(ruta, ruta + ".bak")
+    os.replace(tmp, ruta)
+    _fsync_directorio(ruta)
+
+def _leer_snapshot(ruta):
+    with open(ruta, 'r') as f:
+        data = json.load(f)
+    # Migración: Si el archivo viejo era una lista (solo materias)
+    if isinstance(data, list):
+        data = {"materias": data, "todos": []}
+    return data
+
+def _materia_desde_dict(d):
+    return Materia(d['nombre'], d['meta'], d.get('horas_acumuladas', 0), d.get('id'))
+
+# Operaciones del diario. Son pequeñas y autocontenidas para que reproducirlas
+# sobre el snapshot dé exactamente el mismo estado. Las destructivas llevan
+# además lo que hace falta para invertirlas (deshacer.py), sin releer el estado.
+
+def op_horas(materia, horas):
+    """Suma (o resta si es negativo) horas; guarda el delta efectivo, nunca por debajo de 0."""
+    delta = horas if horas >= 0 else -min(-horas, materia.horas_acumuladas)
+    return {"op": "horas", "id": materia.id, "delta": delta, "ts": time.time()}
+
+def comprobar_horas(materia, horas):
+    """ValueError si `horas` no sirve para anotarlo a mano (cli.py, demonio):
+    no finito o una resta mayor que lo acumulado en la semana."""
+    if not _es_numero(horas):
+        raise ValueError(f"horas no válidas: {horas!r}")
+    if horas < -materia.horas_acumuladas:
+        raise ValueError(f"no se pueden restar {-horas:g} h a '{materia.nombre}': "
+                         f"lleva {materia.horas_acumuladas:g} h esta semana")
+    return horas
+
+def comprobar_minutos(minutos):
+    """ValueError si `minutos` no es la duración de un ciclo (finita y mayor que 0)."""
+    if not _es_numero(minutos) or minutos <= 0:
+        raise ValueError(f"minutos no válidos: {minutos!r}")
+    return minutos
+
+def op_crear_materia(materia):
+    return {"op": "materia_crear", "materia": materia.to_dict()}
+
+def op_borrar_materia(materia):
+    return {"op": "materia_borrar", "id": materia.id, "materia": materia.to_dict()}
+
+def op_renombrar_materia(materia, nombre):
+    return {"op": "materia_renombrar", "id": materia.id, "nombre": nombre, "anterior": materia.nombre}
+
+def clave_nombre(nombre):
+    """Clave del índice de nombres: sin espacios sobrantes y casefold ("Ñ" == "ñ", "ß" == "ss")."""
+    return nombre.strip().casefold()
+
+def op_reiniciar_semana(materias=()):
+    """Marca el inicio de una semana nueva; el historial se conserva. Guarda
+    las horas que tenía cada materia (las que no estaban en 0) para deshacerlo."""
+    return {"op": "reiniciar_semana", "ts": time.time(),
+            "horas": {m.id: m.horas_acumuladas for m in materias if m.horas_acumuladas}}
+
+def op_restaurar_semana(ts, horas):
+    """Inversa de un reinicio: devuelve las horas y quita la frontera `ts`."""
+    return {"op": "semana_restaurar", "ts": ts, "horas": horas}
+
+def op_ciclo(materia_id, minutos):
+    """Ciclo WORK completado (materia_id puede ser None si no había materia)."""
+    return {"op": "ciclo", "id": materia_id, "minutos": minutos, "ts": time.time()}
+
+def op_ciclo_completo(materia, minutos, materia_id=None):
+    """Fin de un ciclo WORK: el ciclo más sus minutos como sesión de horas de
+    la materia, en un lote con el mismo ts. Así el contador de la semana (y el
+    plan) avanzan y los minutos entran en los agregados del día y la semana."""
+    ciclo = op_ciclo(materia.id if materia else materia_id, minutos)
+    if materia is None or minutos <= 0:
+        return op_lote([ciclo])
+    return op_lote([ciclo, dict(op_horas(materia, minutos / 60), ts=ciclo["ts"])])
+
+def op_lote(ops, origen=None):
+    """Varias ops aplicadas juntas: los suscriptores reciben un único aviso
+    (una reconciliación, un repintado) en vez de uno por op. Con `origen`,
+    el lote viene del diario (de otra instancia) y no se vuelve a escribir."""
+    op = {"op": "lote", "ops": list(ops)}
+    if origen is not None: op["origen"] = origen
+    return op
+
+def aplanar(ops):
+    """Las ops simples de `ops`, abriendo los lotes (el diario guarda cada
+    lote como un solo registro: se reproduce entero o nada)."""
+    for op in ops:
+        if op["op"] == "lote": yield from op["ops"]
+        else: yield op
+
+def op_crear_tarea(texto, hecho=False):
+    return {"op": "tarea_crear", "tarea": {"id": nuevo_id(), "text": texto, "done": hecho}}
+
+def op_marcar_tarea(tid, hecho):
+    return {"op": "tarea_marcar", "id": tid, "done": hecho}
+
+def op_mover_tarea(tarea, despues_de):
+    """Recoloca la tarea tras `despues_de` (None = primera); `antes` es de dónde sale."""
+    return {"op": "tarea_mover", "id": tarea.id, "despues_de": despues_de,
+            "antes": tarea.prev.id if tarea.prev else None}
+
+def op_borrar_tarea(tarea):
+    return {"op": "tarea_borrar", "id": tarea.id, "tarea": tarea.to_dict(),
+            "despues_de": tarea.prev.id if tarea.prev else None}
+
+# Forma de cada op, para validar las que llegan de fuera (el demonio) antes de aplicar nada
+def _es_texto(v): return isinstance(v, str)
+def _es_numero(v): return isinstance(v, (int, float)) and not isinstance(v, bool) and math.isfinite(v)
+def _es_bool(v): return isinstance(v, bool)
+def _es_id_o_nulo(v): return v is None or isinstance(v, str)
+def _es_materia(v):
+    return (isinstance(v, dict) and _es_texto(v.get("id")) and _es_texto(v.get("nombre"))
+            and _es_numero(v.get("meta")) and _es_numero(v.get("horas_acumuladas", 0)))
+def _es_tarea(v):
+    return isinstance(v, dict) and _es_texto(v.get("id")) and _es_texto(v.get("text")) and _es_bool(v.get("done"))
+def _es_horas(v):
+    return isinstance(v, dict) and all(_es_texto(k) and _es_numero(h) for k, h in v.items())
+
+_ESQUEMA_OPS = {  # op -> {campo: (comprobación, obligatorio)}
+    "horas": {"id": (_es_texto, True), "delta": (_es_numero, True), "ts": (_es_numero, False)},
+    "materia_crear": {"materia": (_es_materia, True)},
+    "materia_borrar": {"id": (_es_texto, True), "materia": (_es_materia, False)},
+    "materia_renombrar": {"id": (_es_texto, True), "nombre": (_es_texto, True), "anterior": (_es_texto, False)},
+    "reiniciar_semana": {"ts": (_es_numero, False), "horas": (_es_horas, False)},
+    "semana_restaurar": {"ts": (_es_numero, True), "horas": (_es_horas, True)},
+    "ciclo": {"id": (_es_id_o_nulo, True), "minutos": (_es_numero, True), "ts": (_es_numero, True)},
+    "tarea_crear": {"tarea": (_es_tarea, True), "despues_de": (_es_id_o_nulo, False)},
+    "tarea_marcar": {"id": (_es_texto, True), "done": (_es_bool, True)},
+    "tarea_borrar": {"id": (_es_texto, True), "tarea": (_es_tarea, False), "despues_de": (_es_id_o_nulo, False)},
+    "tarea_mover": {"id": (_es_texto, True), "despues_de": (_es_id_o_nulo, True), "antes": (_es_id_o_nulo, False)},
+}
+
+def validar_op(op):
+    """ValueError si `op` (o alguna op de un lote) no tiene la forma que espera
+    Almacen.aplicar. Un lote se valida entero antes de aplicar nada."""
+    if not isinstance(op, dict):
+        raise ValueError("la op debe ser un objeto JSON")
+    if op.get("op") == "lote":
+        if not isinstance(op.get("ops"), list):
+            raise ValueError("lote: 'ops' debe ser una lista")
+        for i, o in enumerate(op["ops"]):
+            if isinstance(o, dict) and o.get("op") == "lote":
+                raise ValueError(f"lote: op {i}: no se admiten lotes anidados")
+            try:
+                validar_op(o)
+            except ValueError as e:
+                raise ValueError(f"lote: op {i}: {e}")
+        return
+    esquema = _ESQUEMA_OPS.get(op.get("op"))
+    if esquema is None:
+        raise ValueError(f"op desconocida: {op.get('op')!r}")
+    for campo, (valido, obligatorio) in esquema.items():
+        if campo in op:
+            if not valido(op[campo]):
+                raise ValueError(f"{op['op']}: '{campo}' no válido: {op[campo]!r}")
+        elif obligatorio:
+            raise ValueError(f"{op['op']}: falta '{campo}'")
+
+def _dia_y_semana(ts):
+    """Claves de agregado para un timestamp: ("AAAA-MM-DD", "AAAA-Www") en hora local."""
+    dia = datetime.date.fromtimestamp(ts)
+    anio, semana, _ = dia.isocalendar()
+    return dia.isoformat(), f"{anio}-W{semana:02d}"
+
+def semana_actual():
+    return _dia_y_semana(time.time())[1]
+
+def semana_de(ts):
+    return _dia_y_semana(ts)[1]
+
+class Historial:
+    """
+    Sesiones agregadas por materia y por día / semana ISO. Cada sesión suma
+    en O(1) a sus dos agregados, así que consultar cualquier semana (actual o
+    pasada) es una búsqueda en un diccionario, sin recorrer sesiones crudas.
+    Cada agregado es [horas, ciclos].
+    """
+
+    def __init__(self, dias=(), fronteras=(), semana=None):
+        self.dias = {}      # materia_id -> {"AAAA-MM-DD": [horas, ciclos]}
+        self.semanas = {}   # materia_id -> {"AAAA-Www": [horas, ciclos]}
+        self.fronteras = sorted(fronteras)  # timestamps de cada "nueva semana" manual
+        # Semana ISO de los contadores (horas_acumuladas) guardados junto al historial
+        self.semana_contadores = semana
+        for mid, dia, horas, ciclos in dias:
+            anio, semana, _ = datetime.date.fromisoformat(dia).isocalendar()
+            self._sumar(mid, dia, f"{anio}-W{semana:02d}", horas, ciclos)
+
+    def _sumar(self, mid, dia, semana, horas, ciclos):
+        for tabla, clave in ((self.dias, dia), (self.semanas, semana)):
+            agregado = tabla.setdefault(mid, {}).setdefault(clave, [0.0, 0])
+            agregado[0] += horas
+            agregado[1] += ciclos
+
+    def registrar(self, mid, ts, horas=0.0, ciclos=0):
+        """Anota una sesión (horas, posiblemente negativas) o ciclos completados."""
+        dia, semana = _dia_y_semana(ts)
+        self._sumar(mid, dia, semana, horas, ciclos)
+
+    def semana(self, mid, semana=None):
+        """[horas, ciclos] de la materia en la semana ISO dada (por defecto, la actual)."""
+        return tuple(self.semanas.get(mid, {}).get(semana or semana_actual(), (0.0, 0)))
+
+    def dia(self, mid, dia=None):
+        return tuple(self.dias.get(mid, {}).get(dia or datetime.date.today().isoformat(), (0.0, 0)))
+
+    def ultima_frontera(self, semana):
+        """Timestamp de la última "nueva semana" manual dentro de `semana`, o None."""
+        for ts in reversed(self.fronteras):
+            clave = semana_de(ts)
+            if clave == semana: return ts
+            if clave < semana: return None
+        return None
+
+    def to_dict(self):
+        return {
+            "dias": [[mid, dia, a[0], a[1]] for mid, dias in self.dias.items() for dia, a in dias.items()],
+            "fronteras": self.fronteras,
+            "semana": self.semana_contadores,
+        }
+
+    @classmethod
+    def desde_dict(cls, data):
+        data = data or {}
+        return cls(data.get("dias", ()), data.get("fronteras", ()), data.get("semana"))
+
+class Almacen:
+    """
+    Estado en memoria de la app (fuente de verdad): materias, tareas y motor.
+    Los cambios entran como operaciones por `aplicar` y se avisan a los
+    suscriptores, que parchean solo lo afectado. Los totales globales se
+    mantienen como sumas corrientes y las materias tienen un índice por
+    nombre (casefold), así que crear, buscar, renombrar y borrar son O(1).
+
+    Las horas de la semana de cada materia (horas_acumuladas) salen del
+    agregado semanal del historial menos un ajuste por materia: lo que se
+    registró antes de la última "nueva semana" manual, o sumado sin sesión
+    (datos viejos, materias importadas con horas). Una semana ISO nueva
+    empieza sin ajustes, así que el contador vuelve a lo registrado en ella.
+    """
+
+    def __init__(self, materias=(), todos=(), motor=None, historial=None):
+        self.motor = motor or motor_ultradiano_global
+        self._suscriptores = []
+        self.reemplazar(materias, todos, historial, avisar=False)
+
+    # --- Suscripción ---
+    def suscribir(self, callback):
+        """callback(op) se llama tras cada cambio aplicado."""
+        self._suscriptores.append(callback)
+
+    def desuscribir(self, callback):
+        if callback in self._suscriptores:
+            self._suscriptores.remove(callback)
+
+    def _avisar(self, op):
+        for callback in tuple(self._suscriptores):
+            callback(op)
+
+    # --- Consulta ---
+    def lista_materias(self):
+        return list(self.materias.values())
+
+    def lista_todos(self):
+        return list(self.todos)
+
+    def buscar(self, nombre):
+        """Materia con ese nombre (sin distinguir mayúsculas) o None, en O(1)."""
+        mid = self._por_nombre.get(clave_nombre(nombre))
+        return self.materias.get(mid) if mid else None
+
+    def estadisticas(self):
+        """Igual que obtener_estadisticas_globales, pero O(1)."""
+        return _estadisticas(self.total_horas, self.total_meta)
+
+    # --- Cambios ---
+    def reemplazar(self, materias, todos, historial=None, avisar=True):
+        """Sustituye todo el estado (carga inicial); avisa con una op "recarga".
+        `todos` son los dicts guardados ({"id", "text", "done"})."""
+        self.materias = {m.id: m for m in materias}
+        self._por_nombre = {clave_nombre(m.nombre): m.id for m in self.materias.values()}
+        self.historial = historial or Historial()
+        self.todos = ListaTareas(migrar_todos(todos))
+        self._semana = semana_actual()
+        self._ajustes = {}  # materia_id -> horas de la semana que no cuentan (o que cuentan sin sesión)
+        # Sin marca (datos de antes del historial) los contadores guardados son de esta semana
+        if (self.historial.semana_contadores or self._semana) == self._semana:
+            for m in self.materias.values():
+                self._ajustes[m.id] = self._en_semana(m.id) - m.horas_acumuladas
+        self.historial.semana_contadores = self._semana
+        self.total_horas = 0.0
+        for m in self.materias.values():
+            m.horas_acumuladas = 0.0
+            self._sincronizar(m)
+        self.total_meta = sum(m.meta_semanal for m in self.materias.values())
+        if avisar:
+            self._avisar({"op": "recarga"})
+
+    # --- Semana en curso ---
+    def _en_semana(self, mid):
+        return self.historial.semana(mid, self._semana)[0]
+
+    def cuenta_en_semana(self, ts):
+        """Si una sesión de `ts` suma al contador: es de esta semana y posterior
+        a su última "nueva semana". Las demás solo van al historial."""
+        if semana_de(ts) != self._semana: return False
+        frontera = self.historial.ultima_frontera(self._semana)
+        return frontera is None or ts >= frontera
+
+    def _sincronizar(self, m):
+        """horas_acumuladas = agregado de la semana - ajuste (O(1)), con los totales al día."""
+        horas = max(round(self._en_semana(m.id) - self._ajustes.get(m.id, 0.0), 9), 0.0)
+        self.total_horas += horas - m.horas_acumuladas
+        m.horas_acumuladas = horas
+
+    def al_dia(self):
+        """Si empezó otra semana ISO, los contadores pasan a la nueva (avisa con
+        "recarga"). Retorna True si cambió."""
+        if semana_actual() == self._semana:
+            return False
+        self._semana = self.historial.semana_contadores = semana_actual()
+        self._ajustes.clear()
+        for m in self.materias.values():
+            self._sincronizar(m)
+        self._avisar({"op": "recarga"})
+        return True
+
+    @perfil.medido("almacen.aplicar")
+    def aplicar(self, op):
+        """Aplica una operación del diario y avisa a los suscriptores. Un lote
+        se aplica entero y se avisa una sola vez; se queda solo con las ops que
+        cambiaron algo (las que deshacer puede invertir sin romper nada)."""
+        self.al_dia()
+        if op["op"] == "lote":
+            op["ops"] = [o for o in op["ops"] if self._aplicar(o)]
+            if op["ops"]: self._avisar(op)
+        elif self._aplicar(op):
+            self._avisar(op)
+
+    def _aplicar(self, op):
+        """Aplica sin avisar; False si la op no cambió nada."""
+        tipo = op["op"]
+        if tipo == "horas":
+            m = self.materias.get(op["id"])
+            if m is None: return False
+            if op["delta"] < -m.horas_acumuladas and ("ts" not in op or self.cuenta_en_semana(op["ts"])):
+                # Se recorta al aplicar, sobre el total ya fusionado: dos instancias
+                # que restan la misma hora a la vez no dejan la semana en negativo
+                op["delta"] = -m.horas_acumuladas
+            if not op["delta"]: return False  # delta efectivo 0 (p. ej. restar a 0 h)
+            if "ts" in op:
+                self.historial.registrar(m.id, op["ts"], horas=op["delta"])
+                if semana_de(op["ts"]) == self._semana and not self.cuenta_en_semana(op["ts"]):
+                    # De esta semana pero anterior a la frontera: el ajuste la descuenta
+                    self._ajustes[m.id] = self._ajustes.get(m.id, 0.0) + op["delta"]
+            else:  # las ops anteriores al historial no traen hora: cuentan sin sesión
+                self._ajustes[m.id] = self._ajustes.get(m.id, 0.0) - op["delta"]
+            self._sincronizar(m)
+        elif tipo == "materia_crear":
+            if op["materia"]["id"] in self.materias: return False
+            m = _materia_desde_dict(op["materia"])
+            self.materias[m.id] = m
+            self._por_nombre.setdefault(clave_nombre(m.nombre), m.id)
+            # Sus horas pueden venir con ella (importada, o restaurada tras borrarla)
+            self._ajustes[m.id] = self._en_semana(m.id) - m.horas_acumuladas
+            self.total_horas += m.horas_acumuladas
+            self.total_meta += m.meta_semanal
+        elif tipo == "materia_borrar":
+            m = self.materias.pop(op["id"], None)
+            if m is None: return False
+            if self._por_nombre.get(clave_nombre(m.nombre)) == m.id:
+                del self._por_nombre[clave_nombre(m.nombre)]
+            self._ajustes.pop(m.id, None)
+            self.total_horas -= m.horas_acumuladas
+            self.total_meta -= m.meta_semanal
+        elif tipo == "materia_renombrar":
+            m = self.materias.get(op["id"])
+            if m is None or m.nombre == op["nombre"]: return False
+            if self._por_nombre.get(clave_nombre(m.nombre)) == m.id:
+                del self._por_nombre[clave_nombre(m.nombre)]
+            m.nombre = op["nombre"]
+            self._por_nombre.setdefault(clave_nombre(m.nombre), m.id)
+        elif tipo == "reiniciar_semana":
+            # Una frontera, no un borrado: lo registrado hasta aquí deja de contar
+            # para la semana (y sigue en el historial). Una de otra semana ya no pesa.
+            ts = op.get("ts", time.time())
+            bisect.insort(self.historial.fronteras, ts)
+            if semana_de(ts) == self._semana:
+                for m in self.materias.values():
+                    self._ajustes[m.id] = self._en_semana(m.id)
+                    self._sincronizar(m)
+        elif tipo == "semana_restaurar":
+            # Solo las materias que tenían horas; el historial ya las tiene registradas
+            if op["ts"] in self.historial.fronteras: self.historial.fronteras.remove(op["ts"])
+            if semana_de(op["ts"]) == self._semana:
+                for mid, horas in op["horas"].items():
+                    m = self.materias.get(mid)
+                    if m is None: continue
+                    self._ajustes[mid] = self._ajustes.get(mid, 0.0) - horas
+                    self._sincronizar(m)
+        elif tipo == "ciclo":
+            self.historial.registrar(op["id"], op["ts"], ciclos=1)
+        elif tipo == "tarea_crear":
+            t = op["tarea"]
+            if not self.todos.agregar(Tarea(t["text"], t["done"], t["id"]), op.get("despues_de", "")): return False
+        elif tipo == "tarea_marcar":
+            if self.todos.marcar(op["id"], op["done"]) is None: return False
+        elif tipo == "tarea_borrar":
+            if self.todos.borrar(op["id"]) is None: return False
+        elif tipo == "tarea_mover":
+            if self.todos.mover(op["id"], op["despues_de"]) is None: return False
+        return True
+
+class Diario:
+    """
+    Diario append-only de operaciones más snapshot compactado. Varias
+    instancias pueden compartirlo: toda escritura se hace bajo un cerrojo
+    consultivo (flock) tras ponerse al día con lo que anexaron las demás,
+    así que el seq es global y los cambios se fusionan por operación
+    (deltas de horas, ops de tareas) en vez de "gana el último".
+    """
+
+    def __init__(self, ruta_snapshot=None, ruta_diario=None):
+        self.ruta_snapshot = ruta_snapshot or FILE_NAME
+        self.ruta_diario = ruta_diario or FILE_DIARIO
+        self.ruta_binario = self.ruta_snapshot + ".bin"
+        self.origen = nuevo_id()  # marca las ops de esta instancia en el diario
+        self.seq = 0          # último número de secuencia visto (propio o ajeno)
+        self.pendientes = 0   # operaciones en el diario sin compactar
+        self._f = None
+        self._lock = threading.RLock()  # entre hilos; el flock cubre entre procesos
+        self._fd_cerrojo = None
+        self._profundidad = 0
+        self._inodo = None    # diario que estamos siguiendo (cambia al compactar)
+        self._offset = 0      # bytes de ese diario ya leídos
+        self._ajenas = []     # ops de otras instancias aún no entregadas
+        self._perdidas = False
+        self._compactador = None
+
+    @contextlib.contextmanager
+    def _exclusivo(self):
+        """Cerrojo reentrante entre hilos y, con fcntl, entre procesos."""
+        with self._lock:
+            if self._profundidad == 0 and fcntl is not None:
+                if self._fd_cerrojo is None:
+                    self._fd_cerrojo = os.open(self.ruta_snapshot + ".lock", os.O_RDWR | os.O_CREAT, 0o644)
+                fcntl.flock(self._fd_cerrojo, fcntl.LOCK_EX)
+            self._profundidad += 1
+            try:
+                yield
+            finally:
+                self._profundidad -= 1
+                if self._profundidad == 0 and fcntl is not None:
+                    fcntl.flock(self._fd_cerrojo, fcntl.LOCK_UN)
+
+    def existe(self):
+        return any(os.path.exists(r) for r in (self.ruta_snapshot, self.ruta_snapshot + ".bak"))
+
+    def rutas_vigiladas(self):
+        return [self.ruta_diario]
+
+    def _snapshot_legible(self):
+        """Snapshot actual o, si falta o está corrupto, el respaldo anterior."""
+        try:
+            return _leer_snapshot(self.ruta_snapshot)
+        except (OSError, ValueError) as e:
+            try:
+                return _leer_snapshot(self.ruta_snapshot + ".bak")
+            except FileNotFoundError:
+                raise e from None  # sin respaldo, el error que importa es el del snapshot
+
+    def _leer_diario(self, desde=0, hasta=None):
+        """Operaciones con desde < seq <= hasta, ignorando registros rasgados."""
+        try:
+            f = open(self.ruta_diario, 'r')
+        except FileNotFoundError:
+            return
+        with f:
+            for linea in f:
+                try:
+                    op = json.loads(linea)
+                except ValueError:
+                    continue
+                seq = op.get("seq", 0)
+                if seq > desde and (hasta is None or seq <= hasta):
+                    yield op
+
+    def _reparar_cola(self):
+        """Recorta un último registro a medias para que el siguiente no se pegue a él."""
+        try:
+            with open(self.ruta_diario, 'rb+') as f:
+                datos = f.read()
+                if datos and not datos.endswith(b"\n"):
+                    f.truncate(datos.rfind(b"\n") + 1)
+        except FileNotFoundError:
+            pass
+
+    def _seguir(self, inodo=None, offset=0):
+        """Reubica la lectura incremental (tras cargar o reescribir el diario)."""
+        if inodo is None:
+            try:
+                st = os.stat(self.ruta_diario)
+                inodo, offset = st.st_ino, st.st_size
+            except FileNotFoundError:
+                inodo, offset = None, 0
+        self._inodo, self._offset = inodo, offset
+
+    def _leer_nuevas(self):
+        """Incorpora lo que otras instancias anexaron desde la última lectura
+        (solo registros completos, a partir del offset). Llamar bajo _exclusivo."""
+        try:
+            st = os.stat(self.ruta_diario)
+        except FileNotFoundError:
+            return
+        if st.st_ino != self._inodo:
+            # Otra instancia compactó y el diario es otro archivo. Si su
+            # snapshot ya incluye ops que no vimos, solo queda recargar.
+            if self._f is not None:
+                self._f.close()
+                self._f = None
+            snapshot_seq = self._snapshot_legible().get("seq", 0)
+            if snapshot_seq > self.seq:
+                self.seq, self._perdidas = snapshot_seq, True
+            self._inodo, self._offset = st.st_ino, 0
+        if st.st_size <= self._offset:
+            return
+        with open(self.ruta_diario, 'rb') as f:
+            f.seek(self._offset)
+            datos = f.read()
+        fin = datos.rfind(b"\n") + 1
+        self._offset += fin
+        for linea in datos[:fin].splitlines():
+            try:
+                op = json.loads(linea)
+            except ValueError:
+                continue
+            if op.get("seq", 0) <= self.seq:
+                continue
+            self.seq = op["seq"]
+            self.pendientes += 1
+            if op.get("origen") != self.origen:
+                self._ajenas.extend(aplanar((op,)))
+
+    def sincronizar(self):
+        """Ops de otras instancias desde la última llamada, en orden; None si
+        una compactación ajena se adelantó y hay que recargar entero."""
+        with self._exclusivo():
+            self._leer_nuevas()
+            ajenas, perdidas = self._ajenas, self._perdidas
+            self._ajenas, self._perdidas = [], False
+        return None if perdidas else ajenas
+
+    def _reconstruir(self, hasta=None):
+        data = self._snapshot_legible()
+        raw_materias = data.get("materias", [])
+        raw_todos = [t for t in data.get("todos", []) if isinstance(t, dict)]
+        almacen = Almacen([_materia_desde_dict(d) for d in raw_materias], raw_todos,
+                          historial=Historial.desde_dict(data.get("historial")))
+        seq, n = data.get("seq", 0), 0
+        for op in self._leer_diario(desde=seq, hasta=hasta):
+            almacen.aplicar(op)
+            seq, n = op["seq"], n + 1
+        sin_ids = any('id' not in d for d in raw_materias) or any('id' not in t for t in raw_todos)
+        return almacen.lista_materias(), almacen.todos.a_dicts(), almacen.historial, seq, n, sin_ids
+
+    def _firma(self):
+        """(mtime, tamaño) del snapshot e (inodo, mtime, tamaño) del diario, o None si faltan."""
+        firma = []
+        for ruta, inodo in ((self.ruta_snapshot, False), (self.ruta_diario, True)):
+            try:
+                st = os.stat(ruta)
+            except FileNotFoundError:
+                firma.append(None)
+                continue
+            firma.append((st.st_ino if inodo else 0, st.st_mtime_ns, st.st_size))
+        return firma
+
+    def _leer_binario(self):
+        """Estado del binario si sigue valiendo para los archivos actuales, o None."""
+        try:
+            with open(self.ruta_binario, 'rb') as f:
+                data = marshal.loads(f.read())  # marshal.load sobre el archivo lee a trozos: 10x más lento
+        except (OSError, EOFError, ValueError, TypeError):
+            return None
+        if not isinstance(data, dict) or data.get("version") != VERSION_BINARIO:
+            return None
+        if data.get("firma") != self._firma():
+            return None
+        return data
+
+    def guardar_binario(self):
+        """Reconstruye desde disco y deja el binario para el próximo arranque
+        (al salir, con todo ya escrito)."""
+        with self._exclusivo():
+            materias, todos, historial, seq, n, sin_ids = self._reconstruir()
+            if sin_ids: return
+            data = {
+                "version": VERSION_BINARIO,
+                "firma": self._firma(),
+                "seq": seq,
+                "pendientes": n,
+                "materias": [m.to_dict() for m in materias],
+                "todos": todos,
+                "historial": historial.to_dict(),
+            }
+            # Es una caché: basta el rename atómico, sin fsync
+            tmp = self.ruta_binario + ".tmp"
+            with open(tmp, 'wb') as f:
+                marshal.dump(data, f)
+            os.replace(tmp, self.ruta_binario)
+
+    @perfil.medido("diario.cargar")
+    def cargar(self):
+        """Estado = snapshot + cola del diario (o el binario, si sigue al día).
+        Retorna (materias, todos, historial, faltaban_ids)."""
+        with self._exclusivo():
+            self._reparar_cola()
+            binario = self._leer_binario()
+            if binario is not None:
+                materias = [_materia_desde_dict(d) for d in binario["materias"]]
+                todos, historial = binario["todos"], Historial.desde_dict(binario["historial"])
+                seq, n, sin_ids = binario["seq"], binario["pendientes"], False
+            else:
+                materias, todos, historial, seq, n, sin_ids = self._reconstruir()
+            self.seq, self.pendientes = seq, n
+            self._ajenas, self._perdidas = [], False
+            self._seguir()
+        return materias, todos, historial, sin_ids
+
+    def sembrar(self, materias):
+        """Escribe el snapshot inicial si nadie lo hizo aún (dos instancias
+        arrancando a la vez acaban con los mismos ids)."""
+        with self._exclusivo():
+            if not self.existe():
+                self._escribir_snapshot(materias, [], Historial(), self.seq)
+
+    def anotar(self, op):
+        """Anexa una operación (O(1) + fdatasync) y dispara la compactación si toca."""
+        self.anotar_lote([op])
+
+    @perfil.medido("diario.anotar_lote")
+    def anotar_lote(self, ops):
+        """Anexa varias operaciones con un único fdatasync."""
+        with self._exclusivo():
+            self._leer_nuevas()  # seq global al día antes de numerar las nuestras
+            if self._f is None:
+                nuevo = not os.path.exists(self.ruta_diario)
+                self._f = open(self.ruta_diario, 'a')
+                if nuevo: _fsync_directorio(self.ruta_diario)
+            st = os.fstat(self._f.fileno())
+            if self._inodo != st.st_ino:
+                self._seguir(st.st_ino, 0)
+            elif st.st_size > self._offset:
+                self._f.truncate(self._offset)  # cola rasgada de una instancia que murió a medias
+            for op in ops:
+                self.seq += 1
+                self._f.write(json.dumps(dict(op, seq=self.seq, origen=self.origen), ensure_ascii=False) + "\n")
+            _fsync(self._f)
+            self._offset = os.fstat(self._f.fileno()).st_size
+            self.pendientes += len(ops)
+            compactar = self.pendientes >= COMPACTAR_CADA and not (
+                self._compactador and self._compactador.is_alive())
+        if compactar:
+            self._compactador = threading.Thread(target=self.compactar, daemon=True)
+            self._compactador.start()
+
+    def _escribir_snapshot(self, materias, todos, historial, seq):
+        data = {
+            "seq": seq,
+            "materias": [m.to_dict() for m in materias],
+            "todos": todos,
+            "historial": historial.to_dict()
+        }
+        # Totales para el resumen de espacios, que no parsea el resto del shard
+        cabecera = {
+            "materias": len(materias),
+            "horas": sum(m.horas_acumuladas for m in materias),
+            "meta": sum(m.meta_semanal for m in materias),
+            "tareas": len(todos),
+            "hechas": sum(1 for t in todos if t.get("done")),
+            "guardado": time.time(),
+        }
+        _escribir_atomico(self.ruta_snapshot, espacios.volcar(cabecera, data), respaldo=True)
+
+    def _recortar(self, hasta):
+        """Deja en el diario solo lo posterior al snapshot recién escrito."""
+        cola = list(self._leer_diario(desde=hasta))
+        if self._f is not None:
+            self._f.close()
+            self._f = None
+        _escribir_atomico(self.ruta_diario, "".join(
+            json.dumps(op, ensure_ascii=False) + "\n" for op in cola))
+        self.pendientes = len(cola)
+        # Archivo nuevo: releerlo desde el principio (el seq filtra lo ya visto)
+        self._seguir(os.stat(self.ruta_diario).st_ino, 0)
+
+    @perfil.medido("diario.compactar")
+    def compactar(self):
+        """Reconstruye desde disco hasta el seq actual y lo vuelca como snapshot nuevo."""
+        with self._exclusivo():
+            self._leer_nuevas()
+            hasta = self.seq
+            materias, todos, historial, _, _, _ = self._reconstruir(hasta=hasta)
+            self._escribir_snapshot(materias, todos, historial, hasta)
+            self._recortar(hasta)
+
+    def cerrar(self):
+        """Al salir (o cambiar de espacio), con la cola ya vaciada: compacta lo
+        pendiente, para que la cabecera del shard quede al día, y deja el binario."""
+        with self._exclusivo():
+            self._leer_nuevas()
+            if self.pendientes: self.compactar()
+            self.guardar_binario()
+            if self._f is not None:
+                self._f.close()
+                self._f = None
+        with self._lock:
+            if self._fd_cerrojo is not None and self._profundidad == 0:
+                os.close(self._fd_cerrojo)
+                self._fd_cerrojo = None
+
+    def guardar_snapshot(self, materias, todos, historial=None):
+        """Snapshot completo del estado en memoria (que debe reflejar hasta self.seq).
+        Lo que otras instancias anotaron después queda en la cola del diario."""
+        with self._exclusivo():
+            self._escribir_snapshot(materias, todos, historial or Historial(), self.seq)
+            self._recortar(self.seq)
+
+class Persistidor:
+    """
+    Hilo que vuelca operaciones al diario fuera del event loop.
+    Agrupa las ráfagas (debounce) en un solo lote con un solo fdatasync.
+    """
+    _FIN = object()
+
+    def __init__(self, diario, demora=0.3, demora_max=2.0, al_fallar=None):
+        self.diario = diario
+        self.demora = demora          # silencio que cierra una ráfaga
+        self.demora_max = demora_max  # tope para que una ráfaga continua no retrase todo
+        self.al_fallar = al_fallar    # callback(excepcion) desde el hilo
+        self._cola = queue.Queue()
+        self._fallidos = []
+        self._hilo = threading.Thread(target=self._bucle, daemon=True)
+        self._hilo.start()
+
+    def encolar(self, op):
+        # Un lote va entero en un registro: tras un corte se reproduce todo o nada
+        self._cola.put(op)
+
+    def _bucle(self):
+        fin = False
+        while not fin:
+            op = self._cola.get()
+            if op is self._FIN:
+                lote, fin = [], True
+            else:
+                lote = [op]
+                limite = time.monotonic() + self.demora_max
+                while True:
+                    espera = min(self.demora, limite - time.monotonic())
+                    if espera <= 0: break
+                    try:
+                        op = self._cola.get(timeout=espera)
+                    except queue.Empty:
+                        break
+                    if op is self._FIN:
+                        fin = True
+                        break
+                    lote.append(op)
+            self._escribir(lote)
+
+    def _escribir(self, lote):
+        # Lo que falló antes se reintenta primero para conservar el orden
+        lote = self._fallidos + lote
+        if not lote: return
+        try:
+            self.diario.anotar_lote(lote)
+            self._fallidos = []
+        except Exception as e:
+            self._fallidos = lote
+            if self.al_fallar: self.al_fallar(e)
+
+    def detener(self, timeout=5.0):
+        """Vacía lo pendiente al diario y termina el hilo."""
+        if self._hilo.is_alive():
+            self._cola.put(self._FIN)
+            self._hilo.join(timeout)
+
+class Vigilante:
+    """
+    Hilo que avisa (al_cambiar(), desde el hilo) cuando cambian los archivos
+    vigilados, p. ej. porque otra instancia anotó en el diario. Usa inotify
+    (vía ctypes) si está disponible; si no, sondea inodo/tamaño/mtime.
+    """
+    IN_MODIFY, IN_CLOSE_WRITE, IN_MOVED_TO = 0x2, 0x8, 0x80
+
+    def __init__(self, rutas, al_cambiar, intervalo=1.0):
+        self.rutas = [os.path.abspath(r) for r in rutas]
+        self.al_cambiar = al_cambiar
+        self.intervalo = intervalo
+        self._fin = threading.Event()
+        self._hilo = threading.Thread(target=self._bucle, daemon=True)
+        self._hilo.start()
+
+    def _inotify(self):
+        """fd de inotify sobre los directorios (el diario se reemplaza al compactar), o None."""
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+            fd = libc.inotify_init1(os.O_NONBLOCK)
+        except (OSError, AttributeError, TypeError):
+            return None
+        if fd < 0: return None
+        mascara = self.IN_MODIFY | self.IN_CLOSE_WRITE | self.IN_MOVED_TO
+        for directorio in {os.path.dirname(r) for r in self.rutas}:
+            if libc.inotify_add_watch(fd, os.fsencode(directorio), mascara) < 0:
+                os.close(fd)
+                return None
+        return fd
+
+    @staticmethod
+    def _nombres(datos):
+        """Nombres de archivo de un bloque de eventos inotify."""
+        i = 0
+        while i + 16 <= len(datos):
+            _, _, _, largo = struct.unpack_from("iIII", datos, i)
+            yield datos[i + 16:i + 16 + largo].rstrip(b"\0")
+            i += 16 + largo
+
+    def _bucle(self):
+        fd = self._inotify()
+        if fd is None:
+            return self._sondear()
+        nombres = {os.fsencode(os.path.basename(r)) for r in self.rutas}
+        try:
+            while not self._fin.is_set():
+                if not select.select([fd], [], [], self.intervalo)[0]:
+                    continue
+                try:
+                    datos = os.read(fd, 65536)
+                except BlockingIOError:
+                    continue
+                if not nombres.isdisjoint(self._nombres(datos)):
+                    self.al_cambiar()
+        finally:
+            os.close(fd)
+
+    def _firma(self):
+        firma = []
+        for ruta in self.rutas:
+            try:
+                st = os.stat(ruta)
+                firma.append((st.st_ino, st.st_size, st.st_mtime_ns))
+            except FileNotFoundError:
+                firma.append(None)
+        return firma
+
+    def _sondear(self):
+        anterior = self._firma()
+        while not self._fin.wait(self.intervalo):
+            actual = self._firma()
+            if actual != anterior:
+                anterior = actual
+                self.al_cambiar()
+
+    def detener(self):
+        self._fin.set()
+        self._hilo.join(self.intervalo + 1)
+
+def cargar_datos_globales():
+    """Carga materias y tareas (snapshot + diario). ValueError si no se pueden
+    leer: seguir con los datos por defecto acabaría pisando los reales al guardar."""
+    try:
+        if not diario_global.existe():
+            diario_global.sembrar(_datos_por_defecto())
+        materias, todos, historial, sin_ids = diario_global.cargar()
+    except Exception as e:
+        raise ValueError(f"No se pudieron leer los datos de {os.path.abspath(directorio_datos)}: {e}") from e
+
+    # Migración de ids: se persisten en el acto para que la próxima carga
+    # devuelva los mismos y la UI pueda reconciliar por id.
+    if sin_ids:
+        guardar_datos_globales(materias, todos, historial)
+    return {"materias": materias, "todos": todos, "historial": historial}
+
+@perfil.medido("guardar_datos_globales")
+def guardar_datos_globales(materias, todos, historial=None):
+    """Guarda el estado completo del sistema como snapshot atómico."""
+    diario_global.guardar_snapshot(materias, todos, historial)
 
 def obtener_estadisticas_globales(materias):
     total_horas = sum(m.horas_acumuladas for m in materias)
     total_meta = sum(m.meta_semanal for m in materias)
+    return _estadisticas(total_horas, total_meta)
+
+def _estadisticas(total_horas, total_meta):
     progreso = (total_horas / total_meta * 100) if total_meta > 0 else 0
     return {
         "total_horas": total_horas,
@@ -133,10 +1260,6 @@ def obtener_estadisticas_globales(materias):
         "progreso_general": progreso
     }
 
-def reiniciar_semana(materias):
-    for m in materias:
-        m.horas_acumuladas = 0.0
-
 def _datos_por_defecto():
     raw = [
         ("Analisis matematico", 4), ("ML - SPV", 4), ("Termodinamica quimica", 4),
@@ -147,22 +1270,60 @@ def _datos_por_defecto():
 
 motor_ultradiano_global = GestorUltradiano()
 
-def crear_materia(nombre, meta):
+def _crear_diario(directorio="."):
+    """Backend de persistencia: diario JSON por defecto, SQLite con TRACKER_BACKEND=sqlite."""
+    if os.environ.get("TRACKER_BACKEND", "").lower() == "sqlite":
+        import persistencia_sqlite
+        return persistencia_sqlite.DiarioSQLite(os.path.join(directorio, persistencia_sqlite.FILE_DB),
+                                                os.path.join(directorio, FILE_NAME))
+    return Diario(os.path.join(directorio, FILE_NAME), os.path.join(directorio, FILE_DIARIO))
+
+def abrir_espacio(nombre=None):
+    """Apunta diario_global al shard del espacio `nombre` (por defecto, el activo).
+    No carga nada: eso lo hace cargar_datos_globales."""
+    global diario_global, espacio_actual, directorio_datos
+    nombre = espacios.validar(nombre or espacios.activo())
+    directorio_datos = espacios.preparar(nombre)
+    diario_global = _crear_diario(directorio_datos)
+    espacio_actual = nombre
+    return diario_global
+
+def iniciar():
+    """Abre el espacio activo; lo llaman las entradas (tui_app, cli, demonio),
+    importar este módulo no toca el disco. Retorna un aviso para el usuario si
+    en el directorio actual hay datos sueltos que no son los de ningún espacio."""
+    global diario_global, espacio_actual, directorio_datos
+    try:
+        abrir_espacio()
+    except OSError:
+        # Sin un $XDG_DATA_HOME escribible se trabaja, como antes, en el directorio actual
+        espacio_actual, directorio_datos = None, "."
+        diario_global = _crear_diario()
+        return None
+    return espacios.aviso_legado()
+
+# Sin abrir hasta iniciar() o abrir_espacio()
+diario_global = None
+espacio_actual, directorio_datos = None, "."
+
+def crear_materia(nombre, meta, almacen=None):
     """
     Crea una materia, la integra en el estado global y persiste los cambios.
+    Si se pasa `almacen` (estado en memoria) no se toca el disco: el
+    llamador aplica y persiste op_crear_materia(resultado).
     """
-    # 1. Cargar el estado actual para no perder tareas (todos) ni otras materias
-    datos = cargar_datos_globales()
-    materias = datos["materias"]
-    todos = datos["todos"]
+    # 1. Sin estado en memoria, cargar el actual para validar contra las demás materias
+    en_memoria = almacen is not None
+    if not en_memoria:
+        almacen = Almacen(cargar_datos_globales()["materias"])
 
-    # 2. Validación de duplicados (evita errores en las estadísticas)
-    if any(m.nombre.lower() == nombre.lower() for m in materias):
+    # 2. Validación de duplicados con el índice de nombres (O(1))
+    if almacen.buscar(nombre) is not None:
         return False, "La materia ya existe."
 
-    # 3. Creación y persistencia
+    # 3. Creación y persistencia (una operación en el diario, no reescritura)
     nueva_materia = Materia(nombre, meta)
-    materias.append(nueva_materia)
-    guardar_datos_globales(materias, todos)
+    if not en_memoria:
+        diario_global.anotar(op_crear_materia(nueva_materia))
     
     return True, nueva_materia
@@ -0,0 +1,99 @@
+# perfil.py
+"""
+Instrumentación ligera de las rutas calientes. Apagada, cada punto medido
+cuesta comprobar un booleano; encendida (overlay con F2 o TRACKER_PERFIL=1)
+guarda las últimas duraciones de cada punto para sacar p50/p95.
+TRACKER_CPROFILE=ruta vuelca además un cProfile de toda la sesión.
+Los hitos del arranque se anotan siempre; TRACKER_ARRANQUE=1 los imprime
+al salir con el formato de `python -X importtime`.
+"""
+import collections
+import functools
+import os
+import time
+
+INICIO = time.perf_counter()  # tui_app importa este módulo antes que textual
+MUESTRAS = 512  # duraciones que se guardan por punto (ventana deslizante)
+
+activo = os.environ.get("TRACKER_PERFIL") == "1"
+_muestras = collections.defaultdict(lambda: collections.deque(maxlen=MUESTRAS))
+_llamadas = collections.Counter()
+_hitos = []  # [(fase, ms desde INICIO)] en orden
+
+def activar():
+    global activo
+    activo = True
+
+def desactivar():
+    global activo
+    activo = False
+
+def limpiar():
+    _muestras.clear()
+    _llamadas.clear()
+
+def anotar(nombre, ms):
+    _muestras[nombre].append(ms)
+    _llamadas[nombre] += 1
+
+def medido(nombre):
+    """Decorador: mide la función bajo `nombre` solo mientras el perfil está activo."""
+    def decorador(funcion):
+        @functools.wraps(funcion)
+        def envoltura(*args, **kwargs):
+            if not activo:
+                return funcion(*args, **kwargs)
+            t = time.perf_counter()
+            try:
+                return funcion(*args, **kwargs)
+            finally:
+                anotar(nombre, (time.perf_counter() - t) * 1000)
+        return envoltura
+    return decorador
+
+def _percentil(ordenadas, q):
+    return ordenadas[min(len(ordenadas) - 1, int(q * len(ordenadas)))]
+
+def resumen():
+    """[(nombre, llamadas, p50_ms, p95_ms)] ordenado por p95, el peor primero."""
+    filas = []
+    for nombre, muestras in list(_muestras.items()):
+        ordenadas = sorted(muestras)
+        if ordenadas:
+            filas.append((nombre, _llamadas[nombre], _percentil(ordenadas, 0.5), _percentil(ordenadas, 0.95)))
+    return sorted(filas, key=lambda f: f[3], reverse=True)
+
+# --- Arranque ---
+def hito(fase):
+    """Marca el final de una fase del arranque."""
+    _hitos.append((fase, (time.perf_counter() - INICIO) * 1000))
+
+def arranque():
+    """[(fase, ms propios, ms acumulados)] de los hitos marcados."""
+    filas, previo = [], 0.0
+    for fase, ms in _hitos:
+        filas.append((fase, ms - previo, ms))
+        previo = ms
+    return filas
+
+def informe_arranque():
+    """Tabla de fases al estilo de -X importtime (acumulado desde importar perfil)."""
+    lineas = ["arranque: propio [ms] | acumulado [ms] | fase"]
+    lineas += [f"arranque: {propio:11.1f} | {acumulado:14.1f} | {fase}" for fase, propio, acumulado in arranque()]
+    return "\n".join(lineas)
+
+def iniciar_cprofile():
+    """Arranca cProfile si TRACKER_CPROFILE apunta a un archivo; retorna (perfilador, ruta)."""
+    ruta = os.environ.get("TRACKER_CPROFILE")
+    if not ruta:
+        return None, None
+    import cProfile  # solo hace falta en esta sesión de perfilado
+    perfilador = cProfile.Profile()
+    perfilador.enable()
+    return perfilador, ruta
+
+def volcar_cprofile(perfilador, ruta):
+    """Detiene y guarda el cProfile (abrir con `python -m pstats ruta` o snakeviz)."""
+    if perfilador is None: return
+    perfilador.disable()
+    perfilador.dump_stats(ruta)
@@ -0,0 +1,387 @@
+# persistencia_sqlite.py
+"""
+Backend opcional en SQLite (solo stdlib). Mismo contrato que logic.Diario
+(cargar / anotar / anotar_lote / guardar_snapshot / compactar), pero cada
+operación se traduce en actualizaciones de una fila dentro de una
+transacción, y cada registro de horas queda como sesión con timestamp.
+
+Se activa con TRACKER_BACKEND=sqlite. La primera vez importa progress.json
+(formato lista antiguo o diccionario actual, más la cola del diario).
+
+La columna `horas` de materias es el contador de la semana ISO guardada en
+meta ('semana'); al empezar otra, se rehace desde los agregados diarios.
+
+Cada op anotada queda además en la tabla `ops` con un seq creciente y el
+origen de la instancia, para que las demás la apliquen en vivo: vigilan el
+-wal y, si `PRAGMA data_version` dice que otra conexión escribió, leen las
+ops posteriores a la última vista (como la cola del diario JSON).
+"""
+import datetime
+import json
+import os
+import sqlite3
+import threading
+import time
+
+import logic
+import perfil
+
+FILE_DB = "progress.sqlite3"
+RETENER_OPS = 1000  # ops que sobreviven a una compactación, para instancias rezagadas
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS materias (
+    id     TEXT PRIMARY KEY,
+    nombre TEXT NOT NULL,
+    meta   REAL NOT NULL,
+    horas  REAL NOT NULL DEFAULT 0,
+    orden  INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS sesiones (
+    id         INTEGER PRIMARY KEY,
+    materia_id TEXT NOT NULL,
+    ts         REAL NOT NULL,
+    horas      REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_sesiones_materia_ts ON sesiones (materia_id, ts);
+CREATE INDEX IF NOT EXISTS idx_sesiones_ts ON sesiones (ts);
+CREATE TABLE IF NOT EXISTS ciclos (
+    id         INTEGER PRIMARY KEY,
+    materia_id TEXT,
+    ts         REAL NOT NULL,
+    minutos    REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_ciclos_ts ON ciclos (ts);
+CREATE TABLE IF NOT EXISTS agregados_dia (
+    materia_id TEXT,
+    dia        TEXT NOT NULL,
+    horas      REAL NOT NULL DEFAULT 0,
+    ciclos     INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (materia_id, dia)
+);
+CREATE TABLE IF NOT EXISTS fronteras (
+    ts REAL PRIMARY KEY
+);
+CREATE TABLE IF NOT EXISTS todos (
+    id    TEXT PRIMARY KEY,
+    texto TEXT NOT NULL,
+    hecho INTEGER NOT NULL DEFAULT 0,
+    orden REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_todos_orden ON todos (orden);
+CREATE TABLE IF NOT EXISTS ops (
+    seq    INTEGER PRIMARY KEY AUTOINCREMENT,
+    origen TEXT NOT NULL,
+    op     TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS meta (
+    clave TEXT PRIMARY KEY,
+    valor TEXT
+);
+"""
+
+class DiarioSQLite:
+    """Persistencia por filas en SQLite (WAL) con historial de sesiones."""
+
+    def __init__(self, ruta_db=None, ruta_json=None):
+        self.ruta_db = ruta_db or FILE_DB
+        self.ruta_json = ruta_json or logic.FILE_NAME
+        self._conn = None
+        self._lock = threading.Lock()  # el persistidor escribe desde su hilo
+        self.origen = logic.nuevo_id()  # marca las ops de esta instancia en `ops`
+        self.seq = 0              # última op vista (propia o ajena)
+        self._version = None      # PRAGMA data_version en la última sincronización
+        self._sin_recortar = 0    # ops anotadas desde el último recorte de `ops`
+
+    # --- Conexión y migración ---
+    def _conexion(self):
+        if self._conn is None:
+            conn = sqlite3.connect(self.ruta_db, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")  # con WAL sigue siendo a prueba de cortes
+            conn.executescript(ESQUEMA)
+            self._conn = conn
+            self._migrar_json()
+        return self._conn
+
+    def _migrar_json(self):
+        """Importa progress.json (+ diario) una sola vez, en una transacción."""
+        conn = self._conn
+        if conn.execute("SELECT 1 FROM meta WHERE clave = 'migrado'").fetchone():
+            return
+        with conn:
+            diario = logic.Diario(self.ruta_json, os.path.join(os.path.dirname(self.ruta_json), logic.FILE_DIARIO))
+            if diario.existe():
+                materias, todos, historial, _ = diario.cargar()
+            else:
+                materias, todos, historial = logic._datos_por_defecto(), [], None
+            self._volcar(materias, todos, historial)
+            conn.execute("INSERT INTO meta VALUES ('migrado', ?)", (str(time.time()),))
+
+    def _volcar(self, materias, todos, historial=None):
+        conn = self._conn
+        conn.execute("DELETE FROM materias")
+        conn.execute("DELETE FROM todos")
+        conn.executemany(
+            "INSERT INTO materias (id, nombre, meta, horas, orden) VALUES (?, ?, ?, ?, ?)",
+            ((m.id, m.nombre, m.meta_semanal, m.horas_acumuladas, i) for i, m in enumerate(materias)))
+        conn.executemany(
+            "INSERT INTO todos (id, texto, hecho, orden) VALUES (?, ?, ?, ?)",
+            ((t["id"], t["text"], int(t["done"]), float(i)) for i, t in enumerate(todos)))
+        if historial is not None:
+            conn.execute("DELETE FROM agregados_dia")
+            conn.execute("DELETE FROM fronteras")
+            conn.executemany("INSERT INTO agregados_dia VALUES (?, ?, ?, ?)",
+                             ((mid or "", dia, h, c) for mid, dia, h, c in historial.to_dict()["dias"]))
+            conn.executemany("INSERT OR IGNORE INTO fronteras VALUES (?)", ((ts,) for ts in historial.fronteras))
+        semana = (historial.semana_contadores if historial is not None else None) or logic.semana_actual()
+        conn.execute("INSERT OR REPLACE INTO meta VALUES ('semana', ?)", (semana,))
+        # Estado reemplazado entero: las ops previas ya no se pueden aplicar
+        # encima y quien no las haya visto tiene que recargar
+        # (la fila de marca avanza el seq aunque no hubiera ninguna op)
+        base = conn.execute("INSERT INTO ops (origen, op) VALUES (?, 'null')", (self.origen,)).lastrowid
+        conn.execute("DELETE FROM ops")
+        conn.execute("INSERT OR REPLACE INTO meta VALUES ('ops_base', ?)", (str(base),))
+        self.seq = base
+
+    def _ultimo_seq(self, conn):
+        """Último seq asignado en `ops`, aunque ya se haya borrado."""
+        fila = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'ops'").fetchone()
+        return fila[0] if fila else 0
+
+    def _base(self, conn):
+        """Seq hasta el que las ops ya no están en la tabla."""
+        fila = conn.execute("SELECT valor FROM meta WHERE clave = 'ops_base'").fetchone()
+        return int(fila[0]) if fila else 0
+
+    def _al_dia(self, conn):
+        """Semana de los contadores; si ya empezó otra, los rehace desde los agregados."""
+        fila = conn.execute("SELECT valor FROM meta WHERE clave = 'semana'").fetchone()
+        actual = logic.semana_actual()
+        if fila is not None and fila[0] != actual:
+            lunes = datetime.date.today() - datetime.timedelta(days=datetime.date.today().weekday())
+            conn.execute(
+                "UPDATE materias SET horas = COALESCE((SELECT SUM(horas) FROM agregados_dia "
+                "WHERE materia_id = materias.id AND dia BETWEEN ? AND ?), 0)",
+                (lunes.isoformat(), (lunes + datetime.timedelta(days=6)).isoformat()))
+        if fila is None or fila[0] != actual:  # sin marca (base vieja): los contadores son de esta semana
+            conn.execute("INSERT OR REPLACE INTO meta VALUES ('semana', ?)", (actual,))
+        return actual
+
+    # --- Contrato de logic.Diario ---
+    def existe(self):
+        # La base se crea (y migra o siembra los datos por defecto) al abrirla,
+        # así los ids que ve la UI son siempre los que hay en disco.
+        with self._lock:
+            self._conexion()
+        return True
+
+    @perfil.medido("diario.cargar")
+    def cargar(self):
+        with self._lock:
+            conn = self._conexion()
+            with conn:
+                semana = self._al_dia(conn)
+            materias = [logic.Materia(nombre, meta, horas, mid) for mid, nombre, meta, horas in
+                        conn.execute("SELECT id, nombre, meta, horas FROM materias ORDER BY orden")]
+            todos = [{"id": tid, "text": texto, "done": bool(hecho)} for tid, texto, hecho in
+                     conn.execute("SELECT id, texto, hecho FROM todos ORDER BY orden")]
+            # El historial se arma desde los agregados diarios, no desde las sesiones
+            historial = logic.Historial(
+                ((mid or None, dia, horas, ciclos) for mid, dia, horas, ciclos in
+                 conn.execute("SELECT materia_id, dia, horas, ciclos FROM agregados_dia")),
+                [ts for ts, in conn.execute("SELECT ts FROM fronteras ORDER BY ts")], semana)
+            self.seq = self._ultimo_seq(conn)
+            self._version = conn.execute("PRAGMA data_version").fetchone()[0]
+        return materias, todos, historial, False
+
+    def anotar(self, op):
+        self.anotar_lote([op])
+
+    @perfil.medido("diario.anotar_lote")
+    def anotar_lote(self, ops):
+        """Todas las operaciones del lote en una sola transacción."""
+        with self._lock:
+            conn = self._conexion()
+            with conn:
+                semana = self._al_dia(conn)
+                for op in ops:
+                    self._aplicar(conn, op, semana)
+                conn.executemany("INSERT INTO ops (origen, op) VALUES (?, ?)",
+                                 ((self.origen, json.dumps(op, ensure_ascii=False)) for op in ops))
+                # Como Diario con COMPACTAR_CADA: la tabla no crece sin límite
+                self._sin_recortar += len(ops)
+                if self._sin_recortar >= logic.COMPACTAR_CADA:
+                    self._recortar_ops(conn)
+
+    def guardar_snapshot(self, materias, todos, historial=None):
+        with self._lock:
+            conn = self._conexion()
+            with conn:
+                self._volcar(materias, todos, historial)
+
+    def rutas_vigiladas(self):
+        # Todo commit pasa por el -wal; la base cambia al hacer checkpoint
+        return [self.ruta_db + "-wal", self.ruta_db]
+
+    def sincronizar(self):
+        """Ops de otras instancias desde la última llamada, en orden; None si
+        alguien reemplazó el estado o recortó ops que no vimos (hay que recargar)."""
+        with self._lock:
+            conn = self._conexion()
+            version = conn.execute("PRAGMA data_version").fetchone()[0]
+            if version == self._version:
+                return []  # solo escribió esta conexión (o nadie)
+            self._version = version
+            filas = conn.execute("SELECT seq, origen, op FROM ops WHERE seq > ? ORDER BY seq",
+                                 (self.seq,)).fetchall()
+            # La base se mira después de leer: un recorte entre medias como mucho
+            # provoca una recarga de más, nunca una op perdida
+            if self._base(conn) > self.seq:
+                self.seq = self._ultimo_seq(conn)
+                return None
+        if filas: self.seq = filas[-1][0]
+        return list(logic.aplanar(dict(json.loads(op), seq=seq, origen=origen)
+                                  for seq, origen, op in filas if origen != self.origen))
+
+    def guardar_binario(self):
+        # Cargar desde SQLite ya es leer filas indexadas: no hay JSON que evitar
+        pass
+
+    def cerrar(self):
+        """Al salir: recorta `ops`, vacía el WAL y cierra la conexión."""
+        with self._lock:
+            if self._conn is not None:
+                self._compactar(self._conn)
+                self._conn.close()
+                self._conn = None
+
+    def compactar(self):
+        with self._lock:
+            self._compactar(self._conexion())
+
+    def _compactar(self, conn):
+        with conn:
+            self._recortar_ops(conn)
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+    def _recortar_ops(self, conn):
+        """Deja en `ops` solo las RETENER_OPS últimas. Ya están aplicadas en las
+        filas; se guardan para las otras instancias, que recargan si se quedaron
+        más atrás. Llamar dentro de una transacción."""
+        self._sin_recortar = 0
+        base = self._ultimo_seq(conn) - RETENER_OPS
+        if base > self._base(conn):
+            conn.execute("DELETE FROM ops WHERE seq <= ?", (base,))
+            conn.execute("INSERT OR REPLACE INTO meta VALUES ('ops_base', ?)", (str(base),))
+
+    # --- Operaciones ---
+    def _aplicar(self, conn, op, semana):
+        """Aplica `op`; `semana` es la de los contadores (solo cuenta lo de esa semana)."""
+        tipo = op["op"]
+        if tipo == "lote":  # una fila en `ops`; sus ops se aplican en la misma transacción
+            for o in op["ops"]: self._aplicar(conn, o, semana)
+        elif tipo == "horas":
+            ts = op.get("ts", time.time())
+            # Solo suma al contador si es de esta semana y posterior a la última frontera
+            frontera = conn.execute("SELECT MAX(ts) FROM fronteras").fetchone()[0]
+            delta = op["delta"]
+            if logic.semana_de(ts) == semana and (frontera is None or ts >= frontera):
+                # Recortado sobre el contador ya fusionado, como Almacen._aplicar
+                fila = conn.execute("SELECT horas FROM materias WHERE id = ?", (op["id"],)).fetchone()
+                if fila is None: return
+                delta = max(delta, -fila[0])
+                conn.execute("UPDATE materias SET horas = max(horas + ?, 0) WHERE id = ?", (delta, op["id"]))
+            if not delta: return
+            conn.execute("INSERT INTO sesiones (materia_id, ts, horas) VALUES (?, ?, ?)",
+                         (op["id"], ts, delta))
+            self._agregar(conn, op["id"], ts, horas=delta)
+        elif tipo == "ciclo":
+            conn.execute("INSERT INTO ciclos (materia_id, ts, minutos) VALUES (?, ?, ?)",
+                         (op["id"], op["ts"], op["minutos"]))
+            self._agregar(conn, op["id"], op["ts"], ciclos=1)
+        elif tipo == "materia_crear":
+            m = op["materia"]
+            conn.execute(
+                "INSERT OR IGNORE INTO materias (id, nombre, meta, horas, orden) "
+                "VALUES (?, ?, ?, ?, (SELECT COALESCE(MAX(orden), -1) + 1 FROM materias))",
+                (m["id"], m["nombre"], m["meta"], m.get("horas_acumuladas", 0.0)))
+        elif tipo == "materia_borrar":
+            # Las sesiones se conservan: son historial, no estado
+            conn.execute("DELETE FROM materias WHERE id = ?", (op["id"],))
+        elif tipo == "materia_renombrar":
+            conn.execute("UPDATE materias SET nombre = ? WHERE id = ?", (op["nombre"], op["id"]))
+        elif tipo == "reiniciar_semana":
+            ts = op.get("ts", time.time())
+            if logic.semana_de(ts) == semana:
+                conn.execute("UPDATE materias SET horas = 0")
+            conn.execute("INSERT OR IGNORE INTO fronteras VALUES (?)", (ts,))
+        elif tipo == "semana_restaurar":
+            if logic.semana_de(op["ts"]) == semana:
+                conn.executemany("UPDATE materias SET horas = horas + ? WHERE id = ?",
+                                 ((horas, mid) for mid, horas in op["horas"].items()))
+            conn.execute("DELETE FROM fronteras WHERE ts = ?", (op["ts"],))
+        elif tipo == "tarea_crear":
+            t = op["tarea"]
+            conn.execute("INSERT OR IGNORE INTO todos (id, texto, hecho, orden) VALUES (?, ?, ?, ?)",
+                         (t["id"], t["text"], int(t["done"]), self._orden_tras(conn, op.get("despues_de", ""))))
+        elif tipo == "tarea_marcar":
+            conn.execute("UPDATE todos SET hecho = ? WHERE id = ?", (int(op["done"]), op["id"]))
+        elif tipo == "tarea_borrar":
+            conn.execute("DELETE FROM todos WHERE id = ?", (op["id"],))
+        elif tipo == "tarea_mover":
+            conn.execute("UPDATE todos SET orden = ? WHERE id = ?",
+                         (self._orden_tras(conn, op["despues_de"], excluir=op["id"]), op["id"]))
+
+    def _agregar(self, conn, mid, ts, horas=0.0, ciclos=0):
+        """Suma la sesión a su agregado diario (una fila, UPSERT)."""
+        conn.execute(
+            "INSERT INTO agregados_dia (materia_id, dia, horas, ciclos) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT (materia_id, dia) DO UPDATE SET "
+            "horas = horas + excluded.horas, ciclos = ciclos + excluded.ciclos",
+            (mid or "", logic._dia_y_semana(ts)[0], horas, ciclos))  # "" = ciclo sin materia
+
+    def _orden_tras(self, conn, despues_de, excluir=None):
+        """Orden fraccionario para insertar tras `despues_de` ("" = al final,
+        None = al principio) sin renumerar el resto: dos lecturas por índice."""
+        if despues_de == "":
+            fila = conn.execute("SELECT MAX(orden) FROM todos").fetchone()
+            return (fila[0] + 1.0) if fila[0] is not None else 0.0
+        if despues_de is None:
+            previo = None
+        else:
+            fila = conn.execute("SELECT orden FROM todos WHERE id = ?", (despues_de,)).fetchone()
+            previo = fila[0] if fila else None
+        fila = conn.execute(
+            "SELECT orden FROM todos WHERE orden > ? AND id != ? ORDER BY orden LIMIT 1",
+            (previo if previo is not None else float("-inf"), excluir or "")).fetchone()
+        siguiente = fila[0] if fila else None
+        if previo is None and siguiente is None: return 0.0
+        if previo is None: return siguiente - 1.0
+        if siguiente is None: return previo + 1.0
+        return (previo + siguiente) / 2.0
+
+    # --- Historial (consultas indexadas, sin cargar todo en memoria) ---
+    def horas_por_materia(self, desde, hasta):
+        """{materia_id: horas} registradas en [desde, hasta) (timestamps epoch)."""
+        with self._lock:
+            return dict(self._conexion().execute(
+                "SELECT materia_id, SUM(horas) FROM sesiones WHERE ts >= ? AND ts < ? GROUP BY materia_id",
+                (desde, hasta)))
+
+    def iter_sesiones(self):
+        """Todas las sesiones (materia_id, ts, horas) por orden de ts, en streaming.
+        Usa su propia conexión: en WAL la lectura no bloquea al persistidor."""
+        self.existe()
+        conn = sqlite3.connect(self.ruta_db)
+        try:
+            yield from conn.execute("SELECT materia_id, ts, horas FROM sesiones ORDER BY ts")
+        finally:
+            conn.close()
+
+    def sesiones(self, materia_id, desde=0.0, hasta=float("inf")):
+        """Sesiones (ts, horas) de una materia en el intervalo, por el índice (materia_id, ts)."""
+        with self._lock:
+            return self._conexion().execute(
+                "SELECT ts, horas FROM sesiones WHERE materia_id = ? AND ts >= ? AND ts < ? ORDER BY ts",
+                (materia_id, desde, hasta)).fetchall()
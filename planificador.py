@@ -0,0 +1,281 @@
+# planificador.py
+"""
+Plan semanal de ciclos ultradianos. Lo que le falta a cada materia para su
+meta semanal se reparte en ciclos de GestorUltradiano.WORK_MIN..WORK_MAX
+minutos, cada uno seguido de su descanso 1:6, dentro de las ventanas de
+disponibilidad de los días que quedan de la semana. Eligen primero las
+materias con más minutos pendientes, de a un ciclo por turno, así que los
+días quedan intercalados.
+
+El plan es incremental: cada op del almacén solo toca los ciclos de su
+materia (si sobran se liberan los últimos, si faltan se buscan huecos) y los
+huecos liberados pasan a las materias que no cabían. Los ciclos que ya
+terminaron se descartan y lo que no se hizo vuelve a la cola.
+
+La disponibilidad se lee del horario.json del espacio activo (junto a su
+progress.json), p. ej.:
+
+    {"lunes": [["09:00", "13:00"], ["16:00", "20:00"]], "sabado": [["10:00", "14:00"]]}
+"""
+import bisect
+import datetime
+import heapq
+import itertools
+import json
+import math
+import os
+
+import logic
+
+ARCHIVO_HORARIO = "horario.json"
+DIAS = ("lunes", "martes", "miercoles", "jueves", "viernes", "sabado", "domingo")
+HORARIO_POR_DEFECTO = dict({dia: [["09:00", "13:00"], ["16:00", "20:00"]] for dia in DIAS[:5]},
+                           sabado=[["10:00", "14:00"]])
+CICLO_MINIMO = 15  # minutos pendientes por debajo de esto no se planifican
+REPLANIFICAN = ("recarga", "reiniciar_semana", "semana_restaurar")
+AJUSTAN = ("horas", "materia_crear", "materia_borrar")  # solo tocan los ciclos de su materia
+
+def cargar_horario(ruta=None):
+    """{0..6 (lunes..domingo): [(desde, hasta)]} como datetime.time, ordenadas."""
+    ruta = ruta or os.path.join(logic.directorio_datos, ARCHIVO_HORARIO)
+    try:
+        with open(ruta) as f:
+            crudo = json.load(f)
+    except FileNotFoundError:
+        crudo = HORARIO_POR_DEFECTO
+    try:
+        return {i: sorted((datetime.time.fromisoformat(desde), datetime.time.fromisoformat(hasta))
+                          for desde, hasta in crudo.get(dia, ()))
+                for i, dia in enumerate(DIAS)}
+    except (AttributeError, TypeError, ValueError) as e:
+        raise ValueError(f"{ruta}: se esperaba {{dia: [[\"HH:MM\", \"HH:MM\"], ...]}} ({e})")
+
+def descanso(minutos):
+    """Minutos de descanso tras `minutos` de trabajo (la regla 1:6 del motor)."""
+    return logic.GestorUltradiano.descanso_para(minutos * 60) / 60
+
+def siguiente_ciclo(pendiente):
+    """Minutos del próximo ciclo: WORK_MIN, o todo lo que queda si cabe en WORK_MAX."""
+    motor = logic.GestorUltradiano
+    return math.ceil(pendiente) if pendiente <= motor.WORK_MAX else motor.WORK_MIN
+
+def _minutos(delta):
+    return delta.total_seconds() / 60
+
+class Ciclo:
+    """Un ciclo planificado: trabajo de `minutos` desde `inicio` y luego su descanso."""
+    __slots__ = ("materia_id", "inicio", "minutos", "ventana")
+
+    def __init__(self, materia_id, inicio, minutos, ventana):
+        self.materia_id = materia_id
+        self.inicio = inicio
+        self.minutos = minutos
+        self.ventana = ventana
+
+    @property
+    def fin(self):
+        return self.inicio + datetime.timedelta(minutes=self.minutos)
+
+    @property
+    def libre_desde(self):
+        """Fin del descanso: el siguiente ciclo no empieza antes."""
+        return self.fin + datetime.timedelta(minutes=descanso(self.minutos))
+
+class Ventana:
+    """Franja de disponibilidad de un día con sus ciclos, ordenados por inicio.
+    El descanso del último ciclo puede salirse del final de la franja."""
+    __slots__ = ("inicio", "fin", "ciclos")
+
+    def __init__(self, inicio, fin):
+        self.inicio = inicio
+        self.fin = fin
+        self.ciclos = []
+
+    def _huecos(self, desde):
+        """(inicio, minutos de trabajo que caben, posición) de cada hueco libre."""
+        cursor = max(self.inicio, desde)
+        for i, c in enumerate(self.ciclos):
+            if c.inicio > cursor:
+                # Entre ciclos el descanso del nuevo tiene que caber también
+                libre = _minutos(c.inicio - cursor)
+                yield cursor, min(libre * 6 / 7, libre - 2), i
+            cursor = max(cursor, c.libre_desde)
+        if self.fin > cursor:
+            yield cursor, _minutos(self.fin - cursor), len(self.ciclos)
+
+    def hueco(self, minutos, desde):
+        """(inicio, posición) del primer hueco donde caben `minutos` de trabajo, o None."""
+        for inicio, cabe, i in self._huecos(desde):
+            if cabe >= minutos:
+                return inicio, i
+        return None
+
+    def mayor_hueco(self, desde):
+        return max((cabe for _, cabe, _ in self._huecos(desde)), default=0.0)
+
+class Plan:
+    """Plan de la semana en curso enganchado a los avisos del almacén."""
+
+    def __init__(self, almacen, horario=None, reloj=datetime.datetime.now):
+        self.almacen = almacen
+        self._horario_fijo = horario is not None
+        self.horario = horario if horario is not None else cargar_horario()
+        self.reloj = reloj
+        self.replanificar()
+        almacen.suscribir(self._al_cambiar)
+
+    # --- Resolución completa (arranque, semana nueva, recarga) ---
+    def replanificar(self):
+        ahora = self.reloj()
+        self._semana = ahora.isocalendar()[:2]
+        self.ventanas = self._ventanas(ahora)
+        self._ciclos = {}      # materia_id -> [Ciclo] por inicio
+        self._pendiente = {}   # materia_id -> minutos aún sin hueco
+        self._cola = []        # heap (-pendiente, orden, materia_id); entradas viejas se ignoran
+        self._orden = {}
+        self._turnos = itertools.count()
+        for mid in self.almacen.materias:
+            self._ajustar(mid)
+        self._rellenar()
+
+    def _ventanas(self, ahora):
+        lunes = ahora.date() - datetime.timedelta(days=ahora.weekday())
+        ventanas = []
+        for d in range(ahora.weekday(), 7):
+            fecha = lunes + datetime.timedelta(days=d)
+            for desde, hasta in self.horario.get(d, ()):
+                inicio = datetime.datetime.combine(fecha, desde)
+                fin = datetime.datetime.combine(fecha, hasta)
+                if fin > ahora:
+                    ventanas.append(Ventana(max(inicio, ahora), fin))
+        return ventanas
+
+    # --- Cambios incrementales ---
+    def _al_cambiar(self, op):
+        tipo = op["op"]
+        if tipo == "recarga" and not self._horario_fijo:
+            # Otro espacio (u otro horario.json): uno roto deja el horario anterior
+            try:
+                self.horario = cargar_horario()
+            except ValueError:
+                pass
+        ops = op["ops"] if tipo == "lote" else (op,)
+        if any(o["op"] in REPLANIFICAN for o in ops):
+            self.replanificar()
+        elif any(o["op"] in AJUSTAN for o in ops):
+            # Un lote ajusta cada materia y reparte los huecos una sola vez
+            if not self._al_dia(): return
+            for o in ops:
+                if o["op"] in AJUSTAN:
+                    self._ajustar(o["materia"]["id"] if o["op"] == "materia_crear" else o["id"])
+            self._rellenar()
+
+    def _requerido(self, mid):
+        m = self.almacen.materias.get(mid)
+        return max(m.meta_semanal - m.horas_acumuladas, 0.0) * 60 if m else 0.0
+
+    def _ajustar(self, mid):
+        """Cuadra los ciclos de una materia con lo que le falta; solo toca los suyos."""
+        ciclos = self._ciclos.setdefault(mid, [])
+        requerido = self._requerido(mid)
+        planificado = sum(c.minutos for c in ciclos)
+        # Sobra: se liberan los del final de la semana; lo próximo no se mueve
+        while ciclos and planificado - requerido >= CICLO_MINIMO:
+            c = ciclos.pop()
+            c.ventana.ciclos.remove(c)
+            planificado -= c.minutos
+        pendiente = requerido - planificado
+        if mid not in self.almacen.materias:
+            self._ciclos.pop(mid, None)
+            self._pendiente.pop(mid, None)
+            return
+        self._pendiente[mid] = pendiente
+        if mid not in self._orden:
+            self._orden[mid] = next(self._turnos)
+        if pendiente >= CICLO_MINIMO:
+            heapq.heappush(self._cola, (-pendiente, self._orden[mid], mid))
+
+    def _mayor_hueco(self, ahora):
+        return max((v.mayor_hueco(ahora) for v in self.ventanas), default=0.0)
+
+    def _rellenar(self):
+        """Da los huecos libres a las materias con más pendiente, un ciclo por turno."""
+        ahora = self.reloj()
+        apartadas = []   # su próximo ciclo no cabe en ningún hueco actual
+        mayor = self._mayor_hueco(ahora)
+        while self._cola and mayor >= CICLO_MINIMO:
+            entrada = heapq.heappop(self._cola)
+            negativo, orden, mid = entrada
+            pendiente = self._pendiente.get(mid, 0.0)
+            if -negativo != pendiente or pendiente < CICLO_MINIMO:
+                continue
+            minutos = siguiente_ciclo(pendiente)
+            if minutos > mayor:
+                apartadas.append(entrada)
+                continue
+            self._colocar(mid, minutos, ahora)
+            pendiente -= minutos
+            self._pendiente[mid] = pendiente
+            if pendiente >= CICLO_MINIMO:
+                heapq.heappush(self._cola, (-pendiente, orden, mid))
+            mayor = self._mayor_hueco(ahora)
+        for entrada in apartadas:
+            heapq.heappush(self._cola, entrada)
+
+    def _colocar(self, mid, minutos, ahora):
+        for ventana in self.ventanas:
+            sitio = ventana.hueco(minutos, ahora)
+            if sitio is not None:
+                inicio, i = sitio
+                c = Ciclo(mid, inicio, minutos, ventana)
+                ventana.ciclos.insert(i, c)
+                ciclos = self._ciclos.setdefault(mid, [])
+                ciclos.insert(bisect.bisect([x.inicio for x in ciclos], inicio), c)
+                return c
+        return None
+
+    def _al_dia(self):
+        """Descarta lo ya terminado (lo que no se hizo vuelve a la cola). False si
+        cambió la semana y hubo que replanificar entero."""
+        ahora = self.reloj()
+        if ahora.isocalendar()[:2] != self._semana:
+            self.replanificar()
+            return False
+        afectadas = set()
+        while self.ventanas and self.ventanas[0].inicio <= ahora:
+            ventana = self.ventanas[0]
+            while ventana.ciclos and ventana.ciclos[0].fin <= ahora:
+                c = ventana.ciclos.pop(0)
+                self._ciclos[c.materia_id].remove(c)
+                afectadas.add(c.materia_id)
+            if ventana.fin > ahora:
+                break
+            self.ventanas.pop(0)
+        for mid in afectadas:
+            self._ajustar(mid)
+        if afectadas:
+            self._rellenar()
+        return True
+
+    # --- Consulta ---
+    def proximo(self):
+        """Primer ciclo aún no terminado (el que arranca el botón WORK) o None."""
+        self._al_dia()
+        for ventana in self.ventanas:
+            if ventana.ciclos:
+                return ventana.ciclos[0]
+        return None
+
+    def dias(self):
+        """[(fecha, [Ciclo])] de hoy al domingo, solo días con ciclos."""
+        self._al_dia()
+        dias = {}
+        for ventana in self.ventanas:
+            if ventana.ciclos:
+                dias.setdefault(ventana.inicio.date(), []).extend(ventana.ciclos)
+        return list(dias.items())
+
+    def sin_hueco(self):
+        """[(materia_id, minutos)] que no caben esta semana, el mayor primero."""
+        return sorted(((mid, p) for mid, p in self._pendiente.items() if p >= CICLO_MINIMO),
+                      key=lambda x: -x[1])
@@ -0,0 +1,32 @@
+# tests/conftest.py
+"""Los módulos viven en la raíz del repo (sin paquete): se añade al path.
+
+Cada test lleva la petición que cubre (`pytestmark = pytest.mark.peticion("user-002")`
+por módulo, o el decorador en un test suelto); `--peticion user-002` corre solo esos."""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def pytest_addoption(parser):
+    parser.addoption("--peticion", action="append", default=[], metavar="ID",
+                     help="corre solo los tests de esa petición (repetible)")
+
+
+def pytest_configure(config):
+    config.addinivalue_line("markers", "peticion(id): petición del backlog que cubre el test")
+
+
+def pytest_collection_modifyitems(config, items):
+    elegidas = set(config.getoption("peticion"))
+    for item in items:
+        # El marcador más cercano (el del test) manda sobre el del módulo
+        if item.get_closest_marker("peticion") is None:
+            raise pytest.UsageError(f"{item.nodeid}: falta @pytest.mark.peticion")
+    if elegidas:
+        fuera = [i for i in items if i.get_closest_marker("peticion").args[0] not in elegidas]
+        items[:] = [i for i in items if i not in fuera]
+        config.hook.pytest_deselected(items=fuera)
@@ -0,0 +1,18 @@
+# tests/test_arranque.py
+"""Arranque: lo que solo usa una pantalla aparte no se importa al abrir la app."""
+import os
+import subprocess
+import sys
+
+import pytest
+
+pytestmark = pytest.mark.peticion("user-021")
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_analitica_y_planificador_no_se_importan_al_arrancar():
+    # Proceso aparte: en este ya los importaron otros tests
+    codigo = "import sys, tui_app; print(sorted({'analitica', 'planificador'} & set(sys.modules)))"
+    salida = subprocess.run([sys.executable, "-c", codigo], cwd=RAIZ, capture_output=True, text=True, check=True)
+    assert salida.stdout.strip() == "[]"
@@ -0,0 +1,68 @@
+# tests/test_busqueda.py
+"""Filtro difuso: tildes y erratas, orden por relevancia e índice al día con las ops."""
+import pytest
+
+import busqueda
+import logic
+
+pytestmark = pytest.mark.peticion("user-020")
+
+NOMBRES = {"m1": "Matemáticas Discretas", "m2": "Cálculo", "m3": "Física", "m4": "Álgebra Lineal",
+           "m5": "Historia del cálculo"}
+
+
+@pytest.fixture
+def indice():
+    return busqueda.IndiceDifuso(NOMBRES.items())
+
+
+def test_sin_tildes_ni_mayusculas(indice):
+    assert indice.buscar("MATEMATICAS")[0] == "m1"
+    assert indice.buscar("fisica") == ["m3"]
+
+
+def test_tolera_erratas(indice):
+    assert indice.buscar("calclo")[0] == "m2"
+    assert indice.buscar("algebar lineal")[0] == "m4"
+    assert indice.buscar("zzzz") == []
+
+
+def test_prefijo_antes_que_subcadena(indice):
+    assert indice.buscar("calculo")[:2] == ["m2", "m5"]
+
+
+def test_consulta_vacia_y_corta(indice):
+    assert indice.buscar("") == list(NOMBRES)
+    assert indice.buscar("  ", limite=2) == ["m1", "m2"]
+    assert set(indice.buscar("ca")) == {"m1", "m2", "m5", "m3"}  # subcadena directa
+
+
+@pytest.mark.parametrize("consulta", ["calclo", "fis", "lineal", "nada que ver"])
+def test_coincide_como_buscar(indice, consulta):
+    assert {eid for eid in NOMBRES if indice.coincide(eid, consulta)} == set(indice.buscar(consulta))
+
+
+def test_buscador_sigue_las_ops_del_almacen():
+    almacen = logic.Almacen([logic.Materia("Química", 3, 0, "q")])
+    buscador = busqueda.Buscador(almacen)
+    almacen.aplicar(logic.op_crear_materia(logic.Materia("Biología", 2, 0, "b")))  # antes de construir
+    assert buscador.materias.buscar("biologia") == ["b"]
+
+    almacen.aplicar(logic.op_renombrar_materia(almacen.materias["b"], "Genética"))
+    assert buscador.materias.buscar("biologia") == [] and buscador.materias.buscar("genetica") == ["b"]
+    almacen.aplicar(logic.op_borrar_materia(almacen.materias["q"]))
+    assert buscador.materias.buscar("quimica") == []
+
+    crear = logic.op_crear_tarea("Repasar genética")
+    almacen.aplicar(logic.op_lote([crear, logic.op_crear_tarea("Lavar ropa")]))
+    assert buscador.tareas.buscar("repasar") == [crear["tarea"]["id"]]
+    almacen.aplicar(logic.op_borrar_tarea(almacen.todos.get(crear["tarea"]["id"])))
+    assert buscador.tareas.buscar("repasar") == []
+
+
+def test_recarga_reconstruye_el_indice():
+    almacen = logic.Almacen([logic.Materia("Química", 3, 0, "q")])
+    buscador = busqueda.Buscador(almacen)
+    assert buscador.materias.buscar("quimica") == ["q"]
+    almacen.reemplazar([logic.Materia("Latín", 2, 0, "l")], [], logic.Historial())
+    assert buscador.materias.buscar("quimica") == [] and buscador.materias.buscar("latin") == ["l"]
@@ -0,0 +1,126 @@
+# tests/test_demonio.py
+"""Pedidos al demonio: lo que no es un número finito o deja horas negativas se
+rechaza sin aplicar; y el socket solo se usa si es del usuario."""
+import asyncio
+import os
+import stat
+
+import pytest
+
+import cli
+import demonio
+import logic
+
+pytestmark = pytest.mark.peticion("user-019")
+
+
+@pytest.fixture
+def servidor(tmp_path, monkeypatch):
+    diario = logic.Diario(str(tmp_path / "progress.json"), str(tmp_path / "progress.journal"))
+    diario.sembrar([logic.Materia("Álgebra", 6, 2, "m1")])
+    monkeypatch.setattr(logic, "diario_global", diario)
+    d = demonio.Demonio(ruta=str(tmp_path / "demonio.sock"))
+    yield d
+    d.persistidor.detener()
+
+
+def horas(d):
+    return d.almacen.materias["m1"].horas_acumuladas
+
+
+@pytest.mark.parametrize("valor", ["nan", "inf", "-inf", float("inf"), True])
+def test_log_rechaza_horas_no_finitas(servidor, valor):
+    with pytest.raises(ValueError):
+        servidor._responder({"cmd": "log", "materia": "Álgebra", "horas": valor}, None)
+    assert horas(servidor) == 2
+
+
+def test_log_rechaza_restar_mas_de_lo_acumulado(servidor):
+    with pytest.raises(ValueError):
+        servidor._responder({"cmd": "log", "materia": "m1", "horas": -1000}, None)
+    assert horas(servidor) == 2
+    servidor._responder({"cmd": "log", "materia": "m1", "horas": "-2"}, None)
+    assert horas(servidor) == 0
+
+
+@pytest.mark.parametrize("minutos", ["nan", "inf", 0, -5])
+def test_iniciar_rechaza_minutos_no_validos(servidor, minutos):
+    with pytest.raises(ValueError):
+        servidor._responder({"cmd": "iniciar", "minutos": minutos}, None)
+    assert servidor.almacen.motor.state == "IDLE"
+
+
+def test_op_horas_cruda_no_resta_mas_de_lo_acumulado(servidor):
+    with pytest.raises(ValueError):
+        servidor._responder({"cmd": "op", "op": {"op": "horas", "id": "m1", "delta": -1000}}, None)
+    # Dentro de un lote tampoco: no se aplica ninguna de sus ops
+    lote = logic.op_lote([{"op": "tarea_crear", "tarea": {"id": "t1", "text": "x", "done": False}},
+                          {"op": "horas", "id": "m1", "delta": -3}])
+    with pytest.raises(ValueError):
+        servidor._responder({"cmd": "op", "op": lote}, None)
+    assert horas(servidor) == 2 and not servidor.almacen.todos.a_dicts()
+
+
+def test_op_horas_cruda_no_finita(servidor):
+    with pytest.raises(ValueError):
+        servidor._responder({"cmd": "op", "op": {"op": "horas", "id": "m1", "delta": float("nan")}}, None)
+    assert horas(servidor) == 2
+
+
+@pytest.mark.parametrize("argv", [["log", "Álgebra", "nan"], ["log", "Álgebra", "inf"],
+                                  ["iniciar", "-m", "0"], ["iniciar", "-m", "nan"]])
+def test_cli_rechaza_numeros_no_validos(argv):
+    with pytest.raises(SystemExit) as salida:
+        cli.main(argv)
+    assert salida.value.code == 2
+
+
+def test_cli_log_sin_demonio_no_resta_mas_de_lo_acumulado(servidor, monkeypatch, capsys):
+    def sin_demonio(*_, **__):
+        raise ConnectionRefusedError
+    monkeypatch.setattr(demonio, "pedir", sin_demonio)
+    monkeypatch.setattr(logic, "iniciar", lambda: None)
+    assert cli.main(["log", "Álgebra", "-1000"]) == 1
+    assert "no se pueden restar" in capsys.readouterr().err
+    assert logic.cargar_datos_globales()["materias"][0].horas_acumuladas == 2
+
+
+# --- Socket: solo del usuario ---
+def test_directorio_privado_se_crea_0700(tmp_path):
+    directorio = tmp_path / "tracker-tui-x"
+    demonio._directorio_privado(str(directorio))
+    assert stat.S_IMODE(directorio.stat().st_mode) == 0o700
+    demonio._directorio_privado(str(directorio))  # ya existe y es nuestro: sin quejas
+
+
+def test_directorio_privado_rechaza_abierto_o_enlace(tmp_path):
+    abierto = tmp_path / "abierto"
+    abierto.mkdir()
+    os.chmod(abierto, 0o755)
+    enlace = tmp_path / "enlace"
+    enlace.symlink_to(tmp_path / "abierto")
+    for directorio in (abierto, enlace):
+        with pytest.raises(SystemExit):
+            demonio._directorio_privado(str(directorio))
+    os.chmod(abierto, 0o700)  # aunque el destino sea privado, un enlace no vale
+    with pytest.raises(SystemExit):
+        demonio._directorio_privado(str(enlace))
+
+
+def test_cliente_rechaza_socket_de_otro_usuario(tmp_path, monkeypatch):
+    ruta = tmp_path / "demonio.sock"
+    ruta.touch()
+    monkeypatch.setattr(demonio.os, "getuid", lambda: os.stat(ruta).st_uid + 1)
+    with pytest.raises(PermissionError):
+        demonio.pedir({"cmd": "estado"}, str(ruta))
+    assert asyncio.run(demonio.Cliente.conectar(str(ruta))) == (None, None)
+
+
+def test_socket_huerfano_que_no_se_puede_borrar(servidor, monkeypatch):
+    open(servidor.ruta, "w").close()  # nadie escucha ahí
+
+    def sin_permiso(ruta):
+        raise PermissionError(13, "Permission denied", ruta)
+    monkeypatch.setattr(demonio.os, "unlink", sin_permiso)
+    with pytest.raises(SystemExit, match="socket huérfano"):
+        asyncio.run(servidor.servir())
@@ -0,0 +1,100 @@
+# tests/test_deshacer.py
+"""Deshacer / rehacer sobre el almacén en memoria."""
+import pytest
+
+import deshacer
+import logic
+
+pytestmark = pytest.mark.peticion("user-024")
+
+
+@pytest.fixture
+def almacen():
+    materias = [logic.Materia("Álgebra", 6, 0, "m1"), logic.Materia("Física", 4, 0, "m2")]
+    return logic.Almacen(materias, motor=logic.GestorUltradiano())
+
+
+@pytest.fixture
+def pila(almacen):
+    return deshacer.Deshacer(almacen)
+
+
+def horas(almacen):
+    return {mid: m.horas_acumuladas for mid, m in almacen.materias.items()}
+
+
+def textos(almacen):
+    return [t.texto for t in almacen.todos]
+
+
+def test_horas(almacen, pila):
+    almacen.aplicar(logic.op_horas(almacen.materias["m1"], 2.0))
+    assert pila.deshacer()["op"] == "horas"
+    assert horas(almacen) == {"m1": 0.0, "m2": 0.0}
+    assert almacen.estadisticas()["total_horas"] == 0.0
+    pila.rehacer()
+    assert horas(almacen)["m1"] == 2.0
+    assert pila.rehacer() is None
+
+
+def test_borrar_materia_la_restaura_con_sus_horas(almacen, pila):
+    almacen.aplicar(logic.op_horas(almacen.materias["m2"], 1.5))
+    almacen.aplicar(logic.op_borrar_materia(almacen.materias["m2"]))
+    assert "m2" not in almacen.materias
+    pila.deshacer()
+    assert almacen.materias["m2"].nombre == "Física"
+    assert horas(almacen)["m2"] == 1.5
+    assert almacen.buscar("física") is almacen.materias["m2"]
+
+
+def test_renombrar(almacen, pila):
+    almacen.aplicar(logic.op_renombrar_materia(almacen.materias["m1"], "Cálculo"))
+    pila.deshacer()
+    assert almacen.materias["m1"].nombre == "Álgebra"
+    assert almacen.buscar("cálculo") is None
+    pila.rehacer()
+    assert almacen.buscar("cálculo") is almacen.materias["m1"]
+
+
+def test_reiniciar_semana(almacen, pila):
+    almacen.aplicar(logic.op_horas(almacen.materias["m1"], 3.0))
+    almacen.aplicar(logic.op_reiniciar_semana(almacen.materias.values()))
+    assert horas(almacen) == {"m1": 0.0, "m2": 0.0}
+    pila.deshacer()
+    assert horas(almacen) == {"m1": 3.0, "m2": 0.0}
+    assert almacen.historial.fronteras == []
+
+
+def test_tareas_vuelven_a_su_sitio(almacen, pila):
+    ops = [logic.op_crear_tarea(texto) for texto in "abc"]
+    for op in ops:
+        almacen.aplicar(op)
+    b = almacen.todos.get(ops[1]["tarea"]["id"])
+    almacen.aplicar(logic.op_mover_tarea(b, ops[2]["tarea"]["id"]))
+    assert textos(almacen) == ["a", "c", "b"]
+    almacen.aplicar(logic.op_borrar_tarea(almacen.todos.get(ops[0]["tarea"]["id"])))
+    pila.deshacer()
+    assert textos(almacen) == ["a", "c", "b"]
+    pila.deshacer()
+    assert textos(almacen) == ["a", "b", "c"]
+
+
+def test_lote_en_un_paso(almacen, pila):
+    almacen.aplicar(logic.op_lote([logic.op_crear_tarea("x"), logic.op_horas(almacen.materias["m1"], 1.0)]))
+    assert len(pila) == 1
+    pila.deshacer()
+    assert textos(almacen) == [] and horas(almacen)["m1"] == 0.0
+
+
+def test_nuevo_cambio_vacia_rehacer(almacen, pila):
+    almacen.aplicar(logic.op_horas(almacen.materias["m1"], 1.0))
+    pila.deshacer()
+    almacen.aplicar(logic.op_horas(almacen.materias["m2"], 1.0))
+    assert pila.rehacer() is None
+
+
+def test_ajenas_y_sin_efecto_no_se_apilan(almacen, pila):
+    almacen.aplicar(logic.op_lote([logic.op_crear_tarea("ajena")], origen="diario"))
+    almacen.aplicar(logic.op_horas(almacen.materias["m1"], -1.0))  # ya estaba en 0
+    assert len(pila) == 0
+    assert pila.deshacer() is None
@@ -0,0 +1,100 @@
+# tests/test_diario.py
+"""Diario append-only + snapshot: ida y vuelta, compactación y (user-016) varias instancias."""
+import json
+import os
+
+import pytest
+
+import logic
+
+pytestmark = pytest.mark.peticion("user-002")
+
+
+@pytest.fixture
+def rutas(tmp_path):
+    return str(tmp_path / "progress.json"), str(tmp_path / "progress.journal")
+
+
+def nuevo_diario(rutas):
+    return logic.Diario(*rutas)
+
+
+def sembrado(rutas):
+    diario = nuevo_diario(rutas)
+    diario.sembrar([logic.Materia("Álgebra", 6, 0, "m1"), logic.Materia("Física", 4, 0, "m2")])
+    return diario
+
+
+def estado(diario):
+    materias, todos, _, _ = diario.cargar()
+    return {m.id: (m.nombre, m.horas_acumuladas) for m in materias}, [(t["text"], t["done"]) for t in todos]
+
+
+def anotar_varias(diario):
+    materias, todos, historial, _ = diario.cargar()
+    almacen = logic.Almacen(materias, todos, motor=logic.GestorUltradiano(), historial=historial)
+    ops = [logic.op_horas(almacen.materias["m1"], 1.5), logic.op_crear_tarea("leer")]
+    ops.append(logic.op_marcar_tarea(ops[1]["tarea"]["id"], True))
+    ops.append(logic.op_renombrar_materia(almacen.materias["m2"], "Física II"))
+    for op in ops:
+        almacen.aplicar(op)
+        diario.anotar(op)
+    return ops
+
+
+ESPERADO = ({"m1": ("Álgebra", 1.5), "m2": ("Física II", 0.0)}, [("leer", True)])
+
+
+def test_ida_y_vuelta_por_el_diario(rutas):
+    diario = sembrado(rutas)
+    anotar_varias(diario)
+    with open(rutas[1]) as f:
+        assert len(f.readlines()) == 4
+    assert estado(nuevo_diario(rutas)) == ESPERADO
+
+
+def test_compactar_deja_el_mismo_estado(rutas):
+    diario = sembrado(rutas)
+    anotar_varias(diario)
+    diario.compactar()
+    assert os.path.getsize(rutas[1]) == 0
+    with open(rutas[0]) as f:
+        assert json.load(f)["seq"] == 4
+    assert os.path.exists(rutas[0] + ".bak")
+    assert estado(nuevo_diario(rutas)) == ESPERADO
+
+
+def test_registro_rasgado_se_ignora(rutas):
+    diario = sembrado(rutas)
+    anotar_varias(diario)
+    with open(rutas[1], "a") as f:
+        f.write('{"op": "horas", "id": "m1", "del')  # corte a mitad de escritura
+    otro = nuevo_diario(rutas)
+    assert estado(otro) == ESPERADO
+    otro.anotar({"op": "horas", "id": "m1", "delta": 1.0})
+    assert estado(nuevo_diario(rutas))[0]["m1"] == ("Álgebra", 2.5)
+
+
+@pytest.mark.peticion("user-016")
+def test_otra_instancia_recibe_las_ops(rutas):
+    a = sembrado(rutas)
+    b = nuevo_diario(rutas)
+    a.cargar()
+    b.cargar()
+    ops = anotar_varias(a)
+    ajenas = b.sincronizar()
+    assert [op["op"] for op in ajenas] == [op["op"] for op in ops]
+    assert b.sincronizar() == []
+    assert a.sincronizar() == []  # las propias no vuelven
+
+
+@pytest.mark.peticion("user-016")
+def test_compactacion_ajena_obliga_a_recargar(rutas):
+    a = sembrado(rutas)
+    b = nuevo_diario(rutas)
+    a.cargar()
+    b.cargar()
+    anotar_varias(a)
+    a.compactar()
+    assert b.sincronizar() is None
+    assert estado(b) == ESPERADO
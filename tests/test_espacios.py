@@ -0,0 +1,103 @@
+# tests/test_espacios.py
+"""Espacios de trabajo: nombre activo, migración de datos sueltos, cabeceras y shards separados."""
+import json
+import os
+
+import pytest
+
+import espacios
+import logic
+
+pytestmark = pytest.mark.peticion("user-023")
+
+
+@pytest.fixture
+def raiz(tmp_path, monkeypatch):
+    r = tmp_path / "tracker-tui"
+    monkeypatch.setattr(espacios, "RAIZ", str(r))
+    monkeypatch.setattr(espacios, "DIR_ESPACIOS", str(r / "espacios"))
+    monkeypatch.setattr(espacios, "ARCHIVO_ACTIVO", str(r / "activo"))
+    monkeypatch.setattr(espacios, "ARCHIVO_LEGADOS", str(r / "legados.json"))
+    monkeypatch.delenv("TRACKER_ESPACIO", raising=False)
+    monkeypatch.delenv("TRACKER_BACKEND", raising=False)
+    for atributo in ("diario_global", "espacio_actual", "directorio_datos"):  # abrir_espacio los cambia
+        monkeypatch.setattr(logic, atributo, getattr(logic, atributo))
+    return r
+
+
+@pytest.fixture
+def legado(tmp_path):
+    """Directorio de trabajo con los datos sueltos de antes de los espacios."""
+    d = tmp_path / "proyecto"
+    d.mkdir()
+    logic.Diario(str(d / espacios.SNAPSHOT), str(d / "progress.journal")).sembrar([logic.Materia("Álgebra", 6, 2, "m1")])
+    (d / "horario.json").write_text("{}")
+    return d
+
+
+def materias(nombre):
+    logic.abrir_espacio(nombre)
+    return [m.nombre for m in logic.cargar_datos_globales()["materias"]]
+
+
+@pytest.mark.parametrize("nombre", ["", "  ", ".oculto", "a/b", "x" * 65])
+def test_nombre_no_valido(nombre):
+    with pytest.raises(ValueError):
+        espacios.validar(nombre)
+
+
+def test_activo(raiz, monkeypatch):
+    assert espacios.activo() == espacios.POR_DEFECTO
+    espacios.fijar_activo("Verano")
+    assert espacios.activo() == "Verano"
+    monkeypatch.setenv("TRACKER_ESPACIO", "Invierno")  # solo para esta ejecución
+    assert espacios.activo() == "Invierno"
+
+
+def test_principal_migra_los_datos_sueltos(raiz, legado):
+    ruta = espacios.preparar(espacios.POR_DEFECTO, str(legado))
+    assert sorted(os.listdir(ruta)) == ["horario.json", "progress.json"]
+    assert espacios.aviso_legado(str(legado)) is None
+    # Lo suelto cambia después de copiarlo: se avisa y no se vuelve a copiar encima
+    with open(legado / espacios.SNAPSHOT, "a") as f:
+        f.write(" ")
+    assert "principal" in espacios.aviso_legado(str(legado))
+    espacios.preparar(espacios.POR_DEFECTO, str(legado))
+    assert os.path.getsize(os.path.join(ruta, "progress.json")) < os.path.getsize(legado / espacios.SNAPSHOT)
+
+
+def test_otros_espacios_no_migran(raiz, legado):
+    assert os.listdir(espacios.preparar("Verano", str(legado))) == []
+    assert "ningún espacio" in espacios.aviso_legado(str(legado))
+
+
+def test_adoptar(raiz, legado, tmp_path):
+    espacios.adoptar("Viejo", str(legado))
+    assert espacios.aviso_legado(str(legado)) is None
+    with pytest.raises(ValueError, match="ya tiene datos"):
+        espacios.adoptar("Viejo", str(legado))
+    with pytest.raises(ValueError, match="no hay"):
+        espacios.adoptar("Otro", str(tmp_path))
+
+
+def test_shards_independientes_y_cabeceras(raiz):
+    assert materias("Verano") == [m.nombre for m in logic._datos_por_defecto()]
+    logic.crear_materia("Latín", 3)
+    logic.diario_global.cerrar()
+    assert "Latín" not in materias("Invierno")
+    logic.diario_global.cerrar()
+    assert "Latín" in materias("Verano")
+
+    cabeceras = dict(espacios.resumen())
+    assert set(cabeceras) == {"Invierno", "Verano"}
+    assert cabeceras["Verano"]["materias"] == cabeceras["Invierno"]["materias"] + 1
+    assert cabeceras["Verano"]["meta"] == cabeceras["Invierno"]["meta"] + 3
+
+
+def test_cabecera_se_lee_sin_parsear_el_resto(tmp_path):
+    ruta = tmp_path / espacios.SNAPSHOT
+    ruta.write_text(espacios.volcar({"horas": 1.5}, {"seq": 3, "materias": []}))
+    assert json.loads(ruta.read_text())["seq"] == 3  # sigue siendo JSON válido
+    assert espacios.leer_cabecera(str(ruta)) == {"horas": 1.5}
+    ruta.write_text('{"seq": 3}')
+    assert espacios.leer_cabecera(str(ruta)) is None
@@ -0,0 +1,78 @@
+# tests/test_intercambio.py
+"""Importación: el lote entero se valida y queda en el diario como un solo registro."""
+import json
+
+import pytest
+
+import intercambio
+import logic
+import persistencia_sqlite
+
+pytestmark = pytest.mark.peticion("user-018")
+
+MATERIAS = [{"nombre": "Física", "meta": "4"}, {"nombre": "Química", "meta": "3", "horas_acumuladas": "1"}]
+
+
+@pytest.fixture
+def diario(tmp_path, monkeypatch):
+    d = logic.Diario(str(tmp_path / "progress.json"), str(tmp_path / "progress.journal"))
+    d.sembrar([logic.Materia("Álgebra", 6, 0, "m1")])
+    monkeypatch.setattr(logic, "diario_global", d)
+    return d
+
+
+def nombres():
+    return sorted(m.nombre for m in logic.cargar_datos_globales()["materias"])
+
+
+def test_importar_anota_un_solo_registro(diario):
+    assert intercambio.importar("materias", MATERIAS) == (True, 2)
+    with open(diario.ruta_diario) as f:
+        registros = [json.loads(linea) for linea in f]
+    assert [r["op"] for r in registros] == ["lote"] and len(registros[0]["ops"]) == 2
+    assert nombres() == ["Física", "Química", "Álgebra"]
+
+
+def test_registro_rasgado_no_deja_media_importacion(diario):
+    intercambio.importar("materias", MATERIAS)
+    with open(diario.ruta_diario, "rb+") as f:  # corte a mitad de escribir el lote
+        f.truncate(len(f.read()) // 2)
+    assert nombres() == ["Álgebra"]
+
+
+@pytest.mark.parametrize("filas", [MATERIAS + [{"nombre": "Física", "meta": "2"}],
+                                   MATERIAS + [{"nombre": "Biología", "meta": "nan"}]])
+def test_una_fila_mala_no_aplica_nada(diario, filas):
+    ok, errores = intercambio.importar("materias", filas)
+    assert not ok and errores[0].startswith("fila 3:")
+    assert nombres() == ["Álgebra"]
+
+
+def test_otra_instancia_recibe_las_ops_del_lote(diario, tmp_path):
+    otra = logic.Diario(diario.ruta_snapshot, diario.ruta_diario)
+    otra.cargar()
+    intercambio.importar("todos", [{"text": "leer"}, {"text": "repasar", "done": "x"}])
+    assert [o["op"] for o in otra.sincronizar()] == ["tarea_crear", "tarea_crear"]
+
+
+def test_lote_en_sqlite(tmp_path, monkeypatch):
+    abrir = lambda: persistencia_sqlite.DiarioSQLite(str(tmp_path / "p.sqlite3"), str(tmp_path / "progress.json"))
+    a, b = abrir(), abrir()
+    a.cargar(), b.cargar()
+    monkeypatch.setattr(logic, "diario_global", a)
+    assert intercambio.importar("materias", MATERIAS) == (True, 2)
+    assert [o["op"] for o in b.sincronizar()] == ["materia_crear", "materia_crear"]
+    assert {"Física", "Química"} <= {m.nombre for m in b.cargar()[0]}
+
+
+def test_lote_de_la_app_tambien_es_un_registro(diario):
+    # Importar con la app abierta: el almacén avisa del lote y el Persistidor lo anota
+    persistidor = logic.Persistidor(diario, demora=0)
+    datos = logic.cargar_datos_globales()
+    almacen = logic.Almacen(datos["materias"], datos["todos"], historial=datos["historial"])
+    almacen.suscribir(persistidor.encolar)
+    intercambio.importar("materias", MATERIAS, almacen)
+    persistidor.detener()
+    with open(diario.ruta_diario) as f:
+        assert [json.loads(linea)["op"] for linea in f] == ["lote"]
+    assert nombres() == ["Física", "Química", "Álgebra"]
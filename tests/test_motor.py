@@ -0,0 +1,92 @@
+# tests/test_motor.py
+"""Ciclo ultradiano con un reloj falso: sin esperas reales."""
+import pytest
+
+import logic
+
+pytestmark = pytest.mark.peticion("user-005")
+
+
+class RelojFalso:
+    def __init__(self):
+        self.t = 1000.0
+
+    def __call__(self):
+        return self.t
+
+    def avanzar(self, segundos):
+        self.t += segundos
+
+
+def nuevo_motor():
+    reloj = RelojFalso()
+    return logic.GestorUltradiano(reloj), reloj
+
+
+def test_ciclo_de_trabajo_termina_una_sola_vez():
+    motor, reloj = nuevo_motor()
+    motor.iniciar_trabajo(90, "m1")
+    assert motor.state == "WORK" and motor.activo
+    assert motor.formatear_tiempo() == "90:00"
+    reloj.avanzar(90 * 60 - 1)
+    assert not motor.tick()
+    assert motor.current_seconds == 1
+    reloj.avanzar(1)
+    assert motor.tick()
+    assert not motor.tick()  # el fin se avisa una vez
+    assert motor.restante() == 0 and not motor.activo
+    assert motor.elapsed_work == 90 * 60
+
+
+def test_descanso_proporcional_al_trabajo_real():
+    motor, reloj = nuevo_motor()
+    motor.iniciar_trabajo(90)
+    reloj.avanzar(30 * 60)
+    motor.pausar()
+    reloj.avanzar(60 * 60)  # la pausa no cuenta como trabajo
+    motor.reanudar()
+    reloj.avanzar(30 * 60)
+    motor.iniciar_descanso()
+    assert motor.state == "BREAK"
+    assert motor.target_seconds == 60 * 60 // 6  # 1:6 sobre los 60 min trabajados
+    reloj.avanzar(10 * 60)
+    assert motor.tick()
+
+
+def test_descanso_minimo():
+    assert logic.GestorUltradiano.descanso_para(60) == 120
+    assert logic.GestorUltradiano.descanso_para(90 * 60) == 15 * 60
+
+
+def test_pausa_congela_el_restante():
+    motor, reloj = nuevo_motor()
+    motor.iniciar_trabajo(50)
+    reloj.avanzar(10 * 60)
+    motor.alternar_pausa()
+    reloj.avanzar(3600)
+    assert motor.restante() == 40 * 60
+    motor.alternar_pausa()
+    reloj.avanzar(60)
+    assert motor.restante() == 39 * 60
+
+
+def test_exportar_y_adoptar_en_otro_reloj():
+    motor, reloj = nuevo_motor()
+    motor.iniciar_trabajo(90, "m1")
+    reloj.avanzar(600)
+    espejo, otro = nuevo_motor()
+    otro.avanzar(12345)  # relojes monotónicos distintos
+    espejo.adoptar(motor.exportar())
+    assert espejo.state == "WORK" and espejo.materia_id == "m1"
+    assert espejo.restante() == motor.restante()
+    otro.avanzar(60)
+    assert espejo.restante() == 80 * 60 - 60
+
+
+def test_detener_vuelve_a_idle():
+    motor, reloj = nuevo_motor()
+    motor.ejecutar("iniciar", minutos=45)
+    reloj.avanzar(100)
+    motor.ejecutar("detener")
+    assert motor.state == "IDLE" and not motor.activo
+    assert motor.target_seconds == 90 * 60 and motor.elapsed_work == 0
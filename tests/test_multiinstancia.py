@@ -0,0 +1,80 @@
+# tests/test_multiinstancia.py
+"""Dos instancias sobre los mismos datos: los deltas se fusionan por operación."""
+import os
+
+import pytest
+
+import logic
+import persistencia_sqlite
+
+pytestmark = pytest.mark.peticion("user-016")
+
+
+def _json(d):
+    return logic.Diario(os.path.join(d, "progress.json"), os.path.join(d, "progress.journal"))
+
+
+def _sqlite(d):
+    return persistencia_sqlite.DiarioSQLite(os.path.join(d, "progress.sqlite3"), os.path.join(d, "progress.json"))
+
+
+@pytest.fixture(params=[_json, _sqlite], ids=["json", "sqlite"])
+def abrir(request, tmp_path):
+    d = str(tmp_path)
+    semilla = _json(d)
+    semilla.sembrar([logic.Materia("Álgebra", 6, 0, "m1")])
+    return lambda: request.param(d)
+
+
+class Instancia:
+    def __init__(self, diario):
+        self.diario = diario
+        materias, todos, historial, _ = diario.cargar()
+        self.almacen = logic.Almacen(materias, todos, motor=logic.GestorUltradiano(), historial=historial)
+        self.almacen.suscribir(self._persistir)
+
+    def _persistir(self, op):
+        # Como la app: solo lo propio que cambió algo llega al diario
+        if op["op"] != "recarga" and "origen" not in op:
+            self.diario.anotar(op)
+
+    @property
+    def materia(self):
+        return self.almacen.materias["m1"]
+
+    def hacer(self, op):
+        self.almacen.aplicar(op)
+
+    def sincronizar(self):
+        ajenas = self.diario.sincronizar()
+        if ajenas:
+            self.almacen.aplicar(logic.op_lote(ajenas, origen="diario"))
+
+
+def test_restas_simultaneas_no_pierden_horas(abrir):
+    a = Instancia(abrir())
+    a.hacer(logic.op_horas(a.materia, 1.0))
+    b = Instancia(abrir())
+    assert b.materia.horas_acumuladas == 1.0
+    # Las dos restan la misma hora sin haber visto la de la otra
+    a.hacer(logic.op_horas(a.materia, -1.0))
+    b.hacer(logic.op_horas(b.materia, -1.0))
+    a.sincronizar()
+    b.sincronizar()
+    for i in (a, b):
+        assert i.materia.horas_acumuladas == 0.0
+        assert i.almacen.historial.semana("m1")[0] == 0.0
+    a.hacer(logic.op_horas(a.materia, 1.0))
+    b.sincronizar()
+    assert b.materia.horas_acumuladas == 1.0
+    assert Instancia(abrir()).materia.horas_acumuladas == 1.0
+
+
+def test_sumas_simultaneas_se_acumulan(abrir):
+    a, b = Instancia(abrir()), Instancia(abrir())
+    a.hacer(logic.op_horas(a.materia, 1.5))
+    b.hacer(logic.op_horas(b.materia, 2.0))
+    a.sincronizar()
+    b.sincronizar()
+    assert a.materia.horas_acumuladas == b.materia.horas_acumuladas == 3.5
+    assert Instancia(abrir()).materia.horas_acumuladas == 3.5
@@ -0,0 +1,68 @@
+# tests/test_planificador.py
+"""Plan semanal: un ciclo WORK terminado descuenta sus minutos de lo que falta."""
+import datetime
+
+import pytest
+
+import logic
+import planificador
+
+pytestmark = pytest.mark.peticion("user-022")
+
+HORARIO = {d: [(datetime.time(9), datetime.time(13)), (datetime.time(16), datetime.time(20))] for d in range(7)}
+
+
+class Reloj:
+    def __init__(self):
+        self.ahora = datetime.datetime(2026, 10, 12, 8, 0)  # lunes
+
+    def __call__(self):
+        return self.ahora
+
+
+def planificado(plan, mid):
+    return sum(c.minutos for _, ciclos in plan.dias() for c in ciclos if c.materia_id == mid)
+
+
+def nuevo_plan(meta):
+    almacen = logic.Almacen([logic.Materia("Álgebra", meta, 0, "m1")], motor=logic.GestorUltradiano())
+    reloj = Reloj()
+    return almacen, planificador.Plan(almacen, horario=HORARIO, reloj=reloj), reloj
+
+
+def test_reparte_lo_que_falta_en_ciclos():
+    _, plan, _ = nuevo_plan(3)
+    assert planificado(plan, "m1") == 180
+    assert all(logic.GestorUltradiano.WORK_MIN <= c.minutos <= logic.GestorUltradiano.WORK_MAX
+               for _, ciclos in plan.dias() for c in ciclos)
+    assert plan.proximo().inicio == datetime.datetime(2026, 10, 12, 9, 0)
+
+
+def test_ciclo_terminado_cuenta_como_horas():
+    almacen, plan, reloj = nuevo_plan(3)
+    ciclo = plan.proximo()
+    reloj.ahora = ciclo.fin
+    almacen.aplicar(logic.op_ciclo_completo(almacen.materias["m1"], ciclo.minutos))
+    assert almacen.materias["m1"].horas_acumuladas == 1.5
+    assert planificado(plan, "m1") == 90
+    # Con el segundo la meta está cumplida y el plan queda vacío
+    ciclo = plan.proximo()
+    reloj.ahora = ciclo.fin
+    almacen.aplicar(logic.op_ciclo_completo(almacen.materias["m1"], ciclo.minutos))
+    assert plan.proximo() is None and plan.sin_hueco() == []
+
+
+def test_ciclo_sin_materia_no_suma_horas():
+    almacen, plan, _ = nuevo_plan(3)
+    op = logic.op_ciclo_completo(None, 90)
+    almacen.aplicar(op)
+    assert [o["op"] for o in op["ops"]] == ["ciclo"]
+    assert almacen.materias["m1"].horas_acumuladas == 0
+    assert planificado(plan, "m1") == 180
+
+
+def test_sesion_registrada_libera_ciclos():
+    almacen, plan, _ = nuevo_plan(6)
+    antes = planificado(plan, "m1")
+    almacen.aplicar(logic.op_horas(almacen.materias["m1"], 2.0))
+    assert planificado(plan, "m1") == antes - 120
@@ -0,0 +1,91 @@
+# tests/test_semana.py
+"""Contador semanal desde los agregados del historial: fronteras y semana ISO nueva."""
+import datetime
+
+import pytest
+
+import deshacer
+import logic
+
+pytestmark = pytest.mark.peticion("user-012")
+
+LUNES = datetime.datetime(2026, 10, 12, 10, 0).timestamp()
+SEMANA = "2026-W42"
+
+
+@pytest.fixture
+def reloj(monkeypatch):
+    ahora = [LUNES]
+    monkeypatch.setattr(logic.time, "time", lambda: ahora[0])
+    return ahora
+
+
+def nuevo_almacen(horas=0.0, historial=None):
+    return logic.Almacen([logic.Materia("Álgebra", 6, horas, "m1")], motor=logic.GestorUltradiano(),
+                         historial=historial)
+
+
+def horas(almacen):
+    return almacen.materias["m1"].horas_acumuladas
+
+
+def test_ciclo_completo_entra_en_los_agregados(reloj):
+    almacen = nuevo_almacen()
+    almacen.aplicar(logic.op_ciclo_completo(almacen.materias["m1"], 90))
+    assert almacen.historial.dia("m1", "2026-10-12") == (1.5, 1)
+    assert almacen.historial.semana("m1", SEMANA) == (1.5, 1)
+    assert horas(almacen) == 1.5
+
+
+def test_nueva_semana_manual_es_una_frontera(reloj):
+    almacen = nuevo_almacen()
+    pila = deshacer.Deshacer(almacen)
+    almacen.aplicar(logic.op_horas(almacen.materias["m1"], 3.0))
+    reloj[0] += 3600
+    almacen.aplicar(logic.op_reiniciar_semana(almacen.materias.values()))
+    assert horas(almacen) == 0.0
+    assert almacen.historial.semana("m1", SEMANA)[0] == 3.0  # el historial no se borra
+    reloj[0] += 3600
+    almacen.aplicar(logic.op_horas(almacen.materias["m1"], 1.0))
+    assert horas(almacen) == 1.0
+    pila.deshacer()
+    pila.deshacer()  # restaura la semana
+    assert horas(almacen) == 3.0
+
+
+def test_sesion_anterior_a_la_frontera_solo_va_al_historial(reloj):
+    almacen = nuevo_almacen()
+    almacen.aplicar(logic.op_reiniciar_semana(almacen.materias.values()))
+    almacen.aplicar({"op": "horas", "id": "m1", "delta": 2.0, "ts": LUNES - 3600})
+    assert horas(almacen) == 0.0
+    assert almacen.historial.semana("m1", SEMANA)[0] == 2.0
+
+
+def test_semana_iso_nueva_empieza_de_cero(reloj):
+    almacen = nuevo_almacen(horas=1.0)  # datos viejos: horas sin sesión, de esta semana
+    almacen.aplicar(logic.op_horas(almacen.materias["m1"], 2.0))
+    assert horas(almacen) == 3.0
+    avisos = []
+    almacen.suscribir(lambda op: avisos.append(op["op"]))
+    reloj[0] += 7 * 86400
+    assert almacen.al_dia()
+    assert avisos == ["recarga"] and horas(almacen) == 0.0
+    assert almacen.estadisticas()["total_horas"] == 0.0
+    assert almacen.historial.semana("m1", SEMANA)[0] == 2.0  # la semana pasada sigue consultable
+    almacen.aplicar(logic.op_horas(almacen.materias["m1"], 0.5))
+    assert horas(almacen) == 0.5
+
+
+def test_contadores_guardados_de_otra_semana(reloj, tmp_path):
+    diario = logic.Diario(str(tmp_path / "progress.json"), str(tmp_path / "progress.journal"))
+    diario.sembrar([logic.Materia("Álgebra", 6, 0, "m1")])
+    almacen = nuevo_almacen()
+    op = logic.op_horas(almacen.materias["m1"], 2.0)
+    almacen.aplicar(op)
+    diario.anotar(op)
+    diario.compactar()
+    materias, _, historial, _ = diario.cargar()
+    assert materias[0].horas_acumuladas == 2.0 and historial.semana_contadores == SEMANA
+    reloj[0] += 7 * 86400
+    materias, todos, historial, _ = logic.Diario(diario.ruta_snapshot, diario.ruta_diario).cargar()
+    assert horas(logic.Almacen(materias, todos, motor=logic.GestorUltradiano(), historial=historial)) == 0.0
@@ -0,0 +1,75 @@
+# tests/test_sqlite.py
+"""Backend SQLite: propagación por la tabla `ops` y su recorte."""
+import os
+import sqlite3
+
+import pytest
+
+import logic
+import persistencia_sqlite
+
+pytestmark = pytest.mark.peticion("user-016")
+
+
+@pytest.fixture
+def abrir(tmp_path):
+    ruta_db, ruta_json = str(tmp_path / "progress.sqlite3"), str(tmp_path / "progress.json")
+    return lambda: persistencia_sqlite.DiarioSQLite(ruta_db, ruta_json)
+
+
+def filas_ops(diario):
+    conn = sqlite3.connect(diario.ruta_db)
+    try:
+        return conn.execute("SELECT COUNT(*) FROM ops").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def test_otra_instancia_recibe_las_ops(abrir):
+    a, b = abrir(), abrir()
+    a.cargar()
+    b.cargar()
+    assert b.sincronizar() == []
+    ops = [logic.op_crear_tarea("leer"), logic.op_crear_tarea("repasar")]
+    a.anotar_lote(ops)
+    ajenas = b.sincronizar()
+    assert [o["tarea"]["text"] for o in ajenas] == ["leer", "repasar"]
+    assert b.sincronizar() == [] and a.sincronizar() == []  # las propias no vuelven
+
+
+def test_vigila_el_wal(abrir):
+    diario = abrir()
+    diario.cargar()
+    assert diario.rutas_vigiladas() == [diario.ruta_db + "-wal", diario.ruta_db]
+
+
+def test_snapshot_ajeno_obliga_a_recargar(abrir):
+    a, b = abrir(), abrir()
+    materias, todos, historial, _ = a.cargar()
+    b.cargar()
+    a.guardar_snapshot(materias, todos, historial)
+    assert b.sincronizar() is None
+    assert b.sincronizar() == []
+
+
+def test_anotar_recorta_la_tabla(abrir):
+    diario = abrir()
+    diario.cargar()
+    for i in range(1500):
+        diario.anotar(logic.op_crear_tarea(str(i)))
+    assert filas_ops(diario) <= persistencia_sqlite.RETENER_OPS + logic.COMPACTAR_CADA
+    diario.cerrar()
+    assert filas_ops(diario) == persistencia_sqlite.RETENER_OPS
+    wal = diario.ruta_db + "-wal"
+    assert not os.path.exists(wal) or os.path.getsize(wal) == 0
+
+
+def test_instancia_rezagada_recarga(abrir):
+    a, b = abrir(), abrir()
+    a.cargar()
+    b.cargar()
+    for i in range(persistencia_sqlite.RETENER_OPS + logic.COMPACTAR_CADA + 1):
+        a.anotar(logic.op_crear_tarea(str(i)))
+    assert b.sincronizar() is None
+    _, todos, _, _ = b.cargar()
+    assert len(todos) == persistencia_sqlite.RETENER_OPS + logic.COMPACTAR_CADA + 1
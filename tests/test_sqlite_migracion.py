@@ -0,0 +1,55 @@
+# tests/test_sqlite_migracion.py
+"""Backend SQLite: migración única desde progress.json (lista antigua o diccionario + diario)."""
+import json
+
+import pytest
+
+import logic
+import persistencia_sqlite
+
+pytestmark = pytest.mark.peticion("user-011")
+
+
+@pytest.fixture
+def rutas(tmp_path):
+    return str(tmp_path / "progress.sqlite3"), str(tmp_path / "progress.json"), str(tmp_path / "progress.journal")
+
+
+def test_formato_lista_antiguo(rutas):
+    ruta_db, ruta_json, _ = rutas
+    with open(ruta_json, "w") as f:
+        json.dump([{"nombre": "Álgebra", "meta": 6, "horas_acumuladas": 2.5}, {"nombre": "Física", "meta": 4}], f)
+    materias, todos, _, _ = persistencia_sqlite.DiarioSQLite(ruta_db, ruta_json).cargar()
+    assert [(m.nombre, m.meta_semanal, m.horas_acumuladas) for m in materias] == [("Álgebra", 6, 2.5), ("Física", 4, 0)]
+    assert todos == []
+    # Los ids generados al migrar quedan en la base: la próxima carga ve los mismos
+    assert [m.id for m in persistencia_sqlite.DiarioSQLite(ruta_db, ruta_json).cargar()[0]] == [m.id for m in materias]
+
+
+def test_diccionario_con_la_cola_del_diario(rutas):
+    ruta_db, ruta_json, ruta_diario = rutas
+    diario = logic.Diario(ruta_json, ruta_diario)
+    diario.sembrar([logic.Materia("Álgebra", 6, 0, "m1")])
+    diario.cargar()
+    horas = logic.op_horas(logic.Materia("Álgebra", 6, 0, "m1"), 1.5)
+    primera, segunda = logic.op_crear_tarea("leer"), logic.op_crear_tarea("repasar")
+    diario.anotar_lote([horas, primera, segunda, logic.op_marcar_tarea(segunda["tarea"]["id"], True)])
+
+    sqlite = persistencia_sqlite.DiarioSQLite(ruta_db, ruta_json)
+    materias, todos, historial, _ = sqlite.cargar()
+    assert materias[0].horas_acumuladas == 1.5
+    assert [(t["text"], t["done"]) for t in todos] == [("leer", False), ("repasar", True)]
+    assert historial.semana("m1", logic.semana_de(horas["ts"]))[0] == 1.5
+    assert sqlite.sesiones("m1") == []  # el diario JSON no guarda sesiones sueltas: solo agregados
+
+
+def test_migra_una_sola_vez(rutas):
+    ruta_db, ruta_json, ruta_diario = rutas
+    logic.Diario(ruta_json, ruta_diario).sembrar([logic.Materia("Álgebra", 6, 0, "m1")])
+    persistencia_sqlite.DiarioSQLite(ruta_db, ruta_json).cargar()
+    # Lo que cambie después en el JSON ya no es la fuente de verdad
+    logic.Diario(ruta_json, ruta_diario).guardar_snapshot([logic.Materia("Otra", 1, 0, "x")], [])
+    sqlite = persistencia_sqlite.DiarioSQLite(ruta_db, ruta_json)
+    assert [m.nombre for m in sqlite.cargar()[0]] == ["Álgebra"]
+    sqlite.anotar(logic.op_horas(logic.Materia("Álgebra", 6, 0, "m1"), 2))
+    assert [h for _, h in sqlite.sesiones("m1")] == [2]
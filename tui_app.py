@@ -1,33 +1,53 @@
+import functools
+import os
+import sys
+import time
+import perfil  # antes que textual: su INICIO es la referencia de los hitos de arranque
+from rich.segment import Segment
+from rich.text import Text
+from textual import events
 from textual.app import App, ComposeResult
+from textual.binding import Binding
+from textual.cache import LRUCache
+from textual.geometry import Region, Size
+from textual.scroll_view import ScrollView
+from textual.strip import Strip
 from textual.containers import Horizontal, VerticalScroll, Container, Grid
-from textual.widgets import Header, Footer, Button, Label, Static, TabbedContent, TabPane, Input, ListView, ListItem, Checkbox, Tree 
+# TabbedContent (y sus Tabs/ContentSwitcher) solo se importa si se abre la vista de pestañas
+from textual.widgets import Footer, Button, Label, Static, Input, ListView, ListItem
 from textual.reactive import reactive
 from textual.message import Message
 from textual.screen import Screen
+perfil.hito("importar textual")
 import logic
+# analitica y planificador se importan al abrir su pantalla: no pesan en el arranque
+import arranque
+import busqueda
+import deshacer
+import espacios
 
 # --- COMPONENTES VISUALES ---
 MY_ASCII_ART = r"""
 
-             .........
-            .'------.' |       Plug and Play
-           | .-----. | |
-           | |     | | |
-         __| |     | | |;. _______________
-        /  |*`-----'.|.' `;              //
-       /   `---------' .;'              //
- /|   /  .''''////////;'               //
-|=|  .../ ######### /;/               //|
-|/  /  / ######### //                //||
-   /   `-----------'                // ||
-  /________________________________//| ||
-  `--------------------------------' | ||
-   : | ||      | || |__LL__|| ||     | ||
-   : | ||      | ||         | ||     `""'
-   n | ||      `""'         | ||
-   M | ||                   | ||
-     | ||                   | ||
-     `""'                   `""'
+             .........
+            .'------.' |       Plug and Play
+           | .-----. | |
+           | |     | | |
+         __| |     | | |;. _______________
+        /  |*`-----'.|.' `;              //
+       /   `---------' .;'              //
+ /|   /  .''''////////;'               //
+|=|  .../ ######### /;/               //|
+|/  /  / ######### //                //||
+   /   `-----------'                // ||
+  /________________________________//| ||
+  `--------------------------------' | ||
+   : | ||      | || |__LL__|| ||     | ||
+   : | ||      | ||         | ||     `""'
+   n | ||      `""'         | ||
+   M | ||                   | ||
+     | ||                   | ||
+     `""'                   `""'
 """
 SIDEBAR_ART = r"""
    .   .
@@ -41,33 +61,43 @@ SIDEBAR_ART = r"""
  \_______/ 
    ROSH
 """
+@functools.lru_cache(maxsize=1024)
+def _barra(total, octavos):
+    """Cadena de la barra para `total` celdas y un progreso cuantizado a
+    octavos de celda (la resolución que dan los glifos). Memoizada con
+    expulsión LRU acotada: con decenas de barras casi todo es acierto."""
+    filled, idx = divmod(octavos, len(BtopBar.BARS) - 1)
+    if filled >= total: return "⣿" * total
+    return "⣿" * filled + BtopBar.BARS[idx] + " " * (total - filled - 1)
+
 class BtopBar(Static):
     """Barra de progreso reactiva."""
     progress = reactive(0.0)
     BARS = ["⠀", "⡀", "⣀", "⣄", "⣤", "⣦", "⣶", "⣷", "⣿"]
+    _banda = None
+
     def watch_progress(self, val):
-        self.remove_class("p-low", "p-med", "p-high")
-        if val < 50: self.add_class("p-low")
-        elif val < 80: self.add_class("p-med")
-        else: self.add_class("p-high")
+        # Cambiar clases fuerza un restyle: solo si cambia la banda de color
+        banda = "p-low" if val < 50 else "p-med" if val < 80 else "p-high"
+        if banda != self._banda:
+            if self._banda: self.remove_class(self._banda)
+            self.add_class(banda)
+            self._banda = banda
 
+    @perfil.medido("BtopBar.render")
     def render(self):
         width = self.content_size.width or 20
         if width <= 0: return ""
         p = min(max(self.progress / 100.0, 0), 1)
-        total = width
-        filled = int(total * p)
-        remainder = (total * p) - filled
-        bar = "⣿" * filled
-        if filled < total:
-            idx = int(remainder * (len(self.BARS) - 1))
-            bar += self.BARS[idx]
-        return bar.ljust(total, " ")
+        return _barra(width, int(width * p * (len(self.BARS) - 1)))
 
 class Sidebar(Static):
     """Panel lateral de estadísticas."""
     def compose(self) -> ComposeResult:
         yield Label("::::::: DASHBOARD :::::::", classes="sidebar-title")
+        yield Label("Espacio:", classes="stat-label")
+        self.lbl_espacio = Label(self.app.espacio or "-", classes="stat-value")
+        yield self.lbl_espacio
         yield Label("Meta Semanal:", classes="stat-label")
         self.lbl_meta = Label("0.0", classes="stat-value")
         yield self.lbl_meta       
@@ -85,78 +115,239 @@ class Sidebar(Static):
         yield Button("Cambiar Vista ⧉", id="btn_view_toggle", variant="primary")
         yield Button("Reiniciar Semana", id="btn_reset", variant="error")
 
+    def on_mount(self):
+        self.app.almacen.suscribir(self._al_cambiar)
+        self.actualizar(self.app.almacen.estadisticas())
+
+    def on_unmount(self):
+        self.app.almacen.desuscribir(self._al_cambiar)
+
+    def _al_cambiar(self, op):
+        # Totales O(1): el almacén los mantiene como sumas corrientes
+        self.actualizar(self.app.almacen.estadisticas())
+        if op["op"] == "recarga":
+            self.lbl_espacio.update(self.app.espacio or "-")
+
     def actualizar(self, stats):
-        self.lbl_total.update(f"{stats['total_horas']:.1f} h")
-        self.lbl_meta.update(f"{stats['total_meta']:.1f} h")
+        # Una línea de ancho fijo (.stat-value): repintar sin recalcular el layout
+        self.lbl_total.update(f"{stats['total_horas']:.1f} h", layout=False)
+        self.lbl_meta.update(f"{stats['total_meta']:.1f} h", layout=False)
         self.bar_global.progress = stats['progreso_general']
 
 
-class MateriaWidget(Static):
-    horas = reactive(0.0)
+class ListaMaterias(ScrollView, can_focus=True):
+    """
+    Lista virtualizada de materias (Line API): solo se pintan las filas que
+    caen en el viewport y cada fila ya renderizada se recicla desde una caché
+    LRU al hacer scroll. Layout de cada fila:
+        Nombre | Barra | [-] | Stats | [+] | [✖]
+    Los botones se resuelven por columna (ratón) o con teclas sobre el cursor.
+    """
+    ALTO_FILA = 2  # línea de contenido + separador
+
+    BINDINGS = [
+        Binding("up", "cursor(-1)", "Arriba", show=False),
+        Binding("down", "cursor(1)", "Abajo", show=False),
+        Binding("pageup", "cursor(-10)", show=False),
+        Binding("pagedown", "cursor(10)", show=False),
+        Binding("plus", "sumar", "+1h"),
+        Binding("minus", "restar", "-1h"),
+        Binding("delete", "eliminar", "Eliminar"),
+        Binding("r", "renombrar", "Renombrar"),
+    ]
+
+    COMPONENT_CLASSES = {
+        "lista-materias--nombre",
+        "lista-materias--stats",
+        "lista-materias--menos",
+        "lista-materias--mas",
+        "lista-materias--borrar",
+        "lista-materias--separador",
+        "lista-materias--cursor",
+        "lista-materias--p-low",
+        "lista-materias--p-med",
+        "lista-materias--p-high",
+    }
+
+    cursor = reactive(0)
 
     class EliminarSolicitud(Message):
-        """Mensaje para pedir al padre que me borre."""
+        """Mensaje para pedir al padre que borre una materia."""
         def __init__(self, materia_obj):
             self.materia_obj = materia_obj
             super().__init__()
 
-    class Cambio(Message): pass
+    class RenombrarSolicitud(Message):
+        """Mensaje para pedir al padre el nombre nuevo de una materia."""
+        def __init__(self, materia_obj):
+            self.materia_obj = materia_obj
+            super().__init__()
 
-    def __init__(self, materia_obj):
-        super().__init__()
-        self.materia = materia_obj
-        self.horas = materia_obj.horas_acumuladas
+    class Cambio(Message):
+        """Cambio de horas; lleva la operación a anotar en el diario."""
+        def __init__(self, op):
+            self.op = op
+            super().__init__()
 
-    def compose(self) -> ComposeResult:
-        # Layout: Nombre | Bar | - | Stats | + | Trash
-        yield Label(f"{self.materia.nombre[:15]:<15}", classes="nombre-materia")
-        
-        self.progress_bar = BtopBar(classes="barra-materia")
-        self.progress_bar.progress = self.materia.obtener_progreso()
-        yield self.progress_bar
-        
-        # Botón Restar
-        yield Button("-", id="btn_sub", classes="btn-minus")
-        
-        self.lbl_stats = Label(f"{self.horas:.1f}/{self.materia.meta_semanal}h", classes="stats-materia")
-        yield self.lbl_stats
-        
-        # Botón Sumar
-        yield Button("+", id="btn_add", classes="btn-small")
-        
-        # Botón Eliminar
-        yield Button("X", id="btn_del", classes="btn-trash")
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._ids = []       # ids en orden de visualización
+        self._indice = {}    # id -> posición en _ids
+        self._cache = LRUCache(maxsize=256)
+
+    # --- Datos ---
+    def recargar_materias(self, materias):
+        self._ids = [m.id for m in materias]
+        self._reindexar()
 
-    def watch_horas(self, val):
-        self.materia.horas_acumuladas = val
-        if hasattr(self, 'progress_bar'):
-            self.progress_bar.progress = self.materia.obtener_progreso()
-            self.lbl_stats.update(f"{val:.1f}/{self.materia.meta_semanal}h")
+    def _reindexar(self):
+        self._indice = {mid: i for i, mid in enumerate(self._ids)}
+        self.virtual_size = Size(0, len(self._ids) * self.ALTO_FILA)
+        self.cursor = min(self.cursor, max(len(self._ids) - 1, 0))
+        self.refresh()
 
-    def on_button_pressed(self, event: Button.Pressed) -> None:
-        if event.button.id == "btn_add":
-            self.materia.registrar_sesion(1.0) 
-            self.post_message(self.Cambio())
-        elif event.button.id == "btn_sub":
-            self.materia.restar_sesion(1.0) 
-            self.horas = self.materia.horas_acumuladas
-            self.post_message(self.Cambio())
-        elif event.button.id == "btn_del":
-            # Enviar mensaje al padre (TrackerPanel) para gestionar borrado
-            self.post_message(self.EliminarSolicitud(self.materia))
+    def agregar(self, mid):
+        self._indice[mid] = len(self._ids)
+        self._ids.append(mid)
+        self.virtual_size = Size(0, len(self._ids) * self.ALTO_FILA)
+        self.refrescar_fila(mid)
+
+    def quitar(self, mid):
+        if mid in self._indice:
+            del self._ids[self._indice[mid]]
+            self._reindexar()
+
+    def refrescar_fila(self, mid):
+        """Repinta solo la fila de esa materia (si está en el viewport)."""
+        fila = self._indice.get(mid)
+        if fila is not None:
+            self.refresh_lines(fila * self.ALTO_FILA, self.ALTO_FILA)
+
+    @property
+    def materia_actual(self):
+        if not self._ids: return None
+        return self.app.almacen.materias.get(self._ids[self.cursor])
+
+    # --- Render ---
+    def notify_style_update(self):
+        super().notify_style_update()
+        self._cache.clear()
+
+    def _columnas(self, ancho):
+        """(nombre, x inicial, ancho) de cada columna para este ancho."""
+        fijas = [("nombre", 16), ("barra", 0), ("hueco", 1), ("menos", 3), ("stats", 15),
+                 ("mas", 3), ("hueco", 1), ("borrar", 3)]
+        barra = max(ancho - sum(w for _, w in fijas), 0)
+        x, columnas = 0, []
+        for nombre, w in fijas:
+            w = barra if nombre == "barra" else w
+            columnas.append((nombre, x, w))
+            x += w
+        return columnas
+
+    @perfil.medido("ListaMaterias.render_line")
+    def render_line(self, y):
+        ancho = self.size.width
+        fila, sub = divmod(y + self.scroll_offset.y, self.ALTO_FILA)
+        if fila >= len(self._ids):
+            return Strip.blank(ancho, self.rich_style)
+        if sub:
+            estilo = self.get_component_rich_style("lista-materias--separador")
+            return Strip([Segment("─" * ancho, estilo)], ancho)
+
+        m = self.app.almacen.materias[self._ids[fila]]
+        enfocada = fila == self.cursor and self.has_focus
+        clave = (m.id, m.nombre, m.horas_acumuladas, m.meta_semanal, ancho, enfocada)
+        strip = self._cache.get(clave)
+        if strip is None:
+            strip = self._cache[clave] = self._render_fila(m, ancho, enfocada)
+        return strip
+
+    def _render_fila(self, m, ancho, enfocada):
+        progreso = m.obtener_progreso()
+        banda = "p-low" if progreso < 50 else "p-med" if progreso < 80 else "p-high"
+        textos = {
+            "nombre": f"{m.nombre[:15]:<15} ",
+            "menos": " - ",
+            "stats": f"{m.horas_acumuladas:.1f}/{m.meta_semanal}h".center(15),
+            "mas": " + ",
+            "borrar": " ✖ ",
+        }
+        base = self.rich_style
+        if enfocada:
+            base += self.get_component_rich_style("lista-materias--cursor")
+        segmentos = []
+        for nombre, _, w in self._columnas(ancho):
+            if nombre == "barra":
+                p = min(max(progreso / 100.0, 0), 1)
+                texto = _barra(w, int(w * p * (len(BtopBar.BARS) - 1))) if w else ""
+                estilo = base + self.get_component_rich_style(f"lista-materias--{banda}")
+            elif nombre == "hueco":
+                texto, estilo = " ", base
+            else:
+                texto = textos[nombre]
+                estilo = base + self.get_component_rich_style(f"lista-materias--{nombre}")
+            segmentos.append(Segment(texto, estilo))
+        return Strip(segmentos).adjust_cell_length(ancho, base)
+
+    # --- Interacción ---
+    def watch_cursor(self, previo, actual):
+        for fila in (previo, actual):
+            self.refresh_lines(fila * self.ALTO_FILA, 1)
+        self.scroll_to_region(Region(0, actual * self.ALTO_FILA, 1, self.ALTO_FILA), animate=False)
+
+    def on_focus(self): self.refresh()
+    def on_blur(self): self.refresh()
+
+    def action_cursor(self, paso):
+        if self._ids:
+            self.cursor = min(max(self.cursor + paso, 0), len(self._ids) - 1)
+
+    def action_sumar(self):
+        m = self.materia_actual
+        if m: self.post_message(self.Cambio(logic.op_horas(m, 1.0)))
+
+    def action_restar(self):
+        m = self.materia_actual
+        if m: self.post_message(self.Cambio(logic.op_horas(m, -1.0)))
+
+    def action_eliminar(self):
+        m = self.materia_actual
+        # Enviar mensaje al padre (TrackerPanel) para gestionar borrado
+        if m: self.post_message(self.EliminarSolicitud(m))
+
+    def action_renombrar(self):
+        m = self.materia_actual
+        if m: self.post_message(self.RenombrarSolicitud(m))
+
+    def on_click(self, event: events.Click):
+        offset = event.get_content_offset(self)
+        if offset is None: return
+        fila, sub = divmod(offset.y + self.scroll_offset.y, self.ALTO_FILA)
+        if fila >= len(self._ids) or sub: return
+        self.cursor = fila
+        for nombre, x, w in self._columnas(self.size.width):
+            if x <= offset.x < x + w:
+                accion = {"menos": self.action_restar, "mas": self.action_sumar,
+                          "borrar": self.action_eliminar}.get(nombre)
+                if accion: accion()
+                break
 
 class TrackerPanel(Static):
     """Panel para la lista de materias con creación dinámica."""
-    
+    BINDINGS = [Binding("slash", "enfocar_filtro", "Filtrar")]
+
+    filtro = reactive("", init=False)
+
     def compose(self) -> ComposeResult:
         yield Label(":: TRACKER ::", classes="sidebar-title")
-        
-        with VerticalScroll():   
-            yield Container(id="lista_container")
-            with Container(id="panel_crear_materia"):
-                yield Input(placeholder="Nueva Materia...", id="inp_nueva_materia")
-                yield Input(placeholder="Meta(h)", id="inp_nueva_meta", type="number")
-                yield Button("Añadir", id="btn_crear_materia")
+        yield Input(placeholder="Filtrar... (/)", id="inp_filtro_materias", classes="filtro")
+        self.lista = ListaMaterias(id="lista_materias")
+        yield self.lista
+        with Container(id="panel_crear_materia"):
+            yield Input(placeholder="Nueva Materia...", id="inp_nueva_materia")
+            yield Input(placeholder="Meta(h)", id="inp_nueva_meta", type="number")
+            yield Button("Añadir", id="btn_crear_materia")
        
     def on_button_pressed(self, event: Button.Pressed):
         if event.button.id == "btn_crear_materia":
@@ -164,7 +355,20 @@ class TrackerPanel(Static):
 
     def on_input_submitted(self, event: Input.Submitted):
         # Permitir crear dando Enter en los inputs
+        if event.input.id == "inp_filtro_materias":
+            self.lista.focus()
+            return
         self.crear_materia_ui()
+
+    def on_input_changed(self, event: Input.Changed):
+        if event.input.id == "inp_filtro_materias":
+            self.filtro = event.value
+
+    def action_enfocar_filtro(self):
+        self.query_one("#inp_filtro_materias", Input).focus()
+
+    def watch_filtro(self, filtro):
+        self.recargar_materias(self.app.almacen.lista_materias())
     def crear_materia_ui(self):
         nombre = self.query_one("#inp_nueva_materia", Input).value.strip()
         meta_str = self.query_one("#inp_nueva_meta", Input).value.strip()
@@ -173,11 +377,11 @@ class TrackerPanel(Static):
             try:
                 meta = float(meta_str)
             # 1. Llamada a la lógica persistente
-                exito, resultado = logic.crear_materia(nombre, meta)
+                exito, resultado = logic.crear_materia(nombre, meta, self.app.almacen)
             
                 if exito:
-                # 2. Sincronizar TODA la app (Tabs y Dashboard)
-                    self.app.cargar_datos_y_refrescar() 
+                # 2. Aplicar en memoria, persistir y sincronizar TODA la app (Tabs y Dashboard)
+                    self.app.guardar_todo(logic.op_crear_materia(resultado))
                 
                 # 3. Limpiar inputs y notificar
                     self.query_one("#inp_nueva_materia", Input).value = ""
@@ -189,139 +393,431 @@ class TrackerPanel(Static):
             except ValueError:
                 self.app.notify("La meta debe ser un número", severity="error")
 
-        # Manejar solicitud de borrado que viene de un hijo (MateriaWidget)
-    def on_materia_widget_eliminar_solicitud(self, message: MateriaWidget.EliminarSolicitud):
+        # Manejar solicitud de borrado que viene de la lista
+    def on_lista_materias_eliminar_solicitud(self, message: ListaMaterias.EliminarSolicitud):
         materia_a_borrar = message.materia_obj
         
         # Definir qué hacer si el usuario dice SI
         def check_borrado(confirmado: bool):
             if confirmado:
-                self.app.materias.remove(materia_a_borrar)
-                self.app.cargar_datos_y_refrescar() # Refresca todos los paneles
-                self.app.guardar_todo()
+                self.app.guardar_todo(logic.op_borrar_materia(materia_a_borrar))
                 self.app.notify(f"Eliminada: {materia_a_borrar.nombre}")
 
         # Mostrar pantalla de confirmación
         self.app.push_screen(ConfirmScreen(), check_borrado)
 
+    def on_lista_materias_renombrar_solicitud(self, message: ListaMaterias.RenombrarSolicitud):
+        materia = message.materia_obj
+
+        def renombrar(nombre):
+            nombre = (nombre or "").strip()
+            if not nombre or nombre == materia.nombre: return
+            otra = self.app.almacen.buscar(nombre)
+            if otra is not None and otra.id != materia.id:
+                self.app.notify("La materia ya existe.", severity="error")
+                return
+            self.app.guardar_todo(logic.op_renombrar_materia(materia, nombre))
+            self.app.notify(f"Renombrada: {nombre} (Ctrl+Z lo deshace)")
+
+        self.app.push_screen(RenombrarScreen(materia.nombre), renombrar)
+
+    def on_mount(self):
+        self.app.almacen.suscribir(self._al_cambiar)
+        self.recargar_materias(self.app.almacen.lista_materias())
+
+    def on_unmount(self):
+        self.app.almacen.desuscribir(self._al_cambiar)
+
+    @perfil.medido("TrackerPanel.parche")
+    def _al_cambiar(self, op):
+        """Parchea solo la fila afectada por la operación."""
+        tipo = op["op"]
+        if tipo == "lote":
+            # Un lote se reconcilia de una vez: una reindexación, un repintado
+            tipos = {o["op"] for o in op["ops"]}
+            if tipos & {"materia_crear", "materia_borrar"} or (self.filtro and "materia_renombrar" in tipos):
+                self.recargar_materias(self.app.almacen.lista_materias())
+            elif tipos & {"horas", "materia_renombrar", "reiniciar_semana", "semana_restaurar"}:
+                self.lista.refresh()
+        elif self.filtro and tipo in ("materia_crear", "materia_renombrar"):
+            # El nombre nuevo puede entrar, salir o cambiar de puesto en el filtro
+            self.recargar_materias(self.app.almacen.lista_materias())
+        elif tipo in ("horas", "materia_renombrar"):
+            self.lista.refrescar_fila(op["id"])
+        elif tipo == "materia_crear":
+            self.lista.agregar(op["materia"]["id"])
+        elif tipo == "materia_borrar":
+            self.lista.quitar(op["id"])
+        elif tipo in ("reiniciar_semana", "semana_restaurar"):
+            self.lista.refresh() # Mismos ids: basta repintar lo visible
+        elif tipo == "recarga":
+            self.recargar_materias(self.app.almacen.lista_materias())
+
     def recargar_materias(self, materias):
-        container = self.query_one("#lista_container")
-        container.remove_children() 
-        for m in materias:
-            container.mount(MateriaWidget(m))
+        """Con filtro solo se pasan (ordenadas por relevancia) las que coinciden."""
+        if self.filtro:
+            por_id = self.app.almacen.materias
+            materias = [por_id[mid] for mid in self.app.buscador.materias.buscar(self.filtro)]
+        self.lista.recargar_materias(materias)
+
+class ListaTareas(ScrollView, can_focus=True):
+    """
+    Lista virtualizada de tareas (Line API), como ListaMaterias: una fila por
+    tarea sin widgets propios, solo se pintan las del viewport. Layout:
+        [x] | Texto | [✖]
+    Click en la casilla o Espacio/Enter la marca; click en ✖ o Supr la borra.
+    """
+    BINDINGS = [
+        Binding("up", "cursor(-1)", "Arriba", show=False),
+        Binding("down", "cursor(1)", "Abajo", show=False),
+        Binding("pageup", "cursor(-10)", show=False),
+        Binding("pagedown", "cursor(10)", show=False),
+        Binding("space,enter", "marcar", "Marcar"),
+        Binding("delete", "eliminar", "Eliminar"),
+    ]
+
+    COMPONENT_CLASSES = {
+        "lista-tareas--casilla",
+        "lista-tareas--texto",
+        "lista-tareas--hecha",
+        "lista-tareas--borrar",
+        "lista-tareas--cursor",
+    }
+
+    cursor = reactive(0)
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._ids = []       # ids en orden de visualización (solo las que pasan el filtro)
+        self._indice = {}    # id -> posición en _ids
+        self._cache = LRUCache(maxsize=256)
+
+    # --- Datos ---
+    def recargar(self, ids):
+        self._ids = list(ids)
+        self._reindexar()
+
+    def _reindexar(self):
+        self._indice = {tid: i for i, tid in enumerate(self._ids)}
+        self.virtual_size = Size(0, len(self._ids))
+        self.cursor = min(self.cursor, max(len(self._ids) - 1, 0))
+        self.refresh()
+
+    def __contains__(self, tid):
+        return tid in self._indice
+
+    def insertar(self, tid, anterior):
+        """Pone `tid` justo después de `anterior` (o al principio si es None)."""
+        if tid in self._indice:
+            self._ids.remove(tid)
+        self._ids.insert(0 if anterior is None else self._indice[anterior] + 1, tid)
+        self._reindexar()
+
+    def quitar(self, tid):
+        if tid in self._indice:
+            del self._ids[self._indice[tid]]
+            self._reindexar()
+
+    def refrescar_fila(self, tid):
+        fila = self._indice.get(tid)
+        if fila is not None:
+            self.refresh_lines(fila, 1)
+
+    @property
+    def tarea_actual(self):
+        if not self._ids: return None
+        return self.app.almacen.todos.get(self._ids[self.cursor])
+
+    # --- Render ---
+    def notify_style_update(self):
+        super().notify_style_update()
+        self._cache.clear()
+
+    def _columnas(self, ancho):
+        """(nombre, x inicial, ancho) de cada columna para este ancho."""
+        texto = max(ancho - 4 - 3, 0)
+        return [("casilla", 0, 4), ("texto", 4, texto), ("borrar", 4 + texto, 3)]
+
+    @perfil.medido("ListaTareas.render_line")
+    def render_line(self, y):
+        ancho = self.size.width
+        fila = y + self.scroll_offset.y
+        if fila >= len(self._ids):
+            return Strip.blank(ancho, self.rich_style)
+        t = self.app.almacen.todos.get(self._ids[fila])
+        if t is None:  # borrada dentro de un lote que aún no se ha reconciliado
+            return Strip.blank(ancho, self.rich_style)
+        enfocada = fila == self.cursor and self.has_focus
+        clave = (t.id, t.texto, t.hecho, ancho, enfocada)
+        strip = self._cache.get(clave)
+        if strip is None:
+            strip = self._cache[clave] = self._render_fila(t, ancho, enfocada)
+        return strip
+
+    def _render_fila(self, t, ancho, enfocada):
+        base = self.rich_style
+        if enfocada:
+            base += self.get_component_rich_style("lista-tareas--cursor")
+        textos = {"casilla": "[x] " if t.hecho else "[ ] ", "borrar": " ✖ "}
+        segmentos = []
+        for nombre, _, w in self._columnas(ancho):
+            texto = textos.get(nombre) or t.texto[:w].ljust(w)
+            clase = "hecha" if nombre == "texto" and t.hecho else nombre
+            segmentos.append(Segment(texto, base + self.get_component_rich_style(f"lista-tareas--{clase}")))
+        return Strip(segmentos).adjust_cell_length(ancho, base)
+
+    # --- Interacción ---
+    def watch_cursor(self, previo, actual):
+        for fila in (previo, actual):
+            self.refresh_lines(fila, 1)
+        self.scroll_to_region(Region(0, actual, 1, 1), animate=False)
+
+    def on_focus(self): self.refresh()
+    def on_blur(self): self.refresh()
+
+    def action_cursor(self, paso):
+        if self._ids:
+            self.cursor = min(max(self.cursor + paso, 0), len(self._ids) - 1)
+
+    def action_marcar(self):
+        t = self.tarea_actual
+        if t: self.post_message(ToDoWidget.Cambio(logic.op_marcar_tarea(t.id, not t.hecho)))
+
+    def action_eliminar(self):
+        t = self.tarea_actual
+        if t: self.post_message(ToDoWidget.Cambio(logic.op_borrar_tarea(t)))
+
+    def on_click(self, event: events.Click):
+        offset = event.get_content_offset(self)
+        if offset is None: return
+        fila = offset.y + self.scroll_offset.y
+        if fila >= len(self._ids): return
+        self.cursor = fila
+        for nombre, x, w in self._columnas(self.size.width):
+            if x <= offset.x < x + w:
+                accion = {"casilla": self.action_marcar, "borrar": self.action_eliminar}.get(nombre)
+                if accion: accion()
+                break
 
 class ToDoWidget(Static):
+    BINDINGS = [
+        Binding("shift+up", "mover(-1)", "Subir tarea"),
+        Binding("shift+down", "mover(1)", "Bajar tarea"),
+        Binding("slash", "enfocar_filtro", "Filtrar"),
+    ]
+    # Un lote con más ops de tareas que esto se reconcilia entero; los
+    # pequeños (p. ej. un cambio de otra instancia) se parchean op a op
+    LOTE_RECONCILIAR = 50
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._suspendido = False  # oculto: no se reconcilia la lista
+        self._desfasado = False   # hubo cambios mientras estaba suspendido
+        self._filtro = ""
+        self._coinciden = None    # ids que pasan el filtro (None = sin filtro)
+
     def compose(self) -> ComposeResult:
         yield Label(":: TAREAS ::", classes="sidebar-title")
-        yield ListView(id="list_tasks")
+        yield Input(placeholder="Filtrar... (/)", id="inp_filtro_tareas", classes="filtro")
+        yield ListaTareas(id="list_tasks")
         yield Input(placeholder="Nueva tarea... (Enter)", id="inp_task")
 
+    def on_mount(self):
+        self.lista = self.query_one("#list_tasks", ListaTareas)
+        self.app.almacen.suscribir(self._al_cambiar)
+        self.recargar_todos(self.app.almacen.lista_todos())
+
+    def on_unmount(self):
+        self.app.almacen.desuscribir(self._al_cambiar)
+
+    def on_hide(self):
+        self._suspendido = True
+
+    def on_show(self):
+        self._suspendido = False
+        if self._desfasado:
+            self._desfasado = False
+            self._refiltrar()
+
+    @perfil.medido("ToDoWidget.parche")
+    def _al_cambiar(self, op):
+        """Parchea solo la fila de la tarea afectada (O(1) vía índice del modelo)."""
+        tipo = op["op"]
+        if tipo == "lote":
+            tareas = [o for o in op["ops"] if o["op"].startswith("tarea")]
+        if self._suspendido:
+            # Se reconcilia de una vez al volver a mostrarse
+            self._desfasado = self._desfasado or tipo.startswith("tarea") or tipo == "recarga" \
+                or (tipo == "lote" and bool(tareas))
+            return
+        if tipo != "lote":
+            self._parchear(op)
+        elif len(tareas) > self.LOTE_RECONCILIAR:
+            self._refiltrar()  # una reconciliación por lote grande, no un parche por tarea
+        else:
+            for o in tareas: self._parchear(o)
+
+    def _parchear(self, op):
+        # Dentro de un lote el almacén ya refleja todo el lote: una tarea de
+        # una op puede no existir ya (borrada por una op posterior)
+        tipo, todos = op["op"], self.app.almacen.todos
+        if tipo == "tarea_crear":
+            t = todos.get(op["tarea"]["id"])
+            if t is None or t.id in self.lista: return
+            if self._coinciden is not None:
+                if not self.app.buscador.tareas.coincide(t.id, self._filtro): return
+                self._coinciden.add(t.id)
+            self.lista.insertar(t.id, self._anterior_visible(t))
+        elif tipo == "tarea_marcar":
+            self.lista.refrescar_fila(op["id"])
+        elif tipo == "tarea_borrar":
+            self.lista.quitar(op["id"])
+        elif tipo == "tarea_mover":
+            t = todos.get(op["id"])
+            if t is None or t.id not in self.lista: return
+            self.lista.insertar(t.id, self._anterior_visible(t))
+        elif tipo == "recarga":
+            self._refiltrar()
+
+    def _anterior_visible(self, t):
+        """Id de la fila visible más cercana antes de `t` (con filtro puede no ser t.prev)."""
+        t = t.prev
+        while t is not None and t.id not in self.lista:
+            t = t.prev
+        return t.id if t else None
+
+    def on_input_changed(self, event: Input.Changed):
+        if event.input.id != "inp_filtro_tareas": return
+        self._filtro = event.value.strip()
+        self._refiltrar()
+
+    def _refiltrar(self):
+        self._coinciden = set(self.app.buscador.tareas.buscar(self._filtro)) if self._filtro else None
+        self.recargar_todos(self.app.almacen.lista_todos())
+
+    def action_enfocar_filtro(self):
+        self.query_one("#inp_filtro_tareas", Input).focus()
+
     def on_input_submitted(self, event: Input.Submitted):
+        if event.input.id == "inp_filtro_tareas":
+            self.lista.focus()
+            return
         if not event.value.strip(): return
-        self.agregar_item(event.value, False)
         event.input.value = "" 
-        self.post_message(self.Cambio())
+        # La fila la inserta cada ToDoWidget al recibir el aviso del almacén
+        self.post_message(self.Cambio(logic.op_crear_tarea(event.value)))
 
-    def agregar_item(self, texto, hecho):
-        lv = self.query_one("#list_tasks", ListView)
-        cb = Checkbox(texto, value=hecho, classes="task-cb")
-        btn = Button("✖", variant="error", classes="btn-delete")
-        lv.append(ListItem(Horizontal(cb, btn, classes="task-container")))
-
-    def on_button_pressed(self, event: Button.Pressed):
-        if "btn-delete" in event.button.classes:
-            node = event.button
-            while node.parent:
-                node = node.parent
-                if isinstance(node, ListItem):
-                    node.remove()
-                    self.post_message(self.Cambio())
-                    break
-
-    def on_checkbox_changed(self, event):
-        self.post_message(self.Cambio())
+    def action_mover(self, paso):
+        t = self.lista.tarea_actual
+        if t is None: return
+        if paso < 0:
+            if t.prev is None: return
+            despues_de = t.prev.prev.id if t.prev.prev else None
+        else:
+            if t.sig is None: return
+            despues_de = t.sig.id
+        # El cursor sigue a la tarea: la fila que ocupará es la vecina
+        self.lista.action_cursor(paso)
+        self.post_message(self.Cambio(logic.op_mover_tarea(t, despues_de)))
 
+    @perfil.medido("ToDoWidget.recargar_todos")
     def recargar_todos(self, todos):
-        # Limpiar y reconstruir
-        try:
-            lv = self.query_one("#list_tasks", ListView)
-            lv.remove_children()
-            for t in todos:
-                if isinstance(t, dict):
-                    self.agregar_item(t.get('text', ''), t.get('done', False))
-        except: pass
+        """Vuelve a poner los ids en orden: sin widgets por tarea, es una lista.
+        Con filtro solo entran las que coinciden (en el orden de la lista)."""
+        if self._coinciden is not None:
+            todos = [t for t in todos if t.id in self._coinciden]
+        self.lista.recargar(t.id for t in todos)
 
-    class Cambio(Message): pass
+    class Cambio(Message):
+        """Cambio en las tareas; lleva la operación a anotar en el diario."""
+        def __init__(self, op):
+            self.op = op
+            super().__init__()
 
 class PomodoroWidget(Static):
     def compose(self) -> ComposeResult:
-        self.engine = logic.motor_ultradiano_global
-        self.timer_active = False 
+        # El estado (en marcha/pausa) vive en el motor compartido, no en el widget
+        self.engine = self.app.almacen.motor
 
         yield Label(":::::: FLUJO ULTRADIANO ::::::", classes="sidebar-title")
         
         # 1. Contenedor del Reloj "Digital"
         with Container(classes="clock-panel"):
-            yield Label("IDLE", id="lbl_status")
-            yield Label("90:00", id="lbl_time")
+            self.lbl_status = Label("IDLE", id="lbl_status")
+            yield self.lbl_status
+            self.lbl_time = Label("90:00", id="lbl_time")
+            yield self.lbl_time
         
         self.progress_bar = BtopBar(classes="barra-materia")
         yield self.progress_bar
         
         # 2. Grid para los botones (Mejor que Horizontal para alineación)
         with Grid(classes="timer-grid"):
-            yield Button("WORK (90m)", id="btn_start_90", variant="success", classes="btn-pomo")
+            # Sin duración fija: la pone el plan (se avisa al arrancar)
+            yield Button("WORK", id="btn_start_90", variant="success", classes="btn-pomo")
             yield Button("PAUSE", id="btn_pause", variant="primary", classes="btn-pomo")
             yield Button("BREAK", id="btn_break", variant="warning", classes="btn-pomo")
 
 
     def on_mount(self):
-        self.set_interval(1.0, self.update_timer)
+        # Sin intervalo propio: la app publica un único tick a todos los relojes
+        self._pintado = {}
+        self.app.suscribir_reloj(self.update_timer)
 
-    def update_timer(self):
-        # Sincronizamos con el motor global
-        terminado = False
-        if self.timer_active:
-            terminado = self.engine.tick()
+    def on_unmount(self):
+        self.app.desuscribir_reloj(self.update_timer)
 
-        # Actualizar UI siempre (por si otro widget movió el motor)
-        try:
-            self.query_one("#lbl_time").update(self.engine.formatear_tiempo())
-            self.query_one("#lbl_status").update(self.engine.state)
-            self.progress_bar.progress = self.engine.obtener_progreso()
-            
-            lbl_time = self.query_one("#lbl_time")
-            lbl_time.remove_class("time-work", "time-break")
-            if self.engine.state == "WORK": lbl_time.add_class("time-work")
-            elif self.engine.state == "BREAK": lbl_time.add_class("time-break")
+    def on_show(self):
+        # Al volver a verse, ponerse al día con el motor
+        self.update_timer(self.engine.instantanea())
+
+    def update_timer(self, estado):
+        # Oculto tras la otra vista o en otra pestaña: on_show lo pondrá al día
+        if not self.is_on_screen: return
 
-            if terminado:
-                self.timer_active = False
-                self.notify("¡Ciclo Terminado!", severity="information")
-        except: pass
+        # Solo se toca lo que cambió desde el último pintado
+        previo, self._pintado = self._pintado, estado
+        if estado["texto"] != previo.get("texto"):
+            self.lbl_time.update(estado["texto"])
+        if estado["estado"] != previo.get("estado"):
+            self.lbl_status.update(estado["estado"])
+            self.lbl_time.set_class(estado["estado"] == "WORK", "time-work")
+            self.lbl_time.set_class(estado["estado"] == "BREAK", "time-break")
+        self.progress_bar.progress = estado["progreso"]
 
     def on_button_pressed(self, event):
         btn_id = event.button.id
         if btn_id == "btn_start_90":
-            self.engine.iniciar_trabajo(90)
-            self.timer_active = True
+            # El próximo ciclo del plan semanal; sin plan, 90 min de la materia en foco
+            ciclo = self.app.proximo_ciclo()
+            if ciclo:
+                minutos, mid = ciclo.minutos, ciclo.materia_id
+            else:
+                minutos, mid = 90, self.app.materia_en_foco()
+            self.app.mandar_motor("iniciar", minutos=minutos, materia_id=mid)
+            materia = self.app.almacen.materias.get(mid)
+            self.app.notify(f"WORK {minutos:g} min: {materia.nombre if materia else 'sin materia'}"
+                            + (" (plan semanal)" if ciclo else ""))
         elif btn_id == "btn_pause":
-            self.timer_active = not self.timer_active
+            self.app.mandar_motor("pausar")
         elif btn_id == "btn_break":
-            self.engine.iniciar_descanso()
-            self.timer_active = True
+            self.app.mandar_motor("descanso")
         elif btn_id == "btn_reset":
-            self.timer_active = False
-            self.engine.iniciar_trabajo(90)
-            self.engine.state = "IDLE"
+            self.app.mandar_motor("detener")
 
 class ConfirmScreen(Screen):
-    """Modal para confirmar borrado."""
+    """Modal para confirmar una acción destructiva (por defecto, un borrado)."""
+    def __init__(self, pregunta="¿Estás seguro de ELIMINAR esta materia?\nCtrl+Z la recupera.",
+                 accion="ELIMINAR"):
+        super().__init__()
+        self.pregunta = pregunta
+        self.accion = accion
+
     def compose(self) -> ComposeResult:
         yield Grid(
-            Label("¿Estás seguro de ELIMINAR esta materia?\nEsta acción no se puede deshacer.", id="question"),
+            Label(self.pregunta, id="question"),
             Button("Cancelar", variant="primary", id="btn_cancel_delete"),
-            Button("ELIMINAR", variant="error", id="btn_confirm_delete"),
+            Button(self.accion, variant="error", id="btn_confirm_delete"),
             id="dialog"
         )
 
@@ -331,7 +827,226 @@ class ConfirmScreen(Screen):
         else:
             self.dismiss(False)
 
+class RenombrarScreen(Screen):
+    """Modal con el nombre actual para editarlo; devuelve el nuevo (None si se cancela)."""
+    BINDINGS = [Binding("escape", "cancelar", "Cancelar")]
+
+    def __init__(self, nombre):
+        super().__init__()
+        self.nombre = nombre
+
+    def compose(self) -> ComposeResult:
+        yield Grid(
+            Label("Nuevo nombre de la materia:", id="question"),
+            Input(self.nombre, id="inp_renombrar"),
+            id="dialog_renombrar"
+        )
+
+    def on_input_submitted(self, event: Input.Submitted):
+        self.dismiss(event.value)
+
+    def action_cancelar(self):
+        self.dismiss(None)
+
+class AnaliticaScreen(Screen):
+    """
+    Analítica del historial: mapa de calor día × materia (con los glifos de
+    BtopBar), tendencia semanal y tasa de semanas con la meta cumplida.
+    Los números salen de la caché de columnas de app.analitica.
+    """
+    MAPA_SEMANAS = 12  # el mapa día a día cubre como mucho estas semanas
+    CHISPAS = " ▁▂▃▄▅▆▇█"
+
+    BINDINGS = [
+        Binding("escape", "app.pop_screen", "Volver"),
+        Binding("w", "ventana", "Semanas"),
+    ]
+
+    COMPONENT_CLASSES = {
+        "analitica--nombre",
+        "analitica--mapa",
+        "analitica--tendencia",
+        "analitica--tasa",
+        "analitica--cabecera",
+    }
+
+    semanas = reactive(12, init=False)
+
+    def compose(self) -> ComposeResult:
+        yield Label(":: ANALÍTICA ::", classes="sidebar-title")
+        with VerticalScroll(id="analitica_scroll"):
+            yield Static(id="analitica_contenido")
+        yield Footer()
+
+    def on_mount(self):
+        self.app.almacen.suscribir(self._al_cambiar)
+        self.pintar()
+
+    def on_unmount(self):
+        self.app.almacen.desuscribir(self._al_cambiar)
+
+    def _al_cambiar(self, op):
+        self.pintar()
+
+    def action_ventana(self):
+        import analitica
+        ventanas = analitica.VENTANAS
+        self.semanas = ventanas[(ventanas.index(self.semanas) + 1) % len(ventanas)]
+
+    def watch_semanas(self, semanas):
+        self.pintar()
+
+    def pintar(self):
+        import analitica
+        datos = self.app.analitica
+        semanas = analitica.ventana(self.semanas)
+        mapa = semanas[-self.MAPA_SEMANAS:]
+        materias = self.app.almacen.lista_materias()
+        columnas = [datos.columna_diaria(m.id, mapa) for m in materias]
+        maximo = max((max(c) for c in columnas if c), default=0.0)
+
+        estilo = self.get_component_rich_style
+        texto = Text(no_wrap=True)
+        texto.append(f"{'':16}{f'últimas {len(mapa)} semanas, día a día':<{len(mapa) * 7}} │ "
+                     f"{'tendencia':<{self.semanas}.{self.semanas}}  meta\n", estilo("analitica--cabecera"))
+        for m, columna in zip(materias, columnas):
+            totales = datos.totales_semanales(m.id, semanas)
+            celdas = analitica.niveles(columna, maximo, len(BtopBar.BARS) - 1)
+            tendencia = analitica.niveles(totales, max(totales, default=0.0), len(self.CHISPAS) - 1)
+            texto.append(f"{m.nombre[:15]:<16}", estilo("analitica--nombre"))
+            texto.append("".join(BtopBar.BARS[n] for n in celdas), estilo("analitica--mapa"))
+            texto.append(" │ ")
+            texto.append("".join(self.CHISPAS[n] for n in tendencia), estilo("analitica--tendencia"))
+            texto.append(f" {datos.tasa_meta(totales, m.meta_semanal):4.0%}\n", estilo("analitica--tasa"))
+        self.query_one("#analitica_contenido", Static).update(texto)
+
+class PlanScreen(Screen):
+    """
+    Plan de la semana: los ciclos ultradianos que quedan, día por día, con
+    su descanso, y lo que no cabe en las ventanas de horario.json. El plan
+    (app.plan) se recalcula solo en la parte que toca cada op.
+    """
+    DIAS = ("Lun", "Mar", "Mié", "Jue", "Vie", "Sáb", "Dom")
+
+    BINDINGS = [Binding("escape", "app.pop_screen", "Volver")]
+
+    COMPONENT_CLASSES = {
+        "plan--dia",
+        "plan--hora",
+        "plan--nombre",
+        "plan--proximo",
+        "plan--sin-hueco",
+    }
+
+    def compose(self) -> ComposeResult:
+        yield Label(":: PLAN SEMANAL ::", classes="sidebar-title")
+        with VerticalScroll(id="plan_scroll"):
+            yield Static(id="plan_contenido")
+        yield Footer()
+
+    def on_mount(self):
+        self.app.almacen.suscribir(self._al_cambiar)
+        # Los ciclos que van terminando salen del plan aunque no haya ops
+        self.set_interval(60, self.pintar)
+        self.pintar()
+
+    def on_unmount(self):
+        self.app.almacen.desuscribir(self._al_cambiar)
+
+    def _al_cambiar(self, op):
+        self.pintar()
+
+    def pintar(self):
+        import planificador
+        plan = self.app.plan
+        materias = self.app.almacen.materias
+        proximo = plan.proximo()
+        estilo = self.get_component_rich_style
+        texto = Text(no_wrap=True)
+        for fecha, ciclos in plan.dias():
+            texto.append(f"{self.DIAS[fecha.weekday()]} {fecha:%d/%m}\n", estilo("plan--dia"))
+            for c in ciclos:
+                m = materias.get(c.materia_id)
+                marca = "▶ " if c is proximo else "  "
+                texto.append(f"{marca}{c.inicio:%H:%M}–{c.fin:%H:%M}  ",
+                             estilo("plan--proximo" if c is proximo else "plan--hora"))
+                texto.append(f"{(m.nombre if m else '?')[:24]:<25}", estilo("plan--nombre"))
+                texto.append(f"{c.minutos:3.0f}m + {planificador.descanso(c.minutos):.0f}m descanso\n", "dim")
+        if proximo is None:
+            texto.append("Nada que planificar: metas cumplidas o sin ventanas libres.\n", "dim")
+        sin_hueco = plan.sin_hueco()
+        if sin_hueco:
+            texto.append("\nNo caben esta semana\n", estilo("plan--dia"))
+            for mid, minutos in sin_hueco:
+                m = materias.get(mid)
+                texto.append(f"  {(m.nombre if m else '?')[:24]:<25}{minutos / 60:5.1f} h\n",
+                             estilo("plan--sin-hueco"))
+        self.query_one("#plan_contenido", Static).update(texto)
+
+class EspaciosScreen(Screen):
+    """
+    Espacios de trabajo: uno por línea con los totales de la cabecera de su
+    shard, sin cargarlo. Enter abre el elegido; el campo de abajo crea uno.
+    """
+    BINDINGS = [Binding("escape", "app.pop_screen", "Volver")]
+
+    def compose(self) -> ComposeResult:
+        actual = self.app.espacio
+        resumen = espacios.resumen()
+        if actual and actual not in dict(resumen):
+            resumen.insert(0, (actual, None))
+        nombres = [nombre for nombre, _ in resumen]
+        yield Label(":: ESPACIOS ::", classes="sidebar-title")
+        yield ListView(*(ListItem(Label(self._linea(nombre, cabecera, nombre == actual)), name=nombre)
+                         for nombre, cabecera in resumen),
+                       initial_index=nombres.index(actual) if actual in nombres else 0, id="lista_espacios")
+        yield Input(placeholder="Nuevo espacio (Enter para crear y abrir)", id="inp_espacio", classes="filtro")
+        yield Footer()
+
+    def on_mount(self):
+        self.query_one("#lista_espacios", ListView).focus()
+
+    @staticmethod
+    def _linea(nombre, cabecera, activo):
+        marca = "▶ " if activo else "  "
+        if cabecera is None:
+            return f"{marca}{nombre[:24]:<25} sin resumen: se escribe al cerrarlo"
+        c = lambda clave: cabecera.get(clave, 0)
+        return (f"{marca}{nombre[:24]:<25}{c('horas'):6.1f}/{c('meta'):.1f} h  "
+                f"{c('materias'):4d} materias  {c('hechas')}/{c('tareas')} tareas")
+
+    def on_list_view_selected(self, event):
+        self._abrir(event.item.name)
+
+    def on_input_submitted(self, event):
+        self._abrir(event.value)
+
+    def _abrir(self, nombre):
+        if self.app.cambiar_espacio(nombre):
+            self.app.pop_screen()
+
 # --- VISTA DASHBOARD (REJILLA) ---
+# --- VISTA TABS (PESTAÑAS CLÁSICAS) ---
+class VistaTabs(Container):
+    """Vista clásica en pestañas. Solo se compone la pestaña inicial; las
+    demás se montan la primera vez que se abren."""
+    def compose(self) -> ComposeResult:
+        from textual.widgets import TabbedContent, TabPane
+        with TabbedContent(initial="tab_materias"):
+            with TabPane("Tracker", id="tab_materias"):
+                yield self._contenido("tab_materias")
+            yield TabPane("To-Do List", id="tab_todo")
+            yield TabPane("Ultradian Timer", id="tab_pomodoro")
+
+    def _contenido(self, pane_id):
+        if pane_id == "tab_materias": return TrackerPanel(id="tab_tracker_panel")
+        if pane_id == "tab_todo": return ToDoWidget(id="tab_todo_widget")
+        return PomodoroWidget(id="tab_pomodoro_widget")
+
+    def on_tabbed_content_tab_activated(self, event):
+        if not event.pane.children:
+            event.pane.mount(self._contenido(event.pane.id))
+
 class DashboardView(Container):
     """Vista 'God Mode' con todo visible a la vez."""
     def compose(self) -> ComposeResult:
@@ -352,112 +1067,407 @@ class DashboardView(Container):
             yield TrackerPanel(id="dash_tracker")
             yield Label(MY_ASCII_ART, classes="ascii-art-text")
 """
+class PerfilOverlay(Static):
+    """Overlay de perfil (F2): p50/p95 por punto medido, lag del bucle y widgets.
+    Mientras está visible el perfil queda activo; al cerrarlo vuelve como estaba."""
+    INTERVALO_LAG = 0.1  # el retraso de este timer sobre lo previsto es el lag del bucle
+
+    def alternar(self):
+        self.display = not self.display
+        if self.display:
+            self._previo = perfil.activo
+            perfil.activar()
+            self._esperado = time.perf_counter() + self.INTERVALO_LAG
+            self._timers = [self.set_interval(self.INTERVALO_LAG, self._medir_lag),
+                            self.set_interval(1.0, self.pintar)]
+            self.pintar()
+        else:
+            for timer in self._timers: timer.stop()
+            if not self._previo: perfil.desactivar()
+
+    def _medir_lag(self):
+        ahora = time.perf_counter()
+        perfil.anotar("lag_bucle", max(ahora - self._esperado, 0.0) * 1000)
+        self._esperado = ahora + self.INTERVALO_LAG
+
+    def pintar(self):
+        texto = Text(no_wrap=True)
+        texto.append(":: PERFIL :: (F2 cierra)\n", "bold")
+        texto.append(f"{'punto':<28}{'n':>7}{'p50':>9}{'p95':>9}  ms\n", "dim")
+        for nombre, llamadas, p50, p95 in perfil.resumen():
+            texto.append(f"{nombre[:27]:<28}{llamadas:>7}{p50:>9.2f}{p95:>9.2f}\n")
+        vistas = "  ".join(f"{v.id}={len(v.query('*'))}" for v in self.app.query("#view_dashboard, #view_tabs"))
+        texto.append(f"\nwidgets: pantalla={len(self.screen.query('*'))}  {vistas}", "dim")
+        fases = "  ".join(f"{fase}={acumulado:.0f}" for fase, _, acumulado in perfil.arranque())
+        texto.append(f"\narranque (ms): {fases}", "dim")
+        self.update(texto)
+
 # --- APP PRINCIPAL ---
 class StudyApp(App):
-    CSS_PATH = ["/home/ateniense/.cache/wal/textual.tcss", "estilo.css"]
-    BINDINGS = [("q", "quit", "Salir")]
+    # El tema de pywal es opcional: sin él (otra máquina, headless) basta estilo.css
+    CSS_PATH = [r for r in ("/home/ateniense/.cache/wal/textual.tcss",) if os.path.exists(r)] + ["estilo.css"]
+    BINDINGS = [("q", "quit", "Salir"), ("a", "analitica", "Analítica"), ("p", "plan", "Plan"),
+                ("e", "espacios", "Espacios"), ("f2", "perfil", "Perfil"),
+                ("ctrl+z", "deshacer", "Deshacer"), ("ctrl+y", "rehacer", "Rehacer")]
+    # Una vista oculta con más widgets que esto (unas 1200 tareas) se desmonta
+    # en vez de quedar suspendida
+    PRESUPUESTO_WIDGETS = 5000
 
     # Variable reactiva para controlar qué vista se muestra
-    show_dashboard = reactive(True)
+    # (init=False: la vista inicial ya la construye compose)
+    show_dashboard = reactive(True, init=False)
+
+    def __init__(self):
+        super().__init__()
+        # Reglas CSS ya parseadas en arranques anteriores (se invalidan por mtime),
+        # solo si el gancho privado de Textual sigue como se espera
+        if arranque.disponible():
+            self.stylesheet = arranque.HojaCacheada(variables=self.get_css_variables(),
+                                                    firma=arranque.firma_hojas(self.css_path))
+        # Fuente de verdad: los widgets se suscriben y se parchean por operación
+        self.almacen = logic.Almacen()
+        self.espacio = logic.espacio_actual  # se fija al abrir el local o, con demonio, el que él tenga
+        # Suscrito antes que los paneles: al filtrar, el índice ya refleja la op
+        self.buscador = busqueda.Buscador(self.almacen)
+        # Pilas de deshacer / rehacer: ops propias con su inversa, no copias del estado
+        self.pila_deshacer = deshacer.Deshacer(self.almacen)
+        self.persistidor = None
+        self.vigilante = None
+        self.cliente = None       # conexión al demonio, si hay uno corriendo
+        self._relojes = []        # callbacks de los PomodoroWidget
+        self._timer_reloj = None  # solo existe mientras el motor corre
+        self.analitica = None     # caché de agregados; se crea al abrir la pantalla
+        self._plan = None         # plan semanal; se crea la primera vez que se pide
+        self._cprofile = perfil.iniciar_cprofile()  # (None, None) salvo TRACKER_CPROFILE
 
     def compose(self) -> ComposeResult:
         with Horizontal(id="main_layout"):
             yield Sidebar()
-            
-            # --- VISTA 1: TABS CLÁSICAS ---
-            with TabbedContent(initial="tab_materias", id="view_tabs"):
-                with TabPane("Tracker", id="tab_materias"):
-                    yield TrackerPanel(id="tab_tracker_panel")
-                with TabPane("To-Do List", id="tab_todo"):
-                    yield ToDoWidget(id="tab_todo_widget")
-                with TabPane("Ultradian Timer", id="tab_pomodoro"):
-                    yield PomodoroWidget(id="tab_pomodoro_widget")
-            
-            # --- VISTA 2: DASHBOARD (Oculto por defecto) ---
-            yield DashboardView(id="view_dashboard")
-                    
+            # Solo la vista visible; la otra se construye la primera vez que se pide
+            yield self._construir_vista(self.show_dashboard)
+        yield PerfilOverlay(id="perfil_overlay")
 
-    def on_mount(self):
-        self.cargar_datos_y_refrescar()
+    def _construir_vista(self, dashboard):
+        # --- VISTA 1: TABS CLÁSICAS | VISTA 2: DASHBOARD ---
+        if dashboard: return DashboardView(id="view_dashboard")
+        return VistaTabs(id="view_tabs")
 
-    def watch_show_dashboard(self, show: bool):
-        """Alternar visibilidad CSS basado en la variable reactiva."""
-        tabs = self.query_one("#view_tabs")
-        dash = self.query_one("#view_dashboard")
-        
-        if show:
-            tabs.display = False
-            dash.display = True
-            # Forzar refresco al mostrar dashboard para sincronizar datos
-            self.cargar_datos_y_refrescar()
-        else:
-            tabs.display = True
-            dash.display = False
+    async def on_mount(self):
+        perfil.hito("montaje")
+        self.call_after_refresh(perfil.hito, "primer frame")
+        self.almacen.suscribir(self._persistir)
+        # Al cambiar la semana ISO los contadores pasan a la nueva aunque no haya ops
+        self.set_interval(60, self.almacen.al_dia)
+        # Con un demonio corriendo, la app es un cliente más: él persiste y lleva el motor
+        if os.environ.get("TRACKER_DEMONIO") != "0":
+            import demonio
+            self.cliente, datos = await demonio.Cliente.conectar()
+            if self.cliente:
+                self._enganchar(datos)
+                return
+        self._modo_local()
+
+    def _modo_local(self):
+        self.cliente = None
+        if logic.diario_global is None:
+            aviso = logic.iniciar()
+            self.espacio = logic.espacio_actual
+            if aviso: self.notify(aviso, severity="warning", timeout=15)
+        self.almacen.motor.registra_ciclos = True
+        self.persistidor = logic.Persistidor(logic.diario_global, al_fallar=self._fallo_guardado)
+        # Primero se pinta el esqueleto; los datos llegan justo después
+        self.call_after_refresh(self._cargar_local)
+
+    def _cargar_local(self):
+        try:
             self.cargar_datos_y_refrescar()
+        except ValueError as e:
+            # Sin datos legibles no se arranca: cualquier cambio los pisaría
+            self.exit(return_code=1, message=str(e))
+            return
+        perfil.hito("datos")
+        self._vigilar()
 
-    def cargar_datos_y_refrescar(self):
-        """Carga datos de disco y los inyecta en TODOS los widgets."""
-        datos = logic.cargar_datos_globales()
-        self.materias = datos["materias"]
-        self.todos = datos["todos"]
+    def _vigilar(self):
+        # Otras instancias (otra terminal, otro pane) anotan en el mismo diario
+        rutas = logic.diario_global.rutas_vigiladas()
+        self.vigilante = logic.Vigilante(rutas, self._cambio_externo) if rutas else None
 
-        # Refrescar Paneles de Materias (hay dos: uno en tabs, uno en dash)
-        for panel in self.query(TrackerPanel):
-            panel.recargar_materias(self.materias)
+    def _enganchar(self, datos):
+        self.persistidor = self.cliente  # mismo contrato: encolar / detener
+        self.almacen.motor.registra_ciclos = False
+        self._adoptar_datos(datos)
+        self.run_worker(self._escuchar_demonio(), exclusive=True, group="demonio")
 
-        # Refrescar ToDos (hay dos)
-        for widget in self.query(ToDoWidget):
-            widget.recargar_todos(self.todos)
+    def _adoptar_datos(self, datos):
+        self.espacio = datos.get("espacio", self.espacio)
+        self.almacen.reemplazar([logic._materia_desde_dict(d) for d in datos["materias"]], datos["todos"],
+                                logic.Historial.desde_dict(datos["historial"]))
+        self.almacen.motor.adoptar(datos["motor"])
+        self.sincronizar_reloj()
 
-        # Actualizar Sidebar
-        self.actualizar_sidebar()
+    async def _escuchar_demonio(self):
+        async for mensaje in self.cliente.eventos():
+            evento = mensaje.get("evento")
+            if evento == "op":
+                # Marcada con origen para que _persistir no la devuelva al demonio
+                with self.batch_update():
+                    self.almacen.aplicar(dict(mensaje["op"], origen=mensaje["op"].get("origen", "demonio")))
+            elif evento == "motor":
+                self.almacen.motor.adoptar(mensaje["motor"])
+                self.sincronizar_reloj()
+            elif evento == "datos":
+                self._adoptar_datos(mensaje["datos"])
+            else:
+                self.notify(f"Demonio: {mensaje.get('error')}", severity="error")
+        if self.is_running and self.cliente:
+            self.notify("Demonio desconectado: se sigue en modo local", severity="warning")
+            self._modo_local()
 
-    def actualizar_sidebar(self):
-        stats = logic.obtener_estadisticas_globales(self.materias)
-        self.query_one(Sidebar).actualizar(stats)
+    def mandar_motor(self, orden, **argumentos):
+        """Órdenes al motor: al demonio si la app está enganchada (él responde
+        con el estado nuevo), si no al motor local."""
+        if self.cliente:
+            materia_id = argumentos.pop("materia_id", None)
+            self.cliente.enviar(dict(argumentos, cmd=orden, materia=materia_id))
+            return
+        self.almacen.motor.ejecutar(orden, **argumentos)
+        self.sincronizar_reloj()
 
-    def guardar_todo(self):
-        # Recolectar ToDos del widget visible actual
-        visible_todo_widget = None
-        if self.show_dashboard:
-            visible_todo_widget = self.query_one("#dash_todo", ToDoWidget)
-        else:
-            visible_todo_widget = self.query_one("#tab_todo_widget", ToDoWidget)
-            
-        if visible_todo_widget:
-            tasks_ui = []
+    def _persistir(self, op):
+        # Las ops con "origen" ya vienen del diario (de otra instancia)
+        if op["op"] != "recarga" and "origen" not in op:
+            self.persistidor.encolar(op)
+
+    def _cambio_externo(self):
+        # Hilo del vigilante: la lectura del diario no bloquea el event loop
+        ops = logic.diario_global.sincronizar()
+        if ops is None:
+            self.call_from_thread(self._recargar_ajenas)
+        elif ops:
+            self.call_from_thread(self._aplicar_ajenas, ops)
+
+    def _recargar_ajenas(self):
+        try:
+            self.cargar_datos_y_refrescar()
+        except ValueError as e:
+            # Se sigue con lo que hay en memoria, que sí es legible
+            self.notify(str(e), severity="error", timeout=15)
+
+    def _aplicar_ajenas(self, ops):
+        """Aplica en el almacén los cambios de otra instancia como un solo lote:
+        un único aviso por vista y un único frame (las vistas parchean los
+        lotes pequeños op a op y solo reconcilian enteros los grandes)."""
+        with self.batch_update():
+            self.almacen.aplicar(logic.op_lote(ops, origen="diario"))
+
+    def on_unmount(self):
+        self.cliente = None  # la caída de la conexión ya no es un imprevisto
+        if self.vigilante:
+            self.vigilante.detener()
+        # Al salir, vaciar al diario lo que quede en la cola
+        if self.persistidor:
+            self.persistidor.detener()
+        # Y dejar listo el arranque siguiente (con demonio, los archivos son suyos)
+        if isinstance(self.persistidor, logic.Persistidor):
             try:
-                # Extraemos datos manualmente del widget visible
-                list_view = visible_todo_widget.query_one("ListView")
-                for item in list_view.children:
-                    # Buscamos el checkbox dentro del Horizontal
-                    cb = item.query_one(Checkbox)
-                    tasks_ui.append({"text": str(cb.label), "done": cb.value})
-                self.todos = tasks_ui
-            except: pass
-
-        logic.guardar_datos_globales(self.materias, self.todos)
-        
-        # IMPORTANTE: Sincronizar el otro widget que no se ve
-        self.cargar_datos_y_refrescar()
+                logic.diario_global.cerrar()
+            except (OSError, ValueError):
+                pass
+        if isinstance(self.stylesheet, arranque.HojaCacheada):
+            self.stylesheet.guardar()
+        perfil.volcar_cprofile(*self._cprofile)
+
+    def materia_en_foco(self):
+        """Id de la materia bajo el cursor de la lista visible (a la que se apunta un ciclo WORK)."""
+        listas = sorted(self.query(ListaMaterias), key=lambda l: not l.is_on_screen)
+        materia = listas[0].materia_actual if listas else None
+        return materia.id if materia else None
+
+    # --- RELOJ ÚNICO DE LA APP ---
+    def suscribir_reloj(self, callback):
+        self._relojes.append(callback)
+
+    def desuscribir_reloj(self, callback):
+        if callback in self._relojes:
+            self._relojes.remove(callback)
+
+    def sincronizar_reloj(self):
+        """Publica el estado del motor y programa el próximo tick solo si corre."""
+        if self._timer_reloj is not None:
+            self._timer_reloj.stop()
+            self._timer_reloj = None
+        estado = self.almacen.motor.instantanea()
+        for callback in tuple(self._relojes):
+            callback(estado)
+        if self.almacen.motor.activo:
+            # Despertar justo cuando cambia el segundo mostrado, no antes
+            espera = (self.almacen.motor.restante() % 1.0) or 1.0
+            self._timer_reloj = self.set_timer(espera + 0.01, self._tick_reloj)
+
+    def _tick_reloj(self):
+        self._timer_reloj = None
+        motor = self.almacen.motor
+        if motor.tick():
+            if motor.state == "WORK" and motor.registra_ciclos:
+                self.guardar_todo(logic.op_ciclo_completo(self.almacen.materias.get(motor.materia_id),
+                                                          motor.elapsed_work / 60, motor.materia_id))
+            self.notify("¡Ciclo Terminado!", severity="information")
+        self.sincronizar_reloj()
+
+    def _fallo_guardado(self, error):
+        # Llamado desde el hilo del persistidor
+        self.call_from_thread(self.notify, f"Error al guardar: {error}", severity="error")
+
+    @perfil.medido("cambio_vista")
+    def watch_show_dashboard(self, show: bool):
+        """Alternar vistas; la que aparece se construye si aún no existe."""
+        layout = self.query_one("#main_layout")
+        visible, oculta = ("#view_dashboard", "#view_tabs") if show else ("#view_tabs", "#view_dashboard")
+
+        nueva = layout.query(visible)
+        if nueva: nueva.first().display = True
+        else: layout.mount(self._construir_vista(show))
+
+        # La vista oculta queda suspendida (sus widgets no repintan hasta on_show)
+        # salvo que ella sola pase del presupuesto: entonces se desmonta entera.
+        for vieja in layout.query(oculta):
+            if len(vieja.query("*")) > self.PRESUPUESTO_WIDGETS:
+                vieja.remove()
+            else:
+                vieja.display = False
+        # Ambas vistas leen del almacén en memoria: no hay nada que recargar
+
+    def action_perfil(self):
+        self.query_one("#perfil_overlay", PerfilOverlay).alternar()
+
+    def action_analitica(self):
+        if self.analitica is None:
+            import analitica
+            # Se suscribe antes que la pantalla: invalida la caché antes del repintado
+            self.analitica = analitica.Analitica(self.almacen)
+        self.push_screen(AnaliticaScreen())
+
+    @property
+    def plan(self):
+        if self._plan is None:
+            import planificador
+            # Se suscribe antes que PlanScreen: se replanifica antes del repintado
+            self._plan = planificador.Plan(self.almacen)
+        return self._plan
+
+    def proximo_ciclo(self):
+        """Próximo ciclo del plan, o None sin plan (o con un horario.json roto)."""
+        try:
+            return self.plan.proximo()
+        except ValueError as e:
+            self.notify(str(e), severity="error")
+            return None
+
+    def action_deshacer(self):
+        with self.batch_update():
+            op = self.pila_deshacer.deshacer()
+        if op is None: self.notify("Nada que deshacer")
+        else: self.notify(f"Deshecho: {deshacer.describir(op, self.almacen)}")
+
+    def action_rehacer(self):
+        with self.batch_update():
+            op = self.pila_deshacer.rehacer()
+        if op is None: self.notify("Nada que rehacer")
+        else: self.notify(f"Rehecho: {deshacer.describir(op, self.almacen)}")
+
+    def action_espacios(self):
+        self.push_screen(EspaciosScreen())
+
+    def cambiar_espacio(self, nombre):
+        """Cierra el shard actual (con la cola ya vaciada) y carga el de `nombre`,
+        creándolo si no existe. False si no se pudo."""
+        if self.cliente:
+            self.notify("Con el demonio corriendo el espacio es el suyo: arráncalo con TRACKER_ESPACIO",
+                        severity="warning")
+            return False
+        try:
+            nombre = espacios.validar(nombre)
+            if nombre == self.espacio: return True
+            espacios.preparar(nombre)
+            espacios.fijar_activo(nombre)
+        except (OSError, ValueError) as e:
+            self.notify(str(e), severity="error")
+            return False
+        # Un ciclo en marcha es de una materia del espacio que se cierra
+        if self.almacen.motor.state != "IDLE":
+            self.mandar_motor("detener")
+        if self.vigilante:
+            self.vigilante.detener()
+            self.vigilante = None
+        self.persistidor.detener()
+        try:
+            logic.diario_global.cerrar()
+        except (OSError, ValueError):
+            pass
+        anterior, ok = self.espacio, True
+        logic.abrir_espacio(nombre)
+        try:
+            with self.batch_update():
+                self.cargar_datos_y_refrescar()
+        except ValueError as e:
+            # El shard nuevo no se puede leer: se vuelve al que estaba abierto
+            self.notify(str(e), severity="error", timeout=15)
+            logic.abrir_espacio(anterior)
+            espacios.fijar_activo(anterior)
+            nombre, ok = anterior, False
+            with self.batch_update():
+                self.cargar_datos_y_refrescar()
+        self.espacio = nombre
+        self.persistidor = logic.Persistidor(logic.diario_global, al_fallar=self._fallo_guardado)
+        self._vigilar()
+        if ok: self.notify(f"Espacio: {nombre}")
+        return ok
+
+    def action_plan(self):
+        try:
+            self.plan
+        except ValueError as e:
+            self.notify(str(e), severity="error")
+            return
+        self.push_screen(PlanScreen())
+
+    @perfil.medido("cargar_datos_y_refrescar")
+    def cargar_datos_y_refrescar(self):
+        """Carga datos de disco en el almacén; los widgets se reconcilian con el aviso."""
+        datos = logic.cargar_datos_globales()
+        self.almacen.reemplazar(datos["materias"], datos["todos"], datos["historial"])
+
+    def guardar_todo(self, op):
+        # El almacén aplica en memoria y avisa: cada vista parchea su fila
+        # y el persistidor (suscrito) lo escribe en segundo plano. Un lote
+        # (reinicio, importación) se pinta en un solo frame.
+        with self.batch_update():
+            self.almacen.aplicar(op)
 
     # --- MANEJO DE EVENTOS ---
-    def on_materia_widget_cambio(self, msg):
-        self.guardar_todo()
+    def on_lista_materias_cambio(self, msg):
+        self.guardar_todo(msg.op)
 
     def on_to_do_widget_cambio(self, msg):
-        self.guardar_todo()
+        self.guardar_todo(msg.op)
 
     def on_button_pressed(self, event):
         bid = event.button.id
         if bid == "btn_reset":
-            logic.reiniciar_semana(self.materias)
-            self.guardar_todo()
-            self.notify("Semana Reiniciada")
+            def reiniciar(confirmado):
+                if confirmado:
+                    self.guardar_todo(logic.op_reiniciar_semana(self.almacen.materias.values()))
+                    self.notify("Semana Reiniciada")
+            self.push_screen(ConfirmScreen("¿Reiniciar la semana?\nLas horas vuelven a 0; el historial se "
+                                           "conserva y Ctrl+Z lo deshace.", "REINICIAR"), reiniciar)
         elif bid == "btn_view_toggle":
             # Alternar vista
             self.show_dashboard = not self.show_dashboard
 
 if __name__ == "__main__":
+    perfil.hito("importar la app")
     app = StudyApp()
     app.run()
+    if os.environ.get("TRACKER_ARRANQUE") == "1":
+        print(perfil.informe_arranque(), file=sys.stderr)